@@ -1,16 +1,14 @@
 import datetime as dt
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import matplotlib.pyplot as plt
 import numpy as np
 from geopy.distance import great_circle as GC
-from joblib import Parallel, delayed
 from loguru import logger
-from tqdm import tqdm
 
-from raidpy import utils
-from raidpy.functions import Oblique
-from raidpy.plots import PlotOlRays
+from raidpy import parallel, utils
+from raidpy.plots import RayFrame, render_frames
 
 plt.style.use(["science", "ieee"])
 plt.rcParams["font.family"] = "sans-serif"
@@ -24,21 +22,6 @@ def get_w2naf_dist():
     return GC(source, target).km
 
 
-def create_ol(e, ray, b, d):
-    ol = Oblique(
-        d,
-        np.array(ray.ground_range),
-        np.array(ray.height),
-        b.rb,
-        b.olat,
-        b.olon,
-        b.freq.ravel().tolist()[0] * 1e6,
-        edens=np.array(ray.electron_density) * 1e6,  # To /m3
-        ray_details=ray,
-    )
-    return ol
-
-
 if __name__ == "__main__":
     import sys
 
@@ -69,10 +52,12 @@ if __name__ == "__main__":
         ah_cc=[],
     )
 
-    for d in dates:
+    frames = []
+    executor = ProcessPoolExecutor(max_workers=n_jobs)
+    flocs = [os.path.join(folder, f"{d.strftime('%H%M')}_rt.mat") for d in dates]
+    ray_files = utils.prefetch_rays_mat_files(flocs, n_ahead=2)
+    for d, (floc, (_, rays)) in zip(dates, ray_files):
         logger.info(f"Date: {d}")
-        floc = os.path.join(folder, f"{d.strftime('%H%M')}_rt.mat")
-        _, rays = utils.load_rays_mat_file(floc)
         elvs = []
         for e in list(rays.keys()):
             ground_range = rays[e].ground_range.iloc[-1]
@@ -81,39 +66,50 @@ if __name__ == "__main__":
                 logger.info(f"Wintin limits: {ground_range} / elv:{e}")
         elvs.sort()
 
-        ols = Parallel(n_jobs=n_jobs)(
-            delayed(create_ol)(e, rays[e], b=bearing, d=d) for e in tqdm(elvs)
-        )
-        los = np.array(
-            [
-                [
-                    ol.get_total_absorption_along_path(None),
-                    ol.get_total_absorption_along_path(None, "ah", "av_cc"),
-                    ol.get_total_absorption_along_path(None, "ah", "av_mb"),
-                    ol.get_total_absorption_along_path(None, "sw", "ft"),
-                ]
-                for ol in ols
-            ]
+        fan = parallel.compute_fan(
+            d,
+            rays,
+            bearing,
+            elvs=elvs,
+            quantities=[
+                ("los", "ah", "sn", "O"),
+                ("los", "ah", "av_cc", "O"),
+                ("los", "ah", "av_mb", "O"),
+                ("los", "sw", "ft", "O"),
+            ],
+            executor=executor,
         )
+        los = fan.totals.values
         loss["ah_sn"].append(np.median(los[:, 0]))
         loss["ah_cc"].append(np.median(los[:, 1]))
         loss["ah_mb"].append(np.median(los[:, 2]))
         loss["sw_ft"].append(np.median(los[:, 3]))
 
-        if not os.path.exists(dirc + f"/{d.strftime('%H%M')}.png"):
-            pl = PlotOlRays(d, ylim=[0, 250], xlim=[0, 3000])
-            os.makedirs(dirc, exist_ok=True)
-            for i, e, ol in zip(range(len(ols)), elvs, ols):
-                ray = ol.get_absorption_datasets(wave_disp_reltn, col_freq, mode)
-                txt = (
-                    f"Spot: wwv-w2naf / {tfreq} MHz "
-                    + r"/ $\beta=\beta_{ah}(\nu_{sn})$"
-                )
-                pl.lay_rays(
-                    ray, text=txt if i == 0 else "", tag_distance=dist if i == 0 else -1
-                )
-            pl.save(dirc + f"/{d.strftime('%H%M')}.png")
-            pl.close()
+        key = parallel.quantity_key("los", wave_disp_reltn, col_freq, mode)
+        txt = f"Spot: wwv-w2naf / {tfreq} MHz " + r"/ $\beta=\beta_{ah}(\nu_{sn})$"
+        frames.append(
+            RayFrame(
+                date=d,
+                rays=[
+                    rays[e][["ground_range", "height"]].assign(los=fan.profile(e, key))
+                    for e in elvs
+                ],
+                text=txt,
+                tag_distance=dist,
+            )
+        )
+
+    executor.shutdown()
+    render_frames(
+        frames,
+        filepaths=[dirc + f"/{f.date.strftime('%H%M')}.png" for f in frames],
+        movie=dirc + "/rays.mp4",
+        n_jobs=n_jobs,
+        overwrite=False,
+        kind="los",
+        ylim=[0, 250],
+        xlim=[0, 3000],
+    )
 
     fig = plt.figure(figsize=(6, 3), dpi=300)
     ax = fig.add_subplot(111)
@@ -1,16 +1,14 @@
 import datetime as dt
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import matplotlib.pyplot as plt
 import numpy as np
 from geopy.distance import great_circle as GC
-from joblib import Parallel, delayed
 from loguru import logger
-from tqdm import tqdm
 
-from raidpy import utils
-from raidpy.functions import Oblique
-from raidpy.plots import PlotOlRays
+from raidpy import parallel, utils
+from raidpy.plots import RayFrame, render_frames
 
 plt.style.use(["science", "ieee"])
 plt.rcParams["font.family"] = "sans-serif"
@@ -24,21 +22,6 @@ def get_w2naf_dist():
     return GC(source, target).km
 
 
-def create_ol(e, ray, b, d):
-    ol = Oblique(
-        d,
-        np.array(ray.ground_range),
-        np.array(ray.height),
-        b.rb,
-        b.olat,
-        b.olon,
-        b.freq.ravel().tolist()[0] * 1e6,
-        edens=np.array(ray.electron_density) * 1e6,  # To /m3
-        ray_details=ray,
-    )
-    return ol
-
-
 if __name__ == "__main__":
     import sys
 
@@ -69,10 +52,12 @@ if __name__ == "__main__":
     )
     dirc = f"figures/2024GAE/phase/{tfreq}_{nhop}"
 
-    for d in dates:
+    frames = []
+    executor = ProcessPoolExecutor(max_workers=n_jobs)
+    flocs = [os.path.join(folder, f"{d.strftime('%H%M')}_rt.mat") for d in dates]
+    ray_files = utils.prefetch_rays_mat_files(flocs, n_ahead=2)
+    for d, (floc, (_, rays)) in zip(dates, ray_files):
         logger.info(f"Date: {d}")
-        floc = os.path.join(folder, f"{d.strftime('%H%M')}_rt.mat")
-        _, rays = utils.load_rays_mat_file(floc)
         elvs = []
         for e in list(rays.keys()):
             ground_range = rays[e].ground_range.iloc[-1]
@@ -81,43 +66,52 @@ if __name__ == "__main__":
                 logger.info(f"Wintin limits: {ground_range} / elv:{e}")
         elvs.sort()
 
-        ols = Parallel(n_jobs=n_jobs)(
-            delayed(create_ol)(e, rays[e], b=bearing, d=d) for e in tqdm(elvs)
-        )
-
-        phs = np.array(
-            [
-                [
-                    ol.get_total_phase_along_path(None),
-                    ol.get_total_phase_along_path(None, "ah", "av_cc"),
-                    ol.get_total_phase_along_path(None, "ah", "av_mb"),
-                    ol.get_total_phase_along_path(None, "sw", "ft"),
-                ]
-                for ol in ols
-            ]
+        fan = parallel.compute_fan(
+            d,
+            rays,
+            bearing,
+            elvs=elvs,
+            quantities=[
+                ("phase", "ah", "sn", "O"),
+                ("phase", "ah", "av_cc", "O"),
+                ("phase", "ah", "av_mb", "O"),
+                ("phase", "sw", "ft", "O"),
+            ],
+            executor=executor,
         )
+        phs = fan.totals.values
         phase["ah_sn"].append(np.mod(np.median(phs[:, 0]), 2 * np.pi))
         phase["ah_cc"].append(np.mod(np.median(phs[:, 1]), 2 * np.pi))
         phase["ah_mb"].append(np.mod(np.median(phs[:, 2]), 2 * np.pi))
         phase["sw_ft"].append(np.mod(np.median(phs[:, 3]), 2 * np.pi))
 
-        if not os.path.exists(dirc + f"/{d.strftime('%H%M')}.png"):
-            pl = PlotOlRays(d, ylim=[0, 250], xlim=[0, 3000])
-            os.makedirs(dirc, exist_ok=True)
-            for i, e, ol in zip(range(len(ols)), elvs, ols):
-                ray = ol.get_phase_datasets(wave_disp_reltn, col_freq, mode)
-                txt = (
-                    f"Spot: wwv-w2naf / {tfreq} MHz "
-                    + r"/ $\theta=\theta_{ah}(\nu_{sn})$"
-                )
-                pl.lay_rays(
-                    ray,
-                    kind="phase",
-                    text=txt if i == 0 else "",
-                    tag_distance=dist if i == 0 else -1,
-                )
-            pl.save(dirc + f"/{d.strftime('%H%M')}.png")
-            pl.close()
+        key = parallel.quantity_key("phase", wave_disp_reltn, col_freq, mode)
+        txt = f"Spot: wwv-w2naf / {tfreq} MHz " + r"/ $\theta=\theta_{ah}(\nu_{sn})$"
+        frames.append(
+            RayFrame(
+                date=d,
+                rays=[
+                    rays[e][["ground_range", "height"]].assign(
+                        phase=fan.profile(e, key)
+                    )
+                    for e in elvs
+                ],
+                text=txt,
+                tag_distance=dist,
+            )
+        )
+
+    executor.shutdown()
+    render_frames(
+        frames,
+        filepaths=[dirc + f"/{f.date.strftime('%H%M')}.png" for f in frames],
+        movie=dirc + "/rays.mp4",
+        n_jobs=n_jobs,
+        overwrite=False,
+        kind="phase",
+        ylim=[0, 250],
+        xlim=[0, 3000],
+    )
 
     fig = plt.figure(figsize=(6, 3), dpi=300)
     ax = fig.add_subplot(111)
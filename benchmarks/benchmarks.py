@@ -0,0 +1,248 @@
+"""
+asv benchmarks for raidpy. Everything except the background-model suite
+runs on synthetic Chapman-layer ionospheres and parabolic rays, so no
+PHaRLAP files or model data are needed.
+
+    asv run                      # benchmark the current commit
+    asv continuous main HEAD     # compare two commits for regressions
+"""
+
+import datetime as dt
+
+import numpy as np
+from loguru import logger
+
+from raidpy import synthetic
+
+logger.disable("raidpy")
+
+DATE = dt.datetime(2024, 4, 8, 18)
+
+
+def _kernel_inputs(n_points):
+    alts = np.linspace(60, 400, n_points)
+    return alts, synthetic.synthetic_backgrounds(alts)
+
+
+class TimeSenWyllerC:
+    params = [[1.5, 2.5], [0.1, 10.0, 1e3]]
+    param_names = ["p", "y"]
+
+    def time_C(self, p, y):
+        from raidpy.absorption import C
+
+        C(p, y)
+
+
+class TimeCollision:
+    params = [[100, 1000, 10000]]
+    param_names = ["n_points"]
+
+    def setup(self, n_points):
+        _, self.bgs = _kernel_inputs(n_points)
+
+    def time_compute_collision(self, n_points):
+        from raidpy.collision import ComputeCollision
+
+        ComputeCollision(self.bgs["msise"], self.bgs["iri"], _run_=True)
+
+
+class TimeAbsorption:
+    params = [[100, 1000, 10000]]
+    param_names = ["n_points"]
+
+    def setup(self, n_points):
+        from raidpy.absorption import AppletonHartree, SenWyller
+        from raidpy.collision import ComputeCollision
+
+        _, bgs = _kernel_inputs(n_points)
+        self.coll = ComputeCollision(bgs["msise"], bgs["iri"], _run_=True).collision
+        self.bgs = bgs
+        self.init = (AppletonHartree.init, SenWyller.init)
+
+    def _absorption(self):
+        from raidpy.absorption import CalculateAbsorption
+
+        ca = CalculateAbsorption(self.bgs["iri"], self.bgs["igrf"], self.coll, 10e6)
+        ca.ah, ca.sw = self.init[0](), self.init[1]()
+        return ca
+
+    def time_estimate_ah(self, n_points):
+        self._absorption().estimate_ah()
+
+    def peakmem_estimate_ah(self, n_points):
+        self._absorption().estimate_ah()
+
+
+class TimeSenWyllerAbsorption:
+    # The SW kernel integrates C(p, y) point by point, keep it small
+    params = [[50, 200]]
+    param_names = ["n_points"]
+    timeout = 300
+
+    setup = TimeAbsorption.setup
+    _absorption = TimeAbsorption._absorption
+
+    def time_estimate_sw(self, n_points):
+        self._absorption().estimate_sw()
+
+
+class TimeSenWyllerTable:
+    params = [[1000, 100000]]
+    param_names = ["n_points"]
+
+    setup = TimeAbsorption.setup
+
+    def time_estimate_sw_table(self, n_points):
+        ca = self._absorption()
+        ca.sw_method = "table"
+        ca.estimate_sw()
+
+    _absorption = TimeAbsorption._absorption
+
+
+class TimeVerticalMap:
+    params = [[(18, 36), (90, 180)]]
+    param_names = ["grid"]
+    timeout = 600
+
+    def setup(self, grid):
+        from raidpy.ionosphere.grid import BackgroundGrid
+
+        alts = np.arange(60, 402, 2)
+        shape = grid + (len(alts),)
+        bgs = synthetic.synthetic_backgrounds(alts)
+        self.grid = BackgroundGrid(
+            DATE,
+            np.linspace(-89, 89, grid[0]),
+            np.linspace(-179, 179, grid[1]),
+            alts,
+            backgrounds={
+                m: {k: np.broadcast_to(v, shape).copy() for k, v in b.items()}
+                for m, b in bgs.items()
+            },
+        )
+
+    def time_vertical_map(self, grid):
+        from raidpy.vertical import VerticalAbsorption
+
+        VerticalAbsorption(
+            self.grid, [5e6, 10e6], [("ah", "sn", "O"), ("sw", "ft", "O")]
+        )
+
+
+class TimeWorkspace:
+    params = [[100, 1000]]
+    param_names = ["n_points"]
+
+    def setup(self, n_points):
+        from raidpy.workspace import Workspace
+
+        self.bgs = synthetic.synthetic_backgrounds(np.linspace(60, 300, n_points))
+        self.ws = Workspace(
+            10e6,
+            [(k, "ah", c, "O") for k in ["los", "phase"] for c in ["ft", "sn"]],
+            n_points,
+        )
+
+    def time_workspace_run(self, n_points):
+        self.ws.run(self.bgs["iri"], self.bgs["msise"], self.bgs["igrf"])
+
+
+class TimeRayTrace:
+    params = [[10, 50]]
+    param_names = ["n_rays"]
+    timeout = 600
+
+    def setup(self, n_rays):
+        from raidpy.raytrace import RayTracer2d
+
+        ranges, heights = np.arange(0, 3001, 10.0), np.arange(0, 500, 1.0)
+        edens = np.tile(synthetic.chapman_edens(heights), (len(ranges), 1))
+        self.tracer = RayTracer2d(ranges, heights, edens, 10e6)
+
+    def time_trace_fan(self, n_rays):
+        self.tracer.trace(np.linspace(5, 60, n_rays))
+
+
+class TimeClimatology:
+    params = [[1000, 100000]]
+    param_names = ["n_queries"]
+
+    def setup(self, n_queries):
+        from raidpy.climatology import ClimatologyTable
+
+        rng = np.random.default_rng(0)
+        shape = (21, 15, 3, 5)
+        self.table = ClimatologyTable(
+            szas=np.arange(0, 105, 5.0),
+            fos=np.geomspace(2e6, 30e6, 15),
+            f107s=np.array([70.0, 120.0, 180.0]),
+            Bos=np.linspace(2.5e-5, 6.5e-5, 5),
+            tables={"ah.sn.O": rng.random(shape).astype(np.float32)},
+        )
+        self.q = dict(
+            sza=rng.uniform(0, 100, n_queries),
+            fo=rng.uniform(2e6, 30e6, n_queries),
+            f107=rng.uniform(70, 180, n_queries),
+            Bo=rng.uniform(2.5e-5, 6.5e-5, n_queries),
+        )
+
+    def time_query(self, n_queries):
+        self.table.query("ah", "sn", "O", **self.q)
+
+
+class TimeBackgrounds:
+    """
+    IRI/MSISE/IGRF evaluation; skipped where the model libraries (or
+    their data files) are not available offline.
+    """
+
+    params = [["iri", "msise", "igrf"], [10, 100]]
+    param_names = ["model", "n_points"]
+    timeout = 600
+
+    def setup(self, model, n_points):
+        from raidpy.ionosphere.igrf13 import IGRF2d
+        from raidpy.ionosphere.iri import IRI2d
+        from raidpy.ionosphere.msise import MSISE2d
+
+        self.cls = dict(iri=IRI2d, msise=MSISE2d, igrf=IGRF2d)[model]
+        self.lats = np.linspace(35, 45, n_points)
+        self.lons = np.linspace(-105, -75, n_points)
+        self.alts = np.linspace(60, 300, n_points)
+        try:
+            self.cls(DATE, self.lats[:1], self.lons[:1], self.alts[:1])
+        except Exception:
+            raise NotImplementedError(f"{model} backend not available")
+
+    def time_compute(self, model, n_points):
+        self.cls(DATE, self.lats, self.lons, self.alts)
+
+
+class TimeOblique:
+    params = [[100, 500]]
+    param_names = ["n_points"]
+    timeout = 600
+
+    def time_oblique_end_to_end(self, n_points):
+        ol = synthetic.synthetic_oblique(n_points=n_points)
+        ol.get_total_absorption_along_path(None, "ah", "sn", "O")
+        ol.get_total_phase_along_path(None, "ah", "sn", "O")
+
+
+class TimeDoppler:
+    timeout = 600
+
+    def setup(self):
+        self.pt0 = synthetic.synthetic_oblique(n_points=100, nmax=5e11)
+        self.pt1 = synthetic.synthetic_oblique(n_points=100, nmax=5.1e11)
+
+    def time_compute_doppler(self):
+        from raidpy.doppler import ComputeDoppler
+
+        ComputeDoppler(self.pt0, self.pt1, fo=10e6, del_t=300, _run_=True)
+
+
+def timeraw_import_raidpy():
+    return "import raidpy.functions, raidpy.doppler"
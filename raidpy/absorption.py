@@ -16,8 +16,8 @@ from dataclasses import dataclass
 
 import numpy as np
 from loguru import logger
-from scipy.integrate import quad
 
+from raidpy import instrument
 from raidpy.collision import Collision
 from raidpy.constants import *
 
@@ -30,6 +30,7 @@ from raidpy.constants import *
 #
 # ===================================================================================
 def C(p, y):
+    from scipy.integrate import quad
 
     def gamma_factorial(N):
         n = int(str(N).split(".")[0])
@@ -114,6 +115,124 @@ def calculate_sw_OX(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
     return O, X
 
 
+# ===================================================================================
+# Vectorized Sen-Wyller kernels. C(p, y) is tabulated once per p on a
+# log-spaced y axis (quad at every node) and interpolated in log-log space;
+# beyond the table C(p, y) -> C(p, y_max) (y_max / y)^2 and below it
+# C(p, y) has already converged to its y -> 0 limit.
+# ===================================================================================
+_C_tables = dict()
+
+
+def tabulated_C(p, y, log_ymin=-4.0, log_ymax=8.0, n=1201):
+    """
+    Array version of C(p, y) from a cached table.
+    """
+    if p not in _C_tables:
+        ly = np.linspace(log_ymin, log_ymax, n)
+        _C_tables[p] = (ly, np.log10([C(p, 10**v) for v in ly]))
+    ly, lc = _C_tables[p]
+    y = np.abs(np.asarray(y, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lyv = np.log10(y)
+        c = 10 ** np.interp(lyv, ly, lc)
+        c = np.where(lyv > ly[-1], 10 ** lc[-1] * (10 ** ly[-1] / y) ** 2, c)
+    return c
+
+
+def tabulated_dC(p, y):
+    """
+    dC(p, y)/dy from the log-log slope of the tabulated C(p, y).
+    """
+    c = tabulated_C(p, y)
+    ly, lc = _C_tables[p]
+    y = np.abs(np.asarray(y, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lyv = np.log10(y)
+        i = np.clip(np.searchsorted(ly, lyv) - 1, 0, len(ly) - 2)
+        slope = (lc[i + 1] - lc[i]) / (ly[i + 1] - ly[i])
+        slope = np.where(lyv > ly[-1], -2.0, np.where(lyv < ly[0], 0.0, slope))
+        return c * slope / y
+
+
+def _sw_valid(Bo, Ne, nu):
+    Bo, Ne, nu = np.broadcast_arrays(
+        np.asarray(Bo, dtype=np.float64),
+        np.asarray(Ne, dtype=np.float64),
+        np.asarray(nu, dtype=np.float64),
+    )
+    with np.errstate(invalid="ignore"):
+        ok = (Ne > 0.0) & (Bo > 0.0) & (nu > 0.0)
+    return Bo, Ne, np.where(ok, nu, 1.0), ok
+
+
+def sw_indices_RL(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
+    """
+    Complex Sen-Wyller R/L refractive indices on arrays of any shape, with
+    the mask of valid points (Ne, Bo, nu > 0).
+    """
+    Bo, Ne, nu, ok = _sw_valid(Bo, Ne, nu)
+    w = 2 * np.pi * fo
+    nu_sw = nu * nu_sw_r
+    wh = pconst["q_e"] * Bo / pconst["m_e"]
+    yo, yx = (w + wh) / nu_sw, (w - wh) / nu_sw
+    a = Ne * pconst["q_e"] ** 2 / (2 * pconst["m_e"] * w * pconst["eps0"] * nu_sw)
+    nL = 1 - a * (yo * tabulated_C(1.5, yo) + (1j * 2.5 * tabulated_C(2.5, yo)))
+    nR = 1 - a * (yx * tabulated_C(1.5, yx) + (1j * 2.5 * tabulated_C(2.5, yx)))
+    return nR, nL, ok
+
+
+def sw_indices_OX(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
+    """
+    Complex Sen-Wyller O/X refractive indices on arrays of any shape, with
+    the mask of valid points (Ne, Bo, nu > 0).
+    """
+    Bo, Ne, nu, ok = _sw_valid(Bo, Ne, nu)
+    w = 2 * np.pi * fo
+    nu_sw = nu * nu_sw_r
+    wo2 = Ne * pconst["q_e"] ** 2 / (pconst["m_e"] * pconst["eps0"])
+    y = w / nu_sw
+    C15, C25 = tabulated_C(1.5, y), tabulated_C(2.5, y)
+    # yo = yx = y in the O/X case, so c = e and d = f
+    ajb = (wo2 / (w * nu_sw)) * ((y * C15) + 1.0j * (2.5 * C25))
+    c = (wo2 / (w * nu_sw)) * y * C15
+    d = 2.5 * (wo2 / (w * nu_sw)) * C15
+    e, f = c, d
+
+    eI = 1 - ajb
+    eII = 0.5 * ((f - d) + (c - e) * 1.0j)
+    eIII = ajb - (0.5 * ((c + e) + 1.0j * (d + f)))
+
+    Aa = 2 * eI * (eI + eIII)
+    Bb = (eIII * (eI + eII)) + eII**2
+    Dd = 2 * eI
+    Ee = 2 * eIII
+
+    nO = np.sqrt(Aa / (Dd + Ee))
+    nX = np.sqrt((Aa + Bb) / (Dd + Ee))
+    return nO, nX, ok
+
+
+def calculate_sw_RL_array(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
+    """
+    calculate_sw_RL on arrays of any shape with tabulated C(p, y).
+    """
+    k = (2 * np.pi * fo) / pconst["c"]
+    nR, nL, ok = sw_indices_RL(Bo, Ne, nu, fo, nu_sw_r)
+    R, L = np.abs(nR.imag * 8.68 * k * 1e3), np.abs(nL.imag * 8.68 * k * 1e3)
+    return np.where(ok, R, np.nan), np.where(ok, L, np.nan)
+
+
+def calculate_sw_OX_array(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
+    """
+    calculate_sw_OX on arrays of any shape with tabulated C(p, y).
+    """
+    k = (2 * np.pi * fo) / pconst["c"]
+    nO, nX, ok = sw_indices_OX(Bo, Ne, nu, fo, nu_sw_r)
+    O, X = np.abs(nO.imag * 8.68 * k * 1e3), np.abs(nX.imag * 8.68 * k * 1e3)
+    return np.where(ok, O, np.nan), np.where(ok, X, np.nan)
+
+
 @dataclass
 class Absorption:
     mode_O: np.array = None
@@ -164,15 +283,24 @@ class CalculateAbsorption(object):
     coll = collision frequency
     Ne = electron density
     fo = operating frequency
+    sw_method = 'quad' integrates C(p, y) point by point, 'table' evaluates
+        the Sen-Wyller kernel on whole arrays with a tabulated C(p, y)
     """
 
     def __init__(
-        self, iri: dict, igrf: dict, coll: Collision, fo: float = 30e6, _run_=False
+        self,
+        iri: dict,
+        igrf: dict,
+        coll: Collision,
+        fo: float = 30e6,
+        _run_=False,
+        sw_method: str = "quad",
     ):
         self.igrf = igrf
         self.iri = iri
         self.coll = coll
         self.fo = fo
+        self.sw_method = sw_method
         self.w = 2 * np.pi * fo
         self.k = (2 * np.pi * fo) / pconst["c"]
         if _run_:
@@ -183,6 +311,7 @@ class CalculateAbsorption(object):
             self.estimate_sw()
         return
 
+    @instrument.stage("absorption.ah", points=lambda self: np.size(self.iri["edens"]))
     def estimate_ah(self):
         # =========================================================
         # Using FT collision frequency
@@ -316,13 +445,23 @@ class CalculateAbsorption(object):
         )
         return
 
+    @instrument.stage("absorption.sw", points=lambda self: np.size(self.iri["edens"]))
     def estimate_sw(self):
         Bo = self.igrf["total"]
-        n = len(Bo)
         # ===================================================
         # Using FT collistion frequency
         # ===================================================
         nu = self.coll.nu_ft
+        if self.sw_method == "table":
+            self.sw.ft.mode_O, self.sw.ft.mode_X = calculate_sw_OX_array(
+                Bo, self.iri["edens"], nu, self.fo
+            )
+            self.sw.ft.mode_R, self.sw.ft.mode_L = calculate_sw_RL_array(
+                Bo, self.iri["edens"], nu, self.fo
+            )
+            self.sw.ft.mode_no = np.zeros_like(Bo)
+            return
+        n = len(Bo)
         (
             self.sw.ft.mode_O,
             self.sw.ft.mode_X,
@@ -344,3 +483,68 @@ class CalculateAbsorption(object):
                 Bo[i], self.iri["edens"][i], nu[i], self.fo
             )
         return
+
+    @instrument.stage(
+        "absorption.quicklook", points=lambda self, *a, **k: np.size(self.iri["edens"])
+    )
+    def estimate_quicklook(self, tolerance: float = 0.05):
+        """
+        Non-deviative absorption for screening. With n^2 = 1 - X/W and W the
+        AH mode denominator (1 - jZ for O, 1 - jZ -+ Y for R/L, 1 - jZ -
+        YT^2/(1 - jZ) for X at X << 1), n ~ 1 - X/(2W) gives
+
+            beta = 8.68 k 1e3 X |Im(1/W)| / 2,
+
+        i.e. beta ~ Ne nu / (nu^2 + (w -+ wH)^2). The relative error is
+        estimated from the next term of the expansion in X,
+
+            n ~ 1 - X/(2W) - c X^2/W^2,   c = 1/8 (+ Y^2/(2U^2) for X),
+
+        as |Im(c X^2/W^2)| / |Im(X/(2W))|, which is ~X Re(1/W)/2 (the X mode
+        term accounts for the X dependence of its W). It is an estimate of
+        the truncation error, not a bound. Where it exceeds tolerance (X
+        approaching reflection) the full AH value is used instead.
+
+        quicklook holds the absorption, quicklook_error the estimated
+        relative error per point (0 where the full kernel was used) and
+        quicklook_full the mask of the points using the full kernel.
+        """
+        self.quicklook, self.quicklook_error, self.quicklook_full = (
+            AppletonHartree.init(),
+            AppletonHartree.init(),
+            AppletonHartree.init(),
+        )
+        X = (self.iri["edens"] * pconst["q_e"] ** 2) / (
+            pconst["eps0"] * pconst["m_e"] * self.w**2
+        )
+        Y = (pconst["q_e"] * self.igrf["total"]) / (pconst["m_e"] * self.w)
+        for col_freq in ["ft", "sn", "av_cc", "av_mb"]:
+            nu = (
+                self.coll.nu_sn.total
+                if col_freq == "sn"
+                else getattr(self.coll, f"nu_{col_freq}")
+            )
+            U = 1 - 1.0j * (nu / self.w)
+            # (W at X -> 0, exact W, second-order coefficient c)
+            W = dict(O=(U, U, 1 / 8), R=(U - Y, U - Y, 1 / 8), L=(U + Y, U + Y, 1 / 8))
+            W["X"] = (U - Y**2 / U, U - Y**2 / (U - X), 1 / 8 + Y**2 / (2 * U**2))
+            ql = getattr(self.quicklook, col_freq)
+            err = getattr(self.quicklook_error, col_freq)
+            fb = getattr(self.quicklook_full, col_freq)
+            for mode, (W0, W1, c) in W.items():
+                first = np.abs((X / (2 * W0)).imag)
+                beta = 8.68 * self.k * 1e3 * first
+                e = np.divide(
+                    np.abs((c * X**2 / W0**2).imag),
+                    first,
+                    out=np.zeros_like(first),
+                    where=first > 0,
+                )
+                full = e > tolerance
+                if np.any(full):
+                    n = np.sqrt(1 - X / W1)
+                    beta = np.where(full, np.abs(8.68 * self.k * 1e3 * n.imag), beta)
+                setattr(ql, f"mode_{mode}", beta)
+                setattr(err, f"mode_{mode}", np.where(full, 0.0, e))
+                setattr(fb, f"mode_{mode}", full)
+        return
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+
+"""climatology.py: Absorption lookup tables over SZA, frequency, F10.7 and |B|"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+import itertools
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import instrument, utils
+from raidpy.absorption import AppletonHartree, CalculateAbsorption, SenWyller
+from raidpy.collision import ComputeCollision
+from raidpy.constants import pconst
+from raidpy.iono import Ionosphere2d
+from raidpy.ionosphere.pool import BackgroundPool
+from raidpy.vertical import map_key
+
+AXES = ["sza", "fo", "f107", "Bo"]
+
+
+def _axis_weights(axis: np.array, x: np.array, log: bool = False):
+    """
+    Lower indices and linear weights of x on a 1-D increasing axis; x is
+    clipped to the axis range.
+    """
+    axis, x = (np.log(axis), np.log(x)) if log else (axis, x)
+    if len(axis) == 1:
+        return np.zeros(np.shape(x), dtype=int), np.zeros(np.shape(x))
+    x = np.clip(x, axis[0], axis[-1])
+    i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+    return i, (x - axis[i]) / (axis[i + 1] - axis[i])
+
+
+@dataclass
+class ClimatologyTable:
+    """
+    Vertical-incidence absorption in dB on the grid (sza, fo, f107, Bo);
+    every table has that shape (float32) and is keyed by
+    map_key(wave_disp_reltn, col_freq, mode).
+    """
+
+    szas: np.array = None  # Solar zenith angles in deg
+    fos: np.array = None  # Operating frequencies in Hz
+    f107s: np.array = None  # Solar radio flux in sfu
+    Bos: np.array = None  # Total geomagnetic field in Tesla
+    tables: dict = field(default_factory=dict)
+
+    def query(
+        self,
+        wave_disp_reltn: str,
+        col_freq: str,
+        mode: str,
+        sza: np.array,
+        fo: np.array,
+        f107: np.array,
+        Bo: np.array,
+        elevation: np.array = None,
+        height: float = 90.0,
+    ):
+        """
+        Absorption in dB at the (broadcast) query points by multilinear
+        interpolation (linear in log fo); queries outside the grid take the
+        edge values. With elevation (deg) the oblique-equivalent absorption
+        is returned by Martyn's theorem, L(fo) = cos(phi) Lv(fo cos(phi)),
+        with phi the angle of incidence at the absorbing height (km); in the
+        1/f^2 regime this is the secant law, L(fo) = sec(phi) Lv(fo).
+        """
+        sza, fo, f107, Bo = np.broadcast_arrays(
+            *[np.asarray(v, dtype=np.float64) for v in [sza, fo, f107, Bo]]
+        )
+        sec = np.ones(np.shape(fo))
+        if elevation is not None:
+            Re = pconst["Re"] / 1e3
+            sin_phi = Re * np.cos(np.deg2rad(elevation)) / (Re + height)
+            sec = 1 / np.sqrt(1 - sin_phi**2)
+            fo = fo / sec
+        table = self.tables[map_key(wave_disp_reltn, col_freq, mode)]
+        idx = [
+            _axis_weights(self.szas, sza),
+            _axis_weights(self.fos, fo, log=True),
+            _axis_weights(self.f107s, f107),
+            _axis_weights(self.Bos, Bo),
+        ]
+        out = np.zeros(np.shape(fo))
+        for corner in itertools.product([0, 1], repeat=4):
+            w, ii = 1.0, []
+            for c, (i, u) in zip(corner, idx):
+                w = w * (u if c else 1 - u)
+                ii.append(np.minimum(i + c, table.shape[len(ii)] - 1))
+            out += w * table[tuple(ii)]
+        return out / sec
+
+    def save(self, fname: str):
+        """
+        Store the grid and tables in a compressed .npz file.
+        """
+        np.savez_compressed(
+            fname,
+            szas=self.szas,
+            fos=self.fos,
+            f107s=self.f107s,
+            Bos=self.Bos,
+            **{f"table:{k}": v for k, v in self.tables.items()},
+        )
+        return
+
+    @staticmethod
+    def load(fname: str):
+        with np.load(fname) as o:
+            return ClimatologyTable(
+                szas=o["szas"],
+                fos=o["fos"],
+                f107s=o["f107s"],
+                Bos=o["Bos"],
+                tables={
+                    k.split(":", 1)[1]: o[k] for k in o.files if k.startswith("table:")
+                },
+            )
+
+
+class AbsorptionClimatology(object):
+    """
+    This class builds ClimatologyTables from the Ionosphere2d +
+    ComputeCollision + CalculateAbsorption stack. The F10.7 axis is
+    realised by representative epochs (dates whose activity level is the
+    F10.7 value) and the SZA axis by the morning times of every epoch at
+    which the sun is at that zenith angle over the site; one vertical
+    column is evaluated per (sza, epoch). Collision frequencies do not
+    depend on the field, so |B| only enters the kernels, which are run
+    on every column for every fo and Bo. Columns are integrated up to the
+    reflection height of each mode.
+
+    Parameters:
+    -----------
+    epochs: Dictionary F10.7 (sfu) -> representative datetime
+    szas: Solar zenith angles in deg (increasing)
+    fos: Operating frequencies in Hz (increasing)
+    Bos: Total geomagnetic field in Tesla (increasing)
+    alts: Altitudes of the columns in km
+    combinations: List of (wave_disp_reltn, col_freq, mode)
+    lat, lon: Site of the columns
+    pool: Optional BackgroundPool for the Ionosphere2d evaluations
+    backgrounds: Optional callable (date, lats, lons, alts) -> backgrounds
+        dictionary as taken by Ionosphere2d
+    sw_method: Sen-Wyller kernel, 'table' (vectorized) or 'quad'
+    """
+
+    def __init__(
+        self,
+        epochs: dict,
+        szas: np.array = np.arange(0, 105, 5),
+        fos: np.array = np.geomspace(2e6, 30e6, 15),
+        Bos: np.array = np.linspace(2.5e-5, 6.5e-5, 5),
+        alts: np.array = np.arange(50, 301, 1),
+        combinations: list = [("ah", "sn", "O")],
+        lat: float = 0.0,
+        lon: float = 0.0,
+        pool: BackgroundPool = None,
+        backgrounds=None,
+        sw_method: str = "table",
+        _run_: bool = True,
+    ):
+        self.f107s = np.array(sorted(epochs), dtype=np.float64)
+        self.epochs = [epochs[f] for f in sorted(epochs)]
+        self.szas = np.asarray(szas, dtype=np.float64)
+        self.fos = np.asarray(fos, dtype=np.float64)
+        self.Bos = np.asarray(Bos, dtype=np.float64)
+        self.alts = np.asarray(alts, dtype=np.float64)
+        self.combinations = combinations
+        self.lat, self.lon = lat, lon
+        self.pool = pool
+        self.backgrounds = backgrounds
+        self.sw_method = sw_method
+        if _run_:
+            self.compute()
+        return
+
+    def sza_times(self, date: dt.datetime):
+        """
+        Morning times (UT) of the epoch day at which the solar zenith angle
+        over the site is closest to every grid value.
+        """
+        midnight = pd.Timestamp(date).normalize() - pd.Timedelta(hours=self.lon / 15)
+        times = midnight + pd.to_timedelta(np.arange(0, 12 * 60 + 1), unit="min")
+        z = utils.solar_zenith_angle(times, self.lat, self.lon)
+        if self.szas.min() < z.min() - 0.5 or self.szas.max() > z.max() + 0.5:
+            logger.warning(
+                f"SZA {z.min():.1f}-{z.max():.1f} deg reachable on {date.date()}; "
+                "grid values outside are clipped"
+            )
+        i = np.argmin(np.abs(z[None, :] - self.szas[:, None]), axis=1)
+        return [times[j].to_pydatetime() for j in i]
+
+    def column(self, date: dt.datetime):
+        """
+        Backgrounds and collision frequencies of the vertical column.
+        """
+        n = len(self.alts)
+        lats, lons = np.full(n, float(self.lat)), np.full(n, float(self.lon))
+        iono = Ionosphere2d(
+            date,
+            lats,
+            lons,
+            self.alts,
+            self.fos[0],
+            pool=self.pool,
+            backgrounds=(
+                self.backgrounds(date, lats, lons, self.alts)
+                if self.backgrounds
+                else None
+            ),
+        )
+        cc = ComputeCollision(
+            iono.msise_block.msise, iono.iri_block.iri, date=date, _run_=True
+        )
+        return iono.iri_block.iri, cc.collision
+
+    def integrate(self, iri: dict, coll, fo: float, Bo: float):
+        """
+        Vertical absorption in dB of every combination for one column.
+        """
+        igrf = dict(total=np.full(len(self.alts), Bo))
+        ca = CalculateAbsorption(iri, igrf, coll, fo, sw_method=self.sw_method)
+        ca.ah, ca.sw = AppletonHartree.init(), SenWyller.init()
+        if any(r == "ah" for r, _, _ in self.combinations):
+            ca.estimate_ah()
+        if any(r == "sw" for r, _, _ in self.combinations):
+            ca.estimate_sw()
+        w = 2 * np.pi * fo
+        X = iri["edens"] * pconst["q_e"] ** 2 / (pconst["eps0"] * pconst["m_e"] * w**2)
+        Y = pconst["q_e"] * Bo / (pconst["m_e"] * w)
+        o = dict()
+        for r, c, m in self.combinations:
+            cutoff = dict(O=1.0, X=1.0 - Y, R=1.0 - Y, L=1.0 + Y)[m]
+            below = np.cumsum(X >= cutoff) == 0
+            beta = getattr(getattr(getattr(ca, r), c), f"mode_{m}")
+            o[map_key(r, c, m)] = np.trapz(
+                np.where(below, np.nan_to_num(beta), 0.0), self.alts
+            )
+        return o
+
+    @instrument.stage(
+        "climatology.build",
+        points=lambda self: len(self.szas) * len(self.epochs) * len(self.alts),
+    )
+    def compute(self):
+        shape = (len(self.szas), len(self.fos), len(self.f107s), len(self.Bos))
+        logger.info(f"Absorption climatology on {dict(zip(AXES, shape))}")
+        self.table = ClimatologyTable(
+            szas=self.szas,
+            fos=self.fos,
+            f107s=self.f107s,
+            Bos=self.Bos,
+            tables={
+                map_key(*c): np.zeros(shape, np.float32) for c in self.combinations
+            },
+        )
+        for k, date in enumerate(self.epochs):
+            for i, t in enumerate(self.sza_times(date)):
+                iri, coll = self.column(t)
+                for (j, fo), (b, Bo) in itertools.product(
+                    enumerate(self.fos), enumerate(self.Bos)
+                ):
+                    for key, v in self.integrate(iri, coll, fo, Bo).items():
+                        self.table.tables[key][i, j, k, b] = v
+        return self.table
+
+
+if __name__ == "__main__":
+    # Oblique queries of a 1/f^2 table scale by sec(phi) at fixed fo
+    fos = np.geomspace(2e6, 30e6, 15)
+    table = ClimatologyTable(
+        szas=np.array([0.0, 90.0]),
+        fos=fos,
+        f107s=np.array([100.0]),
+        Bos=np.array([5e-5]),
+        tables={
+            "ah.sn.O": np.broadcast_to(
+                (1e14 / fos**2)[None, :, None, None], (2, 15, 1, 1)
+            ).astype(np.float32)
+        },
+    )
+    fo, elevation, height = np.array([8e6, 12e6, 20e6]), 20.0, 90.0
+    Re = pconst["Re"] / 1e3
+    sec = 1 / np.cos(np.arcsin(Re * np.cos(np.deg2rad(elevation)) / (Re + height)))
+    Lv = table.query("ah", "sn", "O", 30.0, fo, 100.0, 5e-5)
+    L = table.query("ah", "sn", "O", 30.0, fo, 100.0, 5e-5, elevation, height)
+    assert np.allclose(L / Lv, sec, rtol=5e-3), (L / Lv, sec)
+    logger.info(f"Oblique/vertical {L / Lv} against sec(phi) {sec:.4f}")
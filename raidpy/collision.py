@@ -17,9 +17,20 @@ from dataclasses import dataclass
 import numpy as np
 from loguru import logger
 
+from raidpy import instrument
 from raidpy.constants import pconst
 
 
+# Schunk-Nagy electron-neutral rates: species -> (coefficient, f(Te, sqrt(Te)))
+SN_EN = dict(
+    N2=(2.33e-11, lambda Te, sTe: (1 - (1.12e-4 * Te)) * Te),
+    O2=(1.82e-10, lambda Te, sTe: (1 + (3.6e-2 * sTe)) * sTe),
+    O=(8.9e-11, lambda Te, sTe: (1 + (5.7e-4 * Te)) * sTe),
+    He=(4.6e-10, lambda Te, sTe: sTe),
+    H=(4.5e-9, lambda Te, sTe: (1 - (1.35e-4 * Te)) * sTe),
+)
+
+
 @dataclass
 class Collision_en:
     N2: np.array = None
@@ -52,6 +63,36 @@ class Collision:
     nu_sn: Collision_SN = None
 
 
+def ion_electron_collision_frequency(Ne, Te, Ti, Ni, gamma=0.5572, zi=2):
+    """
+    Schunk-Nagy electron-ion collision frequency of one ion species.
+
+    Ne <float> = Electron density in m^-3
+    Te <float> = Electron temperature in K
+    Ti <float> = Ion temperature in K
+    Ni <float> = Ion density (as the IRI ion composition key)
+    zi <integer 1/2> = Ion Z number
+    """
+    e = pconst["q_e"]
+    k = pconst["boltz"]
+    me = pconst["m_e"]
+    k_e = 1 / (4 * np.pi * pconst["eps0"])
+    ki2 = 4 * np.pi * Ni * 1e6 * e**2 * zi**2 * k_e / (k * Ti)
+    ke2 = 4 * np.pi * Ne * e**2 * k_e / (k * Te)
+    ke = np.sqrt(ke2)
+    lam = np.log(4 * k * Te / (gamma**2 * zi * e**2 * k_e * ke)) - (
+        ((ke2 + ki2) / ki2) * np.log(np.sqrt((ke2 + ki2) / ke2))
+    )
+    return (
+        4
+        * np.sqrt(2 * np.pi)
+        * Ni
+        * (zi * e**2 * k_e) ** 2
+        * lam
+        / (3 * np.sqrt(me) * (k * Te) ** (1.5))
+    )
+
+
 class ComputeCollision(object):
     """
     This class is a global class to estimate any types atmosphreic collision profile.
@@ -68,7 +109,7 @@ class ComputeCollision(object):
         self.collision = Collision()
         self.date = date
         if date:
-            logger.info(f"Compute the collison for {date}")
+            logger.debug("Compute the collison for {}", date)
         if _run_:
             self.collision.nu_sn = Collision_SN()
             self.collision.nu_sn.en = Collision_en()
@@ -82,6 +123,9 @@ class ComputeCollision(object):
             self.calculate_SN_ei_collision_frequency()
         return
 
+    @instrument.stage(
+        "collision.ft", points=lambda self, *a, **k: np.size(self.iri["etemp"])
+    )
     def calculate_FT_collision_frequency(self, frac=1.0):
         """
         This method only provides the Friedrich-Tonker electron neutral collision frequency
@@ -94,8 +138,9 @@ class ComputeCollision(object):
         nu <float> = collision frequency
         https://azformula.com/physics/dimensional-formulae/what-is-dimensional-formula-of-temperature/
         """
-        logger.info(
-            f"Compute the Friedrich-Tonker electron neutral collision frequency // with a={frac}"
+        logger.debug(
+            "Compute the Friedrich-Tonker electron neutral collision frequency // with a={}",
+            frac,
         )
         p = self.msise["t_nn"] * self.msise["Tn"] * pconst["boltz"]
         nu = (2.637e6 / np.sqrt(self.iri["etemp"]) + 4.945e5) * p
@@ -113,6 +158,9 @@ class ComputeCollision(object):
         nu = 3.8e-11 * self.msise["t_nn"]
         return nu
 
+    @instrument.stage(
+        "collision.sn_ei", points=lambda self, *a, **k: np.size(self.iri["etemp"])
+    )
     def calculate_SN_ei_collision_frequency(self, gamma=0.5572, zi=2):
         """
         This method provides electron ion collision frequency profile, nu_ei
@@ -125,32 +173,19 @@ class ComputeCollision(object):
 
         nu <float> = collision frequency
         """
-        logger.warning(f"Compute the Schank-Nagy ion (n/e) collision frequency")
+        logger.debug("Compute the Schank-Nagy ion (n/e) collision frequency")
         key_maps = dict(O2p="o2", Op="o")
-        e = pconst["q_e"]
-        k = pconst["boltz"]
-        me = pconst["m_e"]
-        eps0 = pconst["eps0"]
-        k_e = 1 / (4 * np.pi * eps0)
         for key in key_maps.keys():
-            Ni = self.iri[key_maps[key]]
-            ki2 = 4 * np.pi * Ni * 1e6 * e**2 * zi**2 * k_e / (k * self.iri["itemp"])
-            ke2 = 4 * np.pi * self.iri["edens"] * e**2 * k_e / (k * self.iri["etemp"])
-            ki = np.sqrt(ki2)
-            ke = np.sqrt(ke2)
-            lam = np.log(
-                4 * k * self.iri["etemp"] / (gamma**2 * zi * e**2 * k_e * ke)
-            ) - (((ke2 + ki2) / ki2) * np.log(np.sqrt((ke2 + ki2) / ke2)))
             setattr(
                 self.collision.nu_sn.ei,
                 key,
-                (
-                    4
-                    * np.sqrt(2 * np.pi)
-                    * Ni
-                    * (zi * e**2 * k_e) ** 2
-                    * lam
-                    / (3 * np.sqrt(me) * (k * self.iri["etemp"]) ** (1.5))
+                ion_electron_collision_frequency(
+                    self.iri["edens"],
+                    self.iri["etemp"],
+                    self.iri["itemp"],
+                    self.iri[key_maps[key]],
+                    gamma,
+                    zi,
                 ),
             )
         self.collision.nu_sn.ei.total = (
@@ -159,42 +194,20 @@ class ComputeCollision(object):
         self.collision.nu_sn.total += self.collision.nu_sn.ei.total
         return
 
+    @instrument.stage(
+        "collision.sn_en", points=lambda self, *a, **k: np.size(self.iri["etemp"])
+    )
     def calculate_SN_en_collision_frequency(self):
         """
         This method provides electron neutral collision frequency profile, nu_en
         """
-        logger.warning(f"Compute the Schank-Nagy electron neutral collision frequency")
-        self.collision.nu_sn.en.N2 = (
-            1e-6
-            * 2.33e-11
-            * self.msise["N2"]
-            * (1 - (1.12e-4 * self.iri["etemp"]))
-            * self.iri["etemp"]
-        )
-        self.collision.nu_sn.en.O2 = (
-            1e-6
-            * 1.82e-10
-            * self.msise["O2"]
-            * (1 + (3.6e-2 * np.sqrt(self.iri["etemp"])))
-            * np.sqrt(self.iri["etemp"])
-        )
-        self.collision.nu_sn.en.O = (
-            1e-6
-            * 8.9e-11
-            * self.msise["O"]
-            * (1 + (5.7e-4 * self.iri["etemp"]))
-            * np.sqrt(self.iri["etemp"])
-        )
-        self.collision.nu_sn.en.He = (
-            1e-6 * 4.6e-10 * self.msise["He"] * np.sqrt(self.iri["etemp"])
-        )
-        self.collision.nu_sn.en.H = (
-            1e-6
-            * 4.5e-9
-            * self.msise["H"]
-            * (1 - (1.35e-4 * self.iri["etemp"]))
-            * np.sqrt(self.iri["etemp"])
-        )
+        logger.debug("Compute the Schank-Nagy electron neutral collision frequency")
+        Te = self.iri["etemp"]
+        sTe = np.sqrt(Te)
+        for s, (coef, f) in SN_EN.items():
+            setattr(
+                self.collision.nu_sn.en, s, 1e-6 * coef * self.msise[s] * f(Te, sTe)
+            )
         self.collision.nu_sn.en.total = (
             self.collision.nu_sn.en.N2
             + self.collision.nu_sn.en.O2
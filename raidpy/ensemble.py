@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""ensemble.py: Monte Carlo ensembles of path-integrated absorption, phase and Doppler"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import absorption, instrument, phase
+from raidpy.collision import Collision, Collision_SN, ComputeCollision
+from raidpy.constants import pconst
+from raidpy.functions import Oblique
+from raidpy.parallel import quantity_key
+
+
+@dataclass
+class Perturbation:
+    """
+    Relative 1-sigma uncertainties; every member draws one log-normal
+    factor (median 1) per input, applied along the whole path.
+
+    edens: Electron density
+    etemp: Electron temperature
+    nu_scale: Scaling of all collision frequencies
+    nu_sw_r: Sen-Wyller collision frequency ratio
+    """
+
+    edens: float = 0.1
+    etemp: float = 0.1
+    nu_scale: float = 0.2
+    nu_sw_r: float = 0.1
+
+    def sample(self, n_members: int, seed: int = None):
+        rng = np.random.default_rng(seed)
+        return pd.DataFrame(
+            {
+                k: np.exp(getattr(self, k) * rng.standard_normal(n_members))
+                for k in ["edens", "etemp", "nu_scale", "nu_sw_r"]
+            }
+        )
+
+
+@dataclass
+class EnsembleResults:
+    """
+    samples: One row per member with the path integrals ('los.*' in dB,
+        'phase.*' in radian, 'doppler.*' in Hz)
+    factors: The perturbation factors of every member
+    """
+
+    samples: pd.DataFrame = None
+    factors: pd.DataFrame = None
+
+    def quantiles(self, q: list = [0.05, 0.5, 0.95]):
+        return self.samples.quantile(q)
+
+
+class Ensemble(object):
+    """
+    This class perturbs the inputs of an Oblique along a leading ensemble
+    axis and pushes the (member, point) arrays through the collision and
+    AH/SW kernels at once.
+
+    Parameters:
+    -----------
+    ol: Oblique at time t0 (its backgrounds and path are reused)
+    combinations: List of (wave_disp_reltn, col_freq, mode)
+    n_members: Ensemble size
+    perturbation: Perturbation magnitudes
+    ol1: Optional Oblique at t0 + del_t; the Doppler shift of every member
+        is then estimated with the same perturbation factors
+    del_t: Time between ol and ol1 in secs
+    chunk_size: Members evaluated together (bounds memory)
+    """
+
+    def __init__(
+        self,
+        ol: Oblique,
+        combinations: list = [("ah", "sn", "O")],
+        n_members: int = 200,
+        perturbation: Perturbation = Perturbation(),
+        ol1: Oblique = None,
+        del_t: float = 60.0,
+        chunk_size: int = 256,
+        seed: int = None,
+        _run_: bool = True,
+    ):
+        self.ol = ol
+        self.combinations = combinations
+        self.n_members = n_members
+        self.perturbation = perturbation
+        self.ol1 = ol1
+        self.del_t = del_t
+        self.chunk_size = chunk_size
+        self.seed = seed
+        if _run_:
+            self.compute()
+        return
+
+    def compute(self):
+        logger.info(f"Running an ensemble of {self.n_members} members")
+        factors = self.perturbation.sample(self.n_members, self.seed)
+        chunks = []
+        for start in range(0, self.n_members, self.chunk_size):
+            f = factors.iloc[start : start + self.chunk_size]
+            totals = self.integrate(self.ol, f)
+            if self.ol1 is not None:
+                p1 = self.integrate(self.ol1, f, kinds=["phase"])
+                for r, c, m in self.combinations:
+                    dp = (
+                        totals[quantity_key("phase", r, c, m)]
+                        - p1[quantity_key("phase", r, c, m)]
+                    )
+                    df = dp / (self.del_t * 4 * np.pi)
+                    totals[quantity_key("doppler", r, c, m)] = df
+                    totals[quantity_key("doppler_v", r, c, m)] = (
+                        df * pconst["c"] / (2 * self.ol.fo)
+                    )
+            chunks.append(pd.DataFrame(totals))
+        self.results = EnsembleResults(
+            samples=pd.concat(chunks, ignore_index=True), factors=factors
+        )
+        return self.results
+
+    @instrument.stage(
+        "ensemble.integrate",
+        points=lambda self, ol, f, *a, **k: len(f) * len(ol.ray),
+    )
+    def integrate(self, ol: Oblique, f: pd.DataFrame, kinds: list = ["los", "phase"]):
+        """
+        Path integrals of every combination for the members in f.
+        """
+        e = lambda k: np.asarray(f[k])[:, None]  # (member, 1)
+        iri = {k: np.asarray(v)[None, :] for k, v in ol.iono.iri_block.iri.items()}
+        iri["edens"] = iri["edens"] * e("edens")
+        iri["etemp"] = iri["etemp"] * e("etemp")
+        msise = {
+            k: np.asarray(v)[None, :] for k, v in ol.iono.msise_block.msise.items()
+        }
+        igrf = {k: np.asarray(v)[None, :] for k, v in ol.iono.igrf_block.igrf.items()}
+        cc = ComputeCollision(msise, iri, _run_=True).collision
+        s = e("nu_scale")
+        coll = Collision(
+            nu_ft=cc.nu_ft * s,
+            nu_av_cc=cc.nu_av_cc * s,
+            nu_av_mb=cc.nu_av_mb * s,
+            nu_sn=Collision_SN(total=cc.nu_sn.total * s),
+        )
+        # nu_sw_r only enters the Sen-Wyller kernel through nu * nu_sw_r
+        coll_sw = Collision(nu_ft=coll.nu_ft * e("nu_sw_r"))
+        phase_path = np.asarray(ol.ray_details.phase_path)
+        totals = dict()
+        for kind in kinds:
+            mod = absorption if kind == "los" else phase
+            cls = mod.CalculateAbsorption if kind == "los" else mod.CalculatePhase
+            models = dict()
+            for r in set(r for r, _, _ in self.combinations):
+                models[r] = cls(
+                    iri,
+                    igrf,
+                    coll if r == "ah" else coll_sw,
+                    ol.fo,
+                    sw_method="table",
+                )
+                models[r].ah, models[r].sw = (
+                    mod.AppletonHartree.init(),
+                    mod.SenWyller.init(),
+                )
+                getattr(models[r], f"estimate_{r}")()
+            for r, c, m in self.combinations:
+                p = getattr(getattr(getattr(models[r], r), c), f"mode_{m}")
+                p = np.broadcast_to(p, (len(f), len(phase_path)))
+                totals[quantity_key(kind, r, c, m)] = np.trapz(
+                    np.nan_to_num(p), phase_path, axis=-1
+                )
+        return totals
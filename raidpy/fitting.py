@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+"""fitting.py: Fit collision-frequency scale factors to observed absorption"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import instrument, utils
+from raidpy.sensitivity import (
+    absorption_derivatives,
+    ah_index,
+    collision_profile,
+    sw_index,
+)
+
+
+@dataclass
+class FitResults:
+    """
+    factors: One row per group with the fitted scale, its RMSE in dB and
+        the number of observations
+    observations: One row per observation with the observed and modeled
+        absorption at the fitted scale
+    """
+
+    factors: pd.DataFrame = None
+    observations: pd.DataFrame = None
+
+
+class ScaleFit(object):
+    """
+    This class fits a scale factor s of the collision frequency, nu -> s nu,
+    per group of observations (e.g. per time or per link) against observed
+    path-integrated absorption. For col_freq 'ft' s is the 'frac' of
+    calculate_FT_collision_frequency; for the Sen-Wyller relation, which
+    only depends on nu * nu_sw_r, s is the nu_sw_r of calculate_sw_*.
+
+    The per-point edens, Bo and unit-scale nu of every Oblique are cached
+    once. A log-spaced grid of candidates is then evaluated for all groups
+    in one broadcast (candidate, point) pass, and the best candidate of
+    every group is polished by Gauss-Newton steps in log(s) that use the
+    analytic d(beta)/d(nu) of the kernels.
+
+    Parameters:
+    -----------
+    obliques: List of Oblique, one per observation
+    observed: Observed absorption in dB, one per observation
+    groups: Group label of every observation (one scale per group);
+        None fits a single scale
+    wave_disp_reltn: 'ah' or 'sw'
+    col_freq: Collision frequency model (ft, sn, av_cc, av_mb)
+    mode: O, X, R or L
+    bounds: Lower and upper limit of the scale
+    n_candidates: Size of the candidate grid
+    n_iter: Gauss-Newton iterations after the grid search
+    """
+
+    def __init__(
+        self,
+        obliques: list,
+        observed: np.array,
+        groups: list = None,
+        wave_disp_reltn: str = "ah",
+        col_freq: str = "ft",
+        mode: str = "O",
+        bounds: tuple = (0.1, 10.0),
+        n_candidates: int = 64,
+        n_iter: int = 5,
+        _run_: bool = True,
+    ):
+        self.obliques = obliques
+        self.observed = np.asarray(observed, dtype=np.float64)
+        self.groups = groups if groups is not None else np.zeros(len(obliques))
+        self.wave_disp_reltn = wave_disp_reltn
+        self.col_freq = col_freq
+        self.mode = mode
+        self.bounds = bounds
+        self.n_candidates = n_candidates
+        self.n_iter = n_iter
+        self.cache()
+        if _run_:
+            self.fit()
+        return
+
+    def cache(self):
+        """
+        Concatenate the per-point inputs and trapezoid weights of all paths.
+        """
+        cols = dict(edens=[], nu=[], Bo=[], fo=[], weights=[])
+        for ol in self.obliques:
+            n = len(ol.ray)
+            cols["edens"].append(np.asarray(ol.iono.iri_block.iri["edens"]))
+            cols["nu"].append(
+                np.asarray(collision_profile(ol.iono.cc.collision, self.col_freq))
+            )
+            cols["Bo"].append(np.asarray(ol.iono.igrf_block.igrf["total"]))
+            cols["fo"].append(np.full(n, ol.fo))
+            cols["weights"].append(
+                utils.trapz_weights(np.asarray(ol.ray_details.phase_path))
+            )
+        self.points = {k: np.concatenate(v).astype(np.float64) for k, v in cols.items()}
+        sizes = [len(ol.ray) for ol in self.obliques]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.labels, self.group_index = np.unique(
+            np.asarray(self.groups), return_inverse=True
+        )
+        # Observation -> group one-hot, (n_obs, n_groups)
+        self.onehot = np.eye(len(self.labels))[self.group_index]
+        self.point_group = np.repeat(self.group_index, sizes)
+        return
+
+    @instrument.stage(
+        "fitting.model", points=lambda self, s, *a, **k: np.size(s) // len(self.labels)
+    )
+    def model(self, scales: np.array, gradient: bool = False):
+        """
+        Modeled absorption of every observation for scales of shape
+        (n, n_groups); returns (n, n_obs) and optionally d/d(log s).
+        """
+        s = np.atleast_2d(scales)[:, self.point_group]  # (n, point)
+        p = self.points
+        nu = p["nu"] * s
+        if self.wave_disp_reltn == "ah":
+            n, dNe, dnu = ah_index(p["edens"], nu, p["Bo"], p["fo"], self.mode)
+        else:
+            n, dNe, dnu = sw_index(p["edens"], nu, p["Bo"], p["fo"], self.mode)
+        beta, _, dbeta = absorption_derivatives(n, dNe, dnu, p["fo"])
+        starts = self.offsets[:-1]
+        totals = np.add.reduceat(np.nan_to_num(beta) * p["weights"], starts, axis=1)
+        if not gradient:
+            return totals
+        # d(beta)/d(log s) = d(beta)/d(nu) * nu
+        dlog = np.nan_to_num(dbeta * nu) * p["weights"]
+        return totals, np.add.reduceat(dlog, starts, axis=1)
+
+    def sse(self, totals: np.array):
+        """
+        Sum of squared residuals per group, (n, n_groups).
+        """
+        return ((totals - self.observed) ** 2) @ self.onehot
+
+    def fit(self):
+        logger.info(
+            f"Fitting {len(self.labels)} scale(s) of {self.wave_disp_reltn}:{self.col_freq}:{self.mode}"
+        )
+        lo, hi = np.log(self.bounds[0]), np.log(self.bounds[1])
+        grid = np.linspace(lo, hi, self.n_candidates)
+        cand = np.repeat(grid[:, None], len(self.labels), axis=1)
+        best = grid[np.argmin(self.sse(self.model(np.exp(cand))), axis=0)]
+        for _ in range(self.n_iter):
+            totals, J = self.model(np.exp(best)[None, :], gradient=True)
+            r = (totals - self.observed)[0]
+            g, H = (J[0] * r) @ self.onehot, (J[0] ** 2) @ self.onehot
+            step = np.where(H > 0, -g / np.where(H > 0, H, 1.0), 0.0)
+            trial = np.clip(best + step, lo, hi)
+            # Keep a step only where it lowers the misfit of the group
+            e = self.sse(self.model(np.exp(np.stack([best, trial]))))
+            best = np.where(e[1] < e[0], trial, best)
+        totals = self.model(np.exp(best)[None, :])[0]
+        n_obs = self.onehot.sum(axis=0)
+        self.results = FitResults(
+            factors=pd.DataFrame(
+                dict(
+                    group=self.labels,
+                    scale=np.exp(best),
+                    rmse=np.sqrt(self.sse(totals[None, :])[0] / n_obs),
+                    n_obs=n_obs.astype(int),
+                )
+            ),
+            observations=pd.DataFrame(
+                dict(
+                    group=np.asarray(self.groups),
+                    observed=self.observed,
+                    modeled=totals,
+                )
+            ),
+        )
+        return self.results
+
+
+def fit_scale_factors(
+    obliques: list,
+    observed: np.array,
+    groups: list = None,
+    **kwargs,
+):
+    """
+    Fit the collision-frequency scale per group and return the FitResults;
+    keyword arguments go to ScaleFit.
+    """
+    return ScaleFit(obliques, observed, groups, **kwargs).results
@@ -18,9 +18,9 @@ import numpy as np
 import pandas as pd
 from loguru import logger
 
-from raidpy import utils
+from raidpy import instrument, utils
 from raidpy.iono import Ionosphere2d
-from raidpy.plots import PlotOlRays
+from raidpy.ionosphere.pool import BackgroundPool
 
 
 class Oblique(object):
@@ -42,6 +42,7 @@ class Oblique(object):
         msise: dict = None,
         edens: np.array = None,
         ray_details: pd.DataFrame = pd.DataFrame(),
+        pool: BackgroundPool = None,
     ):
         self.date = date
         self.ground_range = grange
@@ -55,6 +56,7 @@ class Oblique(object):
         self.msise = msise
         self.igrf2d = igrf2d
         self.ray_details = ray_details
+        self.pool = pool
         self.initialize()
         return
 
@@ -64,7 +66,15 @@ class Oblique(object):
             self.ground_range, self.ray_bearing, self.origin_lat, self.origin_lon
         )
         self.galts = np.array(self.height)
-        self.iono = Ionosphere2d(self.date, self.glats, self.glons, self.galts, self.fo)
+        self.iono = Ionosphere2d(
+            self.date,
+            self.glats,
+            self.glons,
+            self.galts,
+            self.fo,
+            pool=self.pool,
+            backgrounds=dict(iri=self.ion2d, msise=self.msise, igrf=self.igrf2d),
+        )
         if self.edens is not None:
             logger.info(f"change e-dens")
             self.iono.iri_block.iri["edens"] = self.edens
@@ -79,6 +89,8 @@ class Oblique(object):
         col_freq: str = "sn",
         mode: str = "O",
     ):
+        if wave_disp_reltn == "quicklook" and not hasattr(self.iono.ca, "quicklook"):
+            self.iono.ca.estimate_quicklook()
         _a = getattr(
             getattr(getattr(self.iono.ca, wave_disp_reltn), col_freq), f"mode_{mode}"
         )
@@ -92,9 +104,10 @@ class Oblique(object):
             self.total_free_path_los = 10 * np.log10(
                 1.0 / ray.geometric_distance.iloc[-1]
             )
-            logger.info(f"Total free path LoS {self.total_free_path_los}")
+            logger.debug("Total free path LoS {}", self.total_free_path_los)
         return ray
 
+    @instrument.stage("integral.absorption", points=lambda self, *a, **k: len(self.ray))
     def get_total_absorption_along_path(
         self,
         phase_path: np.array,
@@ -106,7 +119,7 @@ class Oblique(object):
         phase_path = phase_path if phase_path is not None else ray.phase_path
         ray.fillna(0, inplace=True)
         total_absorption = np.trapz(ray.los, phase_path)
-        logger.info(f"Total absorption {total_absorption} dB")
+        logger.debug("Total absorption {} dB", total_absorption)
         return total_absorption
 
     def plot_absorption(
@@ -118,6 +131,8 @@ class Oblique(object):
         fig_path: str = "figures/test_figures.png",
         text: str = None,
     ):
+        from raidpy.plots import PlotOlRays
+
         logger.info(f"Plotting for {self.date} for {wave_disp_reltn}:{col_freq}")
         pol = PlotOlRays(self.date)
         ray = self.get_absorption_datasets(wave_disp_reltn, col_freq, mode)
@@ -151,6 +166,7 @@ class Oblique(object):
         ray["phase"] = p
         return ray
 
+    @instrument.stage("integral.phase", points=lambda self, *a, **k: len(self.ray))
     def get_total_phase_along_path(
         self,
         phase_path: np.array,
@@ -162,5 +178,80 @@ class Oblique(object):
         phase_path = phase_path if phase_path is not None else ray.phase_path
         ray.fillna(0, inplace=True)
         total_phase = np.trapz(ray["phase"], phase_path)
-        logger.info(f"Total phase {total_phase} radian")
+        logger.debug("Total phase {} radian", total_phase)
         return total_phase
+
+    @instrument.stage("integral.hops", points=lambda self, *a, **k: len(self.ray))
+    def get_hop_integrals(
+        self,
+        phase_path: np.array = None,
+        quantities: list = [("los", "ah", "sn", "O")],
+        ground_tol: float = 1.0,
+    ):
+        """
+        Absorption ('los', dB) and phase ('phase', radian) of every hop
+        with its ground range and path length, one row per hop. The hops
+        are split at the ground reflections and all quantities are
+        integrated in one segmented pass; the hops sum to the totals.
+        """
+        from raidpy.parallel import quantity_key
+
+        ray = (
+            self.ray_details
+            if self.ray_details is not None and len(self.ray_details) == len(self.ray)
+            else self.ray
+        )
+        phase_path = np.asarray(
+            phase_path if phase_path is not None else ray.phase_path,
+            dtype=np.float64,
+        )
+        starts, ends, _ = utils.hop_segments(np.asarray(self.height), None, ground_tol)
+        y = np.stack(
+            [
+                getattr(
+                    getattr(
+                        getattr(self.iono.ca if k == "los" else self.iono.cp, r), c
+                    ),
+                    f"mode_{m}",
+                )
+                for k, r, c, m in quantities
+            ]
+        )
+        totals = utils.hop_integrals(y, phase_path, starts)
+        grange = np.asarray(self.ground_range)
+        hops = pd.DataFrame(
+            dict(
+                hop=np.arange(len(starts)) + 1,
+                ground_range_start=grange[starts],
+                ground_range_end=grange[ends],
+                path_length=phase_path[ends] - phase_path[starts],
+            )
+        )
+        for q, t in zip(quantities, totals):
+            hops[quantity_key(*q)] = t
+        logger.info(f"Integrated {len(hops)} hop(s)")
+        return hops
+
+    def get_quicklook_error(
+        self,
+        phase_path: np.array = None,
+        col_freq: str = "sn",
+        mode: str = "O",
+    ):
+        """
+        Estimated error in dB of the quicklook total absorption (the path
+        integral of the next-order term of the expansion; an estimate, not
+        a bound) and the fraction of points where the full AH kernel was
+        used.
+        """
+        if not hasattr(self.iono.ca, "quicklook"):
+            self.iono.ca.estimate_quicklook()
+        ray = self.get_absorption_datasets("quicklook", col_freq, mode)
+        phase_path = phase_path if phase_path is not None else ray.phase_path
+        e = getattr(getattr(self.iono.ca.quicklook_error, col_freq), f"mode_{mode}")
+        beta = np.nan_to_num(np.asarray(ray.los, dtype=np.float64))
+        error = np.trapz(beta * np.asarray(e), phase_path)
+        full = getattr(getattr(self.iono.ca.quicklook_full, col_freq), f"mode_{mode}")
+        fallback = float(np.mean(full))
+        logger.info(f"Quicklook error {error} dB, {fallback*100:.1f}% full kernel")
+        return dict(error=error, full_kernel_fraction=fallback)
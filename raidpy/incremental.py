@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+"""incremental.py: Incremental absorption and phase of rays tracked across time steps"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import instrument
+from raidpy.iono import Ionosphere2d
+from raidpy.ionosphere.drivers import Drivers
+from raidpy.ionosphere.pool import BackgroundPool
+from raidpy.kernels import point_profiles
+from raidpy.parallel import quantity_key
+
+
+class IncrementalFan(object):
+    """
+    This class keeps the per-point backgrounds, profiles and trapezoid
+    contributions of a fan (a single ray is a fan of one) between time
+    steps. update() diffs the new points against the previous step:
+    backgrounds are re-evaluated only where the geometry moved beyond
+    geo_tol/alt_tol, collisions and kernels only where the geometry or
+    the electron density moved beyond edens_rtol/edens_atol from the value
+    its profile was computed with, and the path integrals are patched
+    with the difference of the contributions of the segments touching
+    those points. Density changes below the tolerance are not dropped
+    silently: they accumulate against the computed value and their
+    first-order effect is reported as the patch error of every total.
+    Without an external edens, IRI is re-evaluated on every new date so
+    its density follows time; MSISE and IGRF of unmoved points are kept
+    until refresh has passed since the last full evaluation.
+
+    Parameters:
+    -----------
+    fo: Operating frequency in Hz
+    quantities: List of (kind, wave_disp_reltn, col_freq, mode) with kind
+        'los' (absorption in dB) or 'phase'
+    geo_tol: Latitude/longitude change in deg counted as a move
+    alt_tol: Altitude change in km counted as a move
+    edens_rtol, edens_atol: Electron density change counted as a change,
+        |dNe| > edens_atol + edens_rtol |Ne|, with edens_atol in [m-3];
+        relative only by default, as D-region points of small Ne carry
+        much of the absorption
+    refresh: Re-evaluate everything once the date moved by this much
+        (never by default)
+    pool: Optional BackgroundPool for the Ionosphere2d evaluations
+    backgrounds: Optional callable (date, lats, lons, alts) -> backgrounds
+        dictionary as taken by Ionosphere2d
+    drivers: Optional pre-resolved geophysical drivers
+    sw_method: Sen-Wyller kernel, 'table' (vectorized) or 'quad'
+    """
+
+    def __init__(
+        self,
+        fo: float,
+        quantities: list = [("los", "ah", "sn", "O")],
+        geo_tol: float = 1e-4,
+        alt_tol: float = 1e-2,
+        edens_rtol: float = 1e-3,
+        edens_atol: float = 0.0,
+        refresh: dt.timedelta = None,
+        iri_version: int = 20,
+        pool: BackgroundPool = None,
+        backgrounds=None,
+        drivers: Drivers = None,
+        sw_method: str = "table",
+    ):
+        self.fo = fo
+        self.quantities = quantities
+        self.keys = [quantity_key(*q) for q in quantities]
+        self.geo_tol = geo_tol
+        self.alt_tol = alt_tol
+        self.edens_rtol = edens_rtol
+        self.edens_atol = edens_atol
+        self.refresh = refresh
+        self.iri_version = iri_version
+        self.pool = pool
+        self.backgrounds = backgrounds
+        self.drivers = drivers
+        self.sw_method = sw_method
+        self.previous = None
+        return
+
+    def evaluate(
+        self,
+        date: dt.datetime,
+        lats,
+        lons,
+        alts,
+        sel: np.array,
+        models: tuple = ("iri", "msise", "igrf"),
+    ):
+        """
+        Backgrounds of the selected points written into the stored ones;
+        the stored values of the models not listed are reused.
+        """
+        args = (lats[sel], lons[sel], alts[sel])
+        bgs = self.backgrounds(date, *args) if self.backgrounds else dict()
+        bgs = {m: v for m, v in bgs.items() if m in models}
+        bgs.update(
+            {
+                m: {k: v[sel] for k, v in self.bgs[m].items()}
+                for m in self.bgs
+                if m not in models
+            }
+        )
+        iono = Ionosphere2d(
+            date,
+            *args,
+            self.fo,
+            self.iri_version,
+            pool=self.pool,
+            backgrounds=bgs,
+            drivers=self.drivers,
+        )
+        blocks = dict(
+            iri=iono.iri_block.iri,
+            msise=iono.msise_block.msise,
+            igrf=iono.igrf_block.igrf,
+        )
+        for m, block in blocks.items():
+            if m not in models:
+                continue
+            for k, v in block.items():
+                self.bgs[m].setdefault(k, np.zeros(len(lats)))[sel] = v
+        return
+
+    def contributions(self, x: np.array, profiles: dict, segs: np.array):
+        """
+        Trapezoid contributions of the segments segs (point i to i + 1).
+        """
+        dx = x[segs + 1] - x[segs]
+        return {
+            k: 0.5 * (np.nan_to_num(p[segs]) + np.nan_to_num(p[segs + 1])) * dx
+            for k, p in profiles.items()
+        }
+
+    @instrument.stage(
+        "incremental.update", points=lambda self, date, lats, *a, **k: len(lats)
+    )
+    def update(
+        self,
+        date: dt.datetime,
+        lats: np.array,
+        lons: np.array,
+        alts: np.array,
+        phase_path: np.array,
+        edens: np.array = None,
+        offsets: np.array = None,
+    ):
+        """
+        Path integrals of the fan at date. The rays are concatenated with
+        offsets as in FanResults (one ray by default); edens in [m-3]
+        replaces IRI's as in Oblique.
+
+        Returns the totals, one row per ray.
+        """
+        lats, lons, alts, x = [
+            np.asarray(a, dtype=np.float64) for a in [lats, lons, alts, phase_path]
+        ]
+        n = len(alts)
+        offsets = np.array([0, n] if offsets is None else offsets, dtype=np.int64)
+        p = self.previous
+        full = (
+            p is None
+            or len(p["alts"]) != n
+            or not np.array_equal(p["offsets"], offsets)
+            or (self.refresh is not None and date - self.refreshed >= self.refresh)
+        )
+        if full:
+            self.bgs = dict(iri=dict(), msise=dict(), igrf=dict())
+            self.refreshed = date
+            moved = np.ones(n, dtype=bool)
+        else:
+            moved = (
+                (np.abs(lats - p["lats"]) > self.geo_tol)
+                | (np.abs(lons - p["lons"]) > self.geo_tol)
+                | (np.abs(alts - p["alts"]) > self.alt_tol)
+            )
+        if moved.any():
+            self.evaluate(date, lats, lons, alts, moved)
+        if edens is None and not full and date != p["date"] and not moved.all():
+            # IRI density is time dependent; the other models follow refresh
+            self.evaluate(date, lats, lons, alts, ~moved, models=("iri",))
+        ne = (
+            np.array(self.bgs["iri"]["edens"])
+            if edens is None
+            else np.asarray(edens, dtype=np.float64)
+        )
+        changed = moved.copy()
+        if not full:
+            # Against the density the profiles were computed with, so that
+            # small changes cannot drift unnoticed over many steps
+            changed |= np.abs(ne - self.computed) > (
+                self.edens_atol + self.edens_rtol * np.abs(self.computed)
+            )
+        # Segments within a ray and the ray they belong to
+        ray = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        segs = np.flatnonzero(ray[:-1] == ray[1:]) if n > 1 else np.array([], int)
+        if full:
+            self.profiles = {k: np.zeros(n) for k in self.keys}
+            self.totals = {k: np.zeros(len(offsets) - 1) for k in self.keys}
+            self.contrib = {k: np.zeros(len(segs)) for k in self.keys}
+            self.computed = np.zeros(n)
+        if changed.any():
+            iri = {k: v[changed] for k, v in self.bgs["iri"].items()}
+            iri["edens"] = ne[changed]
+            o = point_profiles(
+                iri,
+                {k: v[changed] for k, v in self.bgs["msise"].items()},
+                {k: v[changed] for k, v in self.bgs["igrf"].items()},
+                np.full(int(changed.sum()), float(self.fo)),
+                self.quantities,
+                self.sw_method,
+            )
+            for k in self.keys:
+                self.profiles[k][changed] = o[k]
+            self.computed[changed] = ne[changed]
+        # Patch the integrals where a point or a segment length changed
+        dx = x[segs + 1] - x[segs]
+        touched = (
+            np.ones(len(segs), dtype=bool)
+            if full
+            else changed[segs] | changed[segs + 1] | (dx != p["dx"])
+        )
+        idx = np.flatnonzero(touched)
+        new = self.contributions(x, self.profiles, segs[idx])
+        for k in self.keys:
+            np.add.at(self.totals[k], ray[segs[idx]], new[k] - self.contrib[k][idx])
+            self.contrib[k][idx] = new[k]
+        self.errors = self.patch_errors(ne, dx, segs, ray, len(offsets) - 1)
+        self.previous = dict(
+            date=date,
+            lats=lats,
+            lons=lons,
+            alts=alts,
+            edens=ne,
+            offsets=offsets,
+            dx=dx,
+        )
+        self.changed = changed
+        logger.info(
+            f"Incremental update on {date}: {int(moved.sum())} moved, "
+            f"{int(changed.sum())}/{n} points and {len(idx)} segments recomputed"
+        )
+        return self.results(x, offsets)
+
+    def patch_errors(self, ne, dx, segs, ray, n_rays):
+        """
+        First-order error of every total from the density changes left
+        below the tolerance: absorption scales with Ne (non-deviative) and
+        1 - n of the phase index as well, so a point whose density moved by
+        a fraction r from the computed one contributes r times its
+        absorption (or 1 - n) times its trapezoid weight.
+        """
+        r = np.abs(ne - self.computed) / np.where(
+            self.computed != 0, np.abs(self.computed), np.inf
+        )
+        w = np.zeros(len(ne))
+        np.add.at(w, segs, 0.5 * dx)
+        np.add.at(w, segs + 1, 0.5 * dx)
+        errors = dict()
+        for (kind, _, _, _), k in zip(self.quantities, self.keys):
+            p = np.nan_to_num(self.profiles[k])
+            s = np.abs(p) if kind == "los" else np.abs(1 - p)
+            errors[k] = np.bincount(ray, weights=w * s * r, minlength=n_rays)
+        return errors
+
+    def results(self, x: np.array, offsets: np.array):
+        """
+        Totals and their patch errors (<key>.error), one row per ray.
+        """
+        o = pd.DataFrame({k: v.copy() for k, v in self.totals.items()})
+        for k, v in self.errors.items():
+            o[f"{k}.error"] = v
+        o["phase_path"] = x[offsets[1:] - 1] - x[offsets[:-1]]
+        return o
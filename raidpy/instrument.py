@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+"""instrument.py: Stage-level timing and memory instrumentation"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+from loguru import logger
+
+# ===================================================================================
+# Instrumentation is off by default and every wrapped call then costs one
+# attribute check. Switch it on with enable() or the RAIDPY_PROFILE
+# environment variable (RAIDPY_PROFILE=1 for timing, =memory to also trace
+# peak allocations with tracemalloc).
+# ===================================================================================
+_profile = os.environ.get("RAIDPY_PROFILE", "").lower()
+
+
+class _State(object):
+    enabled = _profile not in ("", "0", "false")
+    memory = _profile == "memory"
+    verbose = False
+
+
+_state = _State()
+if _state.memory:
+    tracemalloc.start()
+_lock = threading.Lock()
+_local = threading.local()
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall_time: float = 0.0  # in sec
+    points: int = 0
+    peak_bytes: int = 0  # Largest peak allocation of a single call
+
+
+STATS = dict()
+
+
+def enable(memory: bool = False, verbose: bool = False):
+    """
+    Start recording stage statistics; memory=True also traces the peak
+    allocation of every stage (slower), verbose=True logs every call.
+    """
+    _state.enabled, _state.memory, _state.verbose = True, memory, verbose
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return
+
+
+def disable():
+    _state.enabled, _state.verbose = False, False
+    if _state.memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state.memory = False
+    return
+
+
+def is_enabled():
+    return _state.enabled
+
+
+def reset():
+    with _lock:
+        STATS.clear()
+    return
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+class timer(object):
+    """
+    Context manager recording one call of a stage.
+
+    name: Stage name
+    points: Number of points processed by this call
+    """
+
+    def __init__(self, name: str, points: int = 0):
+        self.name = name
+        self.points = points
+        return
+
+    def __enter__(self):
+        self.t0 = None
+        if not _state.enabled:
+            return self
+        self.memory = _state.memory and tracemalloc.is_tracing()
+        if self.memory:
+            stack = _stack()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.start_bytes = tracemalloc.get_traced_memory()[0]
+            self.peak = self.start_bytes
+            stack.append(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        if self.t0 is None:
+            return
+        wall = time.perf_counter() - self.t0
+        peak_bytes = 0
+        if self.memory:
+            stack = _stack()
+            stack.pop()
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = self.peak - self.start_bytes
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        with _lock:
+            s = STATS.setdefault(self.name, StageStats())
+            s.calls += 1
+            s.wall_time += wall
+            s.points += int(self.points or 0)
+            s.peak_bytes = max(s.peak_bytes, peak_bytes)
+        if _state.verbose:
+            logger.debug(f"[{self.name}] {wall:.4f}s for {self.points} points")
+        return
+
+
+def stage(name: str, points=None):
+    """
+    Decorator recording wall time, call count, points processed and
+    peak allocation of a function under the given stage name.
+
+    points: Callable taking the function's arguments and returning the
+        number of points processed by the call
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            n = points(*args, **kwargs) if points is not None else 0
+            with timer(name, n):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def report():
+    """
+    Return a snapshot of the statistics as a dictionary stage -> fields.
+    """
+    with _lock:
+        return {name: asdict(s) for name, s in sorted(STATS.items())}
+
+
+def to_json(file_loc: str):
+    logger.info(f"Saving stage statistics to {file_loc}")
+    with open(file_loc, "w") as f:
+        json.dump(report(), f, indent=2)
+    return
+
+
+def to_prometheus(file_loc: str, prefix: str = "raidpy"):
+    """
+    Write the statistics in the Prometheus text exposition format (e.g.
+    for the node-exporter textfile collector).
+    """
+    logger.info(f"Saving stage statistics to {file_loc}")
+    metrics = [
+        ("stage_seconds_total", "counter", "Wall time spent in stage", "wall_time"),
+        ("stage_calls_total", "counter", "Number of calls of stage", "calls"),
+        ("stage_points_total", "counter", "Points processed by stage", "points"),
+        ("stage_peak_bytes", "gauge", "Peak allocation of one call", "peak_bytes"),
+    ]
+    stats, lines = report(), []
+    for metric, kind, doc, field in metrics:
+        lines.append(f"# HELP {prefix}_{metric} {doc}")
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for name, s in stats.items():
+            lines.append(f'{prefix}_{metric}{{stage="{name}"}} {s[field]}')
+    with open(file_loc, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return
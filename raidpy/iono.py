@@ -18,9 +18,11 @@ from loguru import logger
 
 from raidpy.absorption import CalculateAbsorption
 from raidpy.collision import ComputeCollision
+from raidpy.ionosphere.drivers import Drivers
 from raidpy.ionosphere.igrf13 import IGRF2d
 from raidpy.ionosphere.iri import IRI2d
 from raidpy.ionosphere.msise import MSISE2d
+from raidpy.ionosphere.pool import BackgroundPool
 from raidpy.phase import CalculatePhase
 
 
@@ -34,6 +36,11 @@ class Ionosphere2d(object):
     lats: Latitudes as an array (same size as alts)
     lons: Longitudes as an array (same size as alts)
     alts: Altitudes as an array
+    pool: Optional BackgroundPool to evaluate IRI/MSISE/IGRF in warm workers
+    backgrounds: Optional precomputed per-point dictionaries keyed by model
+        (iri, msise, igrf); these models are not re-evaluated
+    drivers: Optional pre-resolved geophysical drivers passed through to
+        IRI and MSISE (and the pool)
 
     All lat, lon and alts has same size.
     """
@@ -46,6 +53,9 @@ class Ionosphere2d(object):
         alts: np.array,
         fo: float = 5e6,  # in Hz
         iri_version: int = 20,
+        pool: BackgroundPool = None,
+        backgrounds: dict = None,
+        drivers: Drivers = None,
     ):
         self.date = date
         self.lats = lats
@@ -53,30 +63,54 @@ class Ionosphere2d(object):
         self.alts = alts
         self.iri_version = iri_version
         self.fo = fo
+        self.pool = pool
+        self.backgrounds = backgrounds
+        self.drivers = drivers
         self.initl()
         return
 
     def initl(self):
         logger.info(f"Initialize ionosphere on {self.date}")
+        bgs = {m: dict(v) for m, v in (self.backgrounds or {}).items() if v}
+        if self.pool is not None and any(m not in bgs for m in self.pool.models):
+            o = self.pool.evaluate(
+                self.date,
+                self.lats,
+                self.lons,
+                self.alts,
+                self.iri_version,
+                drivers=self.drivers,
+            )
+            bgs.update({m: v for m, v in o.items() if m not in bgs})
         self.iri_block = IRI2d(
             self.date,
             self.lats,
             self.lons,
             self.alts,
             self.iri_version,
+            drivers=self.drivers,
+            _run_="iri" not in bgs,
         )
         self.msise_block = MSISE2d(
             self.date,
             self.lats,
             self.lons,
             self.alts,
+            drivers=self.drivers,
+            _run_="msise" not in bgs,
         )
         self.igrf_block = IGRF2d(
             self.date,
             self.lats,
             self.lons,
             self.alts,
+            _run_="igrf" not in bgs,
         )
+        self.iri_block.iri = bgs.get("iri", getattr(self.iri_block, "iri", None))
+        self.msise_block.msise = bgs.get(
+            "msise", getattr(self.msise_block, "msise", None)
+        )
+        self.igrf_block.igrf = bgs.get("igrf", getattr(self.igrf_block, "igrf", None))
         return
 
     def compute(
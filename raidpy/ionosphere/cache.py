@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""cache.py: Time-anchored cache of the slowly varying MSISE and IGRF fields"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy.ionosphere.drivers import Drivers
+from raidpy.ionosphere.igrf13 import IGRF2d
+from raidpy.ionosphere.msise import MSISE2d
+from raidpy.ionosphere.pool import BackgroundPool
+
+
+class TemporalCache(object):
+    """
+    This class evaluates MSISE and IGRF on a fixed set of points (a path or
+    a flattened grid) at coarse anchor times only, on a regular time axis
+    of the given spacing, and interpolates linearly in time in between.
+    With a tolerance the first use of every anchor interval also evaluates
+    its midpoint; if the interpolated field is off by more than the
+    tolerance at any point (see error) the interval is halved, down to
+    min_spacing. Anchors and accepted intervals are kept for the lifetime
+    of the cache.
+
+    Parameters:
+    -----------
+    lats: Latitudes as an array (same size as alts)
+    lons: Longitudes as an array (same size as alts)
+    alts: Altitudes as an array
+    spacing: Dictionary model (msise, igrf) -> anchor spacing
+    tolerance: Dictionary model -> relative tolerance, or None to trust
+        the spacing
+    min_spacing: Shortest anchor interval after refinement
+    floor: Floor of the relative error of signed keys, as a fraction of
+        their largest magnitude
+    drivers: Optional Drivers, or an index table for Drivers.from_table,
+        passed to MSISE at every anchor
+    pool: Optional BackgroundPool evaluating the models it holds
+    """
+
+    def __init__(
+        self,
+        lats: np.array,
+        lons: np.array,
+        alts: np.array,
+        spacing: dict = dict(msise=dt.timedelta(hours=1), igrf=dt.timedelta(days=1)),
+        tolerance: dict = dict(msise=None, igrf=None),
+        min_spacing: dt.timedelta = dt.timedelta(minutes=5),
+        floor: float = 1e-3,
+        drivers=None,
+        pool: BackgroundPool = None,
+    ):
+        self.lats = lats
+        self.lons = lons
+        self.alts = alts
+        self.spacing = {m: pd.Timedelta(s) for m, s in spacing.items()}
+        self.tolerance = tolerance
+        self.min_spacing = pd.Timedelta(min_spacing)
+        self.floor = floor
+        self.drivers = drivers
+        self.pool = pool
+        self.models = list(self.spacing.keys())
+        self.anchors = {m: dict() for m in self.models}
+        self.accepted = {m: set() for m in self.models}
+        return
+
+    def evaluate(self, model: str, t: pd.Timestamp):
+        """
+        The model on the points at time t, evaluated once per anchor.
+        """
+        if t not in self.anchors[model]:
+            date = t.to_pydatetime()
+            drivers = (
+                Drivers.from_table(self.drivers, date)
+                if isinstance(self.drivers, pd.DataFrame)
+                else self.drivers
+            )
+            if self.pool is not None and model in self.pool.models:
+                o = self.pool.evaluate(
+                    date,
+                    self.lats,
+                    self.lons,
+                    self.alts,
+                    drivers=drivers,
+                    models=(model,),
+                )[model]
+            elif model == "msise":
+                o = MSISE2d(date, self.lats, self.lons, self.alts, drivers).msise
+            else:
+                o = IGRF2d(date, self.lats, self.lons, self.alts).igrf
+            logger.info(f"Cached {model} anchor {t}")
+            self.anchors[model][t] = o
+        return self.anchors[model][t]
+
+    def blend(self, model: str, t0: pd.Timestamp, t1: pd.Timestamp, t: pd.Timestamp):
+        a, b = self.evaluate(model, t0), self.evaluate(model, t1)
+        w = (t - t0) / (t1 - t0)
+        return {k: (1 - w) * a[k] + w * b[k] for k in a}
+
+    def error(self, model: str, t0: pd.Timestamp, t1: pd.Timestamp):
+        """
+        Largest per-point relative error of the linear interpolation at the
+        interval midpoint, over all keys. Strictly positive keys (densities,
+        temperatures, |B|) are compared in log space, so points decades
+        apart in magnitude weigh alike; signed keys (field components,
+        angles) relative to |exact| plus a floor of floor times the key's
+        largest magnitude, which keeps zero crossings finite.
+        """
+        mid = t0 + (t1 - t0) / 2
+        exact, approx = self.evaluate(model, mid), self.blend(model, t0, t1, mid)
+        errors = [0.0]
+        for k in exact:
+            a, e = np.asarray(approx[k]), np.asarray(exact[k])
+            ok = np.isfinite(a) & np.isfinite(e)
+            if not ok.any():
+                continue
+            a, e = a[ok], e[ok]
+            if np.all(e > 0) and np.all(a > 0):
+                errors.append(np.max(np.abs(np.log(a / e))))
+            else:
+                floor = self.floor * np.max(np.abs(e))
+                errors.append(np.max(np.abs(a - e) / (np.abs(e) + floor + 1e-300)))
+        return max(errors)
+
+    def interval(self, model: str, t: pd.Timestamp):
+        """
+        Anchor times (t0, t1) bracketing t, refined to the tolerance.
+        """
+        t0 = t.floor(self.spacing[model])
+        t1 = t0 + self.spacing[model]
+        tol = self.tolerance.get(model)
+        while (
+            t != t0
+            and tol is not None
+            and (t0, t1) not in self.accepted[model]
+            and (t1 - t0) / 2 >= self.min_spacing
+        ):
+            if self.error(model, t0, t1) <= tol:
+                self.accepted[model].add((t0, t1))
+                break
+            mid = t0 + (t1 - t0) / 2
+            t0, t1 = (t0, mid) if t < mid else (mid, t1)
+        return t0, t1
+
+    def get(self, model: str, date: dt.datetime):
+        """
+        The model fields on the points at date.
+        """
+        t = pd.Timestamp(date)
+        t0, t1 = self.interval(model, t)
+        return self.evaluate(model, t0) if t == t0 else self.blend(model, t0, t1, t)
+
+    def backgrounds(self, date: dt.datetime):
+        """
+        Per-model dictionaries at date, as taken by Ionosphere2d(backgrounds=).
+        """
+        return {m: self.get(m, date) for m in self.models}
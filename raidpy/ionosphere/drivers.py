@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""drivers.py: Pre-resolved geophysical drivers passed through to IRI and MSISE"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+
+@dataclass
+class Drivers:
+    """
+    Solar and geomagnetic drivers of one run. Fields left as None are
+    resolved by the models from their own index files as before. MSISE
+    only skips its lookup (and runs offline) when f107, f107a and ap are
+    all set. IRI skips its per-call index reads for the values given, but
+    iricore still checks that its bundled index file covers the date (and
+    tries to update it otherwise) and reads Ap from it for the storm
+    model, so IRI runs are not independent of the index files.
+
+    f107: Daily F10.7 in sfu (MSISE uses the previous day's value)
+    f107a: 81-day centred average of F10.7 in sfu
+    ap: Daily Ap, or the 7-element MSIS ap history
+    ig12: 12-month IG index (IRI)
+    rz12: 12-month smoothed sunspot number (IRI)
+    """
+
+    f107: float = None
+    f107a: float = None
+    ap: object = None
+    ig12: float = None
+    rz12: float = None
+
+    def msise_kwargs(self):
+        """
+        Keyword arguments of one pymsis.calculate date.
+        """
+        o = dict()
+        if self.f107 is not None:
+            o["f107s"] = [self.f107]
+        if self.f107a is not None:
+            o["f107as"] = [self.f107a]
+        if self.ap is not None:
+            ap = np.atleast_1d(np.asarray(self.ap, dtype=np.float64))
+            o["aps"] = [np.resize(ap, 7) if len(ap) == 1 else ap]
+        return o
+
+    def iri_kwargs(self):
+        """
+        IRI user inputs (iricore oarr indices; the matching jf switches
+        are set by iricore). These skip the per-call lookups only; the
+        date must still be covered by iricore's index file.
+        """
+        o = dict()
+        if self.f107 is not None:
+            o["oarr40"] = self.f107
+            o["oarr45"] = self.f107a if self.f107a is not None else self.f107
+        if self.rz12 is not None:
+            o["oarr32"] = self.rz12
+        if self.ig12 is not None:
+            o["oarr38"] = self.ig12
+        return o
+
+    @staticmethod
+    def from_table(table: pd.DataFrame, date: dt.datetime):
+        """
+        Drivers of a date from a preloaded index table, a DataFrame indexed
+        by date with any of the columns f107, f107a, ap, ig12 and rz12; the
+        last row at or before the date is used.
+        """
+        rows = table.loc[: pd.Timestamp(date)]
+        if len(rows) == 0:
+            raise ValueError(f"No drivers at or before {date}")
+        row = rows.iloc[-1]
+        d = Drivers(
+            **{
+                k: float(row[k])
+                for k in asdict(Drivers())
+                if k in row.index and pd.notna(row[k])
+            }
+        )
+        logger.info(f"Drivers for {date}: {d}")
+        return d
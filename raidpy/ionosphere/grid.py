@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+"""grid.py: Background models on a regular (lat, lon, alt) grid"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+
+import numpy as np
+from loguru import logger
+
+from raidpy import instrument
+from raidpy.ionosphere.drivers import Drivers
+from raidpy.ionosphere.igrf13 import load_igrf
+from raidpy.ionosphere.iri import IRI2d, load_iricore
+from raidpy.ionosphere.msise import load_pymsis
+from raidpy.ionosphere.pool import BLOCK_KEYS, BackgroundPool
+
+
+class BackgroundGrid(object):
+    """
+    This function calculate IRI, MSISE and IGRF parameters on a regular
+    grid; every key is an array of shape (nlat, nlon, nalt).
+
+    Parameters:
+    -----------
+    date: Datetime of the event
+    lats: Grid latitudes (1-D)
+    lons: Grid longitudes (1-D)
+    alts: Grid altitudes in km (1-D, uniform for the IRI column calls)
+    pool: Optional BackgroundPool; the grid points are then evaluated
+        point by point in its warm workers
+    backgrounds: Optional precomputed dictionaries keyed by model (iri,
+        msise, igrf) with arrays of the grid shape; these models are not
+        re-evaluated
+    igrf_stride: IGRF is evaluated on every igrf_stride-th altitude (and
+        the top one) and interpolated linearly in between
+    drivers: Optional pre-resolved geophysical drivers passed through to
+        IRI and MSISE
+
+    Without a pool, IRI is called once for all columns, MSISE once in
+    its native grid mode and IGRF once per column.
+    """
+
+    def __init__(
+        self,
+        date: dt.datetime,
+        lats: np.array,
+        lons: np.array,
+        alts: np.array,
+        iri_version: int = 20,
+        pool: BackgroundPool = None,
+        backgrounds: dict = None,
+        igrf_stride: int = 10,
+        drivers: Drivers = None,
+        _run_: bool = True,
+    ):
+        self.date = date
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.alts = np.asarray(alts, dtype=np.float64)
+        self.shape = (len(self.lats), len(self.lons), len(self.alts))
+        self.iri_version = iri_version
+        self.pool = pool
+        self.backgrounds = backgrounds
+        self.igrf_stride = igrf_stride
+        self.drivers = drivers
+        if _run_:
+            self.compute()
+        return
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def mesh(self):
+        """
+        Latitudes, longitudes and altitudes of every grid point.
+        """
+        return np.meshgrid(self.lats, self.lons, self.alts, indexing="ij")
+
+    def compute(self):
+        logger.info(f"Background grid {self.shape} on {self.date}")
+        bgs = {
+            m: {k: np.reshape(v, self.shape) for k, v in b.items()}
+            for m, b in (self.backgrounds or {}).items()
+            if b
+        }
+        missing = [m for m in BLOCK_KEYS if m not in bgs]
+        if missing and self.pool is not None:
+            lat, lon, alt = [x.ravel() for x in self.mesh()]
+            o = self.pool.evaluate(
+                self.date, lat, lon, alt, self.iri_version, drivers=self.drivers
+            )
+            bgs.update(
+                {
+                    m: {k: np.reshape(v, self.shape) for k, v in o[m].items()}
+                    for m in missing
+                    if m in o
+                }
+            )
+        if "iri" not in bgs:
+            bgs["iri"] = self.compute_iri()
+        if "msise" not in bgs:
+            bgs["msise"] = self.compute_msise()
+        if "igrf" not in bgs:
+            bgs["igrf"] = self.compute_igrf()
+        self.iri, self.msise, self.igrf = bgs["iri"], bgs["msise"], bgs["igrf"]
+        return
+
+    def weights(self, lats: np.array, lons: np.array, alts: np.array):
+        """
+        Trilinear weights of the points as a list of the 8 corners
+        (flat grid index, weight). Points outside the grid take the edge
+        values.
+        """
+        idx, wts = [], []
+        for axis, x in zip([self.lats, self.lons, self.alts], [lats, lons, alts]):
+            x = np.clip(np.asarray(x, dtype=np.float64), axis[0], axis[-1])
+            i = np.searchsorted(axis, x, side="right") - 1
+            i = np.clip(i, 0, max(len(axis) - 2, 0))
+            idx.append(i)
+            if len(axis) > 1:
+                wts.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+            else:
+                wts.append(np.zeros_like(x))
+        corners = []
+        for di in (0, 1):
+            for dj in (0, 1):
+                for dk in (0, 1):
+                    w = (
+                        (wts[0] if di else 1 - wts[0])
+                        * (wts[1] if dj else 1 - wts[1])
+                        * (wts[2] if dk else 1 - wts[2])
+                    )
+                    flat = np.ravel_multi_index(
+                        (
+                            np.minimum(idx[0] + di, self.shape[0] - 1),
+                            np.minimum(idx[1] + dj, self.shape[1] - 1),
+                            np.minimum(idx[2] + dk, self.shape[2] - 1),
+                        ),
+                        self.shape,
+                    )
+                    corners.append((flat, w))
+        return corners
+
+    def interpolate(self, lats: np.array, lons: np.array, alts: np.array):
+        """
+        Trilinear interpolation of every background key to the points;
+        the weights are computed once and reused for all keys.
+
+        Returns the per-point dictionaries keyed by model (iri, msise, igrf).
+        """
+        corners = self.weights(lats, lons, alts)
+        o = dict()
+        for m in BLOCK_KEYS:
+            block = getattr(self, m)
+            o[m] = {
+                k: sum(np.ravel(v)[flat] * w for flat, w in corners)
+                for k, v in block.items()
+            }
+        return o
+
+    @instrument.stage("grid.iri", points=lambda self: self.size)
+    def compute_iri(self):
+        """
+        All columns in one IRI call on the uniform altitude range;
+        falls back to IRI2d point by point otherwise.
+        """
+        step = np.diff(self.alts)
+        if len(self.alts) < 2 or not np.allclose(step, step[0]):
+            lat, lon, alt = [x.ravel() for x in self.mesh()]
+            iri = IRI2d(
+                self.date, lat, lon, alt, self.iri_version, drivers=self.drivers
+            ).iri
+            return {k: np.reshape(v, self.shape) for k, v in iri.items()}
+        lat, lon = [x.ravel() for x in np.meshgrid(self.lats, self.lons, indexing="ij")]
+        iriout = load_iricore().iri(
+            self.date,
+            [self.alts[0], self.alts[-1], step[0]],
+            lat,
+            lon,
+            self.iri_version,
+            **(self.drivers.iri_kwargs() if self.drivers else dict()),
+        )
+        return {
+            k: np.reshape(getattr(iriout, k), self.shape[:2] + (-1,))[
+                ..., : self.shape[2]
+            ]
+            for k in BLOCK_KEYS["iri"]
+        }
+
+    @instrument.stage("grid.msise", points=lambda self: self.size)
+    def compute_msise(self):
+        """
+        One pymsis call in its grid mode, output (1, nlon, nlat, nalt, 11).
+        """
+        x = load_pymsis().calculate(
+            [self.date],
+            lons=self.lons,
+            lats=self.lats,
+            alts=self.alts,
+            **(self.drivers.msise_kwargs() if self.drivers else dict()),
+        )
+        x = np.reshape(x, (len(self.lons), len(self.lats), len(self.alts), -1))
+        x = np.transpose(x, (1, 0, 2, 3))
+        keys = ["nn", "N2", "O2", "O", "He", "H", "Ar", "N", "O_Anomalous", "NO", "Tn"]
+        msise = {key: np.array(x[..., i]) for i, key in enumerate(keys)}
+        msise["t_nn"] = np.nansum(x[..., 1:-2], axis=-1)
+        return msise
+
+    @instrument.stage("grid.igrf", points=lambda self: self.size)
+    def compute_igrf(self):
+        """
+        One IGRF call per column on a sub-sampled altitude axis.
+        """
+        idx = np.arange(0, len(self.alts), max(int(self.igrf_stride), 1))
+        if idx[-1] != len(self.alts) - 1:
+            idx = np.append(idx, len(self.alts) - 1)
+        igrf_mod = load_igrf()
+        igrf = {k: np.zeros(self.shape) for k in BLOCK_KEYS["igrf"]}
+        for i, lat in enumerate(self.lats):
+            for j, lon in enumerate(self.lons):
+                mag = igrf_mod.igrf(
+                    self.date.strftime("%Y-%m-%d"),
+                    glat=lat,
+                    glon=lon,
+                    alt_km=self.alts[idx],
+                )
+                for key in igrf:
+                    igrf[key][i, j] = np.interp(
+                        self.alts, self.alts[idx], np.asarray(mag.variables[key])
+                    )
+        for key in ["north", "east", "down", "total"]:
+            igrf[key] *= 1e-9  # To Tesla as in IGRF2d
+        return igrf
+
+
+if __name__ == "__main__":
+    grid = BackgroundGrid(
+        dt.datetime(2024, 4, 8),
+        np.array([30, 40, 50]),
+        np.array([-100, -90, -80]),
+        np.arange(60, 400, 2),
+    )
@@ -17,9 +17,24 @@ import datetime as dt
 import numpy as np
 from loguru import logger
 
-import igrf
+from raidpy import instrument
 
-igrf.build()
+_igrf = None
+
+
+def load_igrf():
+    """
+    Import the IGRF package and build its Fortran backend on first use.
+    The module is cached so repeated calls (and worker processes that
+    already warmed it) pay the build cost only once.
+    """
+    global _igrf
+    if _igrf is None:
+        import igrf
+
+        igrf.build()
+        _igrf = igrf
+    return _igrf
 
 
 class IGRF2d(object):
@@ -43,15 +58,18 @@ class IGRF2d(object):
         lons: np.array,
         alts: np.array,
         to_Tesla: bool = True,
+        _run_: bool = True,
     ):
         self.date = date
         self.lats = lats
         self.lons = lons
         self.alts = alts
         self.to_Tesla = to_Tesla
-        self.compute()
+        if _run_:
+            self.compute()
         return
 
+    @instrument.stage("igrf", points=lambda self: np.size(self.alts))
     def compute(
         self,
     ):
@@ -68,6 +86,7 @@ class IGRF2d(object):
             incl=np.zeros((n)),  # Inclinition in deg
             decl=np.zeros((n)),  # Declination in deg
         )
+        igrf = load_igrf()
         for lat, lon, alt, j in zip(self.lats, self.lons, self.alts, range(n)):
             mag = igrf.igrf(
                 self.date.strftime("%Y-%m-%d"), glat=lat, glon=lon, alt_km=alt
@@ -14,10 +14,27 @@ __status__ = "Research"
 
 import datetime as dt
 
-import iricore
 import numpy as np
 from loguru import logger
 
+from raidpy import instrument
+from raidpy.ionosphere.drivers import Drivers
+
+_iricore = None
+
+
+def load_iricore():
+    """
+    Import iricore on first use; loading the IRI coefficient tables is
+    by far the most expensive import in the package.
+    """
+    global _iricore
+    if _iricore is None:
+        import iricore
+
+        _iricore = iricore
+    return _iricore
+
 
 class IRI2d(object):
     """
@@ -29,6 +46,9 @@ class IRI2d(object):
     lats: Latitudes as an array (same size as alts)
     lons: Longitudes as an array (same size as alts)
     alts: Altitudes as an array
+    drivers: Optional pre-resolved F10.7/IG12/Rz12 passed to IRI as user
+        inputs, skipping its per-call lookups of these indices (iricore
+        still requires its index file to cover the date)
 
     All lat, lon and alts has same size.
     """
@@ -40,22 +60,27 @@ class IRI2d(object):
         lons: np.array,
         alts: np.array,
         iri_version: int = 20,
+        drivers: Drivers = None,
+        _run_: bool = True,
     ):
         self.date = date
         self.lats = lats
         self.lons = lons
         self.alts = alts
         self.iri_version = iri_version
-        self.compute()
+        self.drivers = drivers
+        if _run_:
+            self.compute()
         return
 
+    @instrument.stage("iri", points=lambda self: np.size(self.alts))
     def compute(
         self,
     ):
         """
         Run IGRF codes
         """
-        logger.info(f"Running IRI-{self.iri_version} on {self.date}")
+        logger.debug("Running IRI-{} on {}", self.iri_version, self.date)
         n = len(self.alts)
         self.iri = dict(
             edens=np.zeros((n)),  # Electron density in [m-3]
@@ -70,6 +95,8 @@ class IRI2d(object):
             cluster=np.zeros((n)),  # Cluster ion density in [%](default) or [m-3].
             n=np.zeros((n)),  # N+ ion density in [%](default) or [m-3].
         )
+        iricore = load_iricore()
+        kwargs = self.drivers.iri_kwargs() if self.drivers else dict()
         for lat, lon, alt, j in zip(self.lats, self.lons, self.alts, range(n)):
             alt_range = [alt, alt, 1]
             iriout = iricore.iri(
@@ -78,6 +105,7 @@ class IRI2d(object):
                 lat,
                 lon,
                 self.iri_version,
+                **kwargs,
             )
             for i, key in enumerate(self.iri.keys()):
                 self.iri[key][j] = getattr(iriout, key)
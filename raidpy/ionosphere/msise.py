@@ -14,9 +14,25 @@ __status__ = "Research"
 import datetime as dt
 
 import numpy as np
-import pymsis
 from loguru import logger
 
+from raidpy import instrument
+from raidpy.ionosphere.drivers import Drivers
+
+_pymsis = None
+
+
+def load_pymsis():
+    """
+    Import pymsis on first use.
+    """
+    global _pymsis
+    if _pymsis is None:
+        import pymsis
+
+        _pymsis = pymsis
+    return _pymsis
+
 
 class MSISE2d(object):
     """
@@ -28,20 +44,31 @@ class MSISE2d(object):
     lats: Latitudes as an array (same size as alts)
     lons: Longitudes as an array (same size as alts)
     alts: Altitudes as an array
+    drivers: Optional pre-resolved F10.7/Ap passed to pymsis instead of
+        its per-call index lookup
 
     All lat, lon and alts has same size.
     """
 
     def __init__(
-        self, date: dt.datetime, lats: np.array, lons: np.array, alts: np.array
+        self,
+        date: dt.datetime,
+        lats: np.array,
+        lons: np.array,
+        alts: np.array,
+        drivers: Drivers = None,
+        _run_: bool = True,
     ):
         self.date = date
         self.lats = lats
         self.lons = lons
         self.alts = alts
-        self.compute()
+        self.drivers = drivers
+        if _run_:
+            self.compute()
         return
 
+    @instrument.stage("msise", points=lambda self: np.size(self.alts))
     def compute(self):
         """
         run pymsise
@@ -62,9 +89,11 @@ class MSISE2d(object):
             t_nn=np.zeros((n)),  # in /m3
             Tn=np.zeros((n)),  # in K
         )
-        logger.info(f"Running pymsise00 on {self.date}")
+        logger.debug("Running pymsise00 on {}", self.date)
+        pymsis = load_pymsis()
+        kwargs = self.drivers.msise_kwargs() if self.drivers else dict()
         for lat, lon, alt, j in zip(self.lats, self.lons, self.alts, range(n)):
-            x = pymsis.calculate([self.date], [lat], [lon], [alt])
+            x = pymsis.calculate([self.date], [lat], [lon], [alt], **kwargs)
             for i, key in enumerate(keys):
                 self.msise[key][j] = x[0, i]
             self.msise["t_nn"][j] = np.nansum(x[0, 1:-2])
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+
+"""pool.py: Warm process pool to evaluate IRI/MSISE/IGRF backgrounds"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+from loguru import logger
+
+from raidpy.ionosphere.drivers import Drivers
+from raidpy.ionosphere.igrf13 import IGRF2d, load_igrf
+from raidpy.ionosphere.iri import IRI2d, load_iricore
+from raidpy.ionosphere.msise import MSISE2d, load_pymsis
+from raidpy.shm import SharedArrays, SharedSpec
+
+# Output keys of every background block, in the order they are computed
+BLOCK_KEYS = dict(
+    iri=(
+        "edens",
+        "ntemp",
+        "itemp",
+        "etemp",
+        "o",
+        "h",
+        "he",
+        "o2",
+        "no",
+        "cluster",
+        "n",
+    ),
+    msise=(
+        "nn",
+        "N2",
+        "O2",
+        "O",
+        "He",
+        "H",
+        "Ar",
+        "N",
+        "O_Anomalous",
+        "NO",
+        "t_nn",
+        "Tn",
+    ),
+    igrf=("north", "east", "down", "total", "incl", "decl"),
+)
+
+
+def _init_worker(models: tuple, warm_start: bool):
+    """
+    Runs once in every worker: import the model libraries (and build
+    IGRF) so that later tasks only pay for the model evaluation itself.
+    """
+    loaders = dict(iri=load_iricore, msise=load_pymsis, igrf=load_igrf)
+    for m in models:
+        loaders[m]()
+    if warm_start:
+        # A single-point call loads IRI coefficient files etc. into memory
+        date, p = dt.datetime(2020, 1, 1), np.array([0.0])
+        _evaluate(date, p, p, p + 100.0, models, 20)
+    return
+
+
+def _evaluate(
+    date: dt.datetime,
+    lats: np.array,
+    lons: np.array,
+    alts: np.array,
+    models: tuple,
+    iri_version: int,
+    drivers: Drivers = None,
+):
+    o = dict()
+    if "iri" in models:
+        o["iri"] = IRI2d(date, lats, lons, alts, iri_version, drivers).iri
+    if "msise" in models:
+        o["msise"] = MSISE2d(date, lats, lons, alts, drivers).msise
+    if "igrf" in models:
+        o["igrf"] = IGRF2d(date, lats, lons, alts).igrf
+    return o
+
+
+def _evaluate_chunk(
+    date: dt.datetime,
+    models: tuple,
+    iri_version: int,
+    in_spec: SharedSpec,
+    out_spec: SharedSpec,
+    start: int,
+    stop: int,
+    drivers: Drivers = None,
+):
+    """
+    Evaluate the backgrounds on points [start, stop) and write them in
+    place into the shared output segment.
+    """
+    inputs, outputs = SharedArrays.attach(in_spec), SharedArrays.attach(out_spec)
+    lats, lons, alts = (
+        np.array(inputs["lats"][start:stop]),
+        np.array(inputs["lons"][start:stop]),
+        np.array(inputs["alts"][start:stop]),
+    )
+    o = _evaluate(date, lats, lons, alts, models, iri_version, drivers)
+    for m in models:
+        for key in BLOCK_KEYS[m]:
+            outputs[f"{m}.{key}"][start:stop] = o[m][key]
+    inputs.close()
+    outputs.close()
+    return stop - start
+
+
+class BackgroundPool(object):
+    """
+    A persistent pool of worker processes that keep the IRI, MSISE and
+    IGRF backends imported and initialised between calls. Points are sent
+    in chunks through shared memory and results are written back in place.
+
+    Parameters:
+    -----------
+    n_workers: Number of worker processes (defaults to os.cpu_count())
+    chunk_size: Number of points evaluated per task
+    models: Background models to evaluate
+    mp_context: Multiprocessing start method; 'spawn' keeps the Fortran
+        backends out of the parent's state
+    warm_start: Run one dummy evaluation in every worker at start-up
+    """
+
+    def __init__(
+        self,
+        n_workers: int = None,
+        chunk_size: int = 128,
+        models: tuple = ("iri", "msise", "igrf"),
+        mp_context: str = "spawn",
+        warm_start: bool = True,
+    ):
+        self.n_workers = n_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.models = tuple(models)
+        logger.info(f"Starting background pool with {self.n_workers} workers")
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=mp.get_context(mp_context),
+            initializer=_init_worker,
+            initargs=(self.models, warm_start),
+        )
+        return
+
+    def evaluate(
+        self,
+        date: dt.datetime,
+        lats: np.array,
+        lons: np.array,
+        alts: np.array,
+        iri_version: int = 20,
+        drivers: Drivers = None,
+        models: tuple = None,
+    ):
+        """
+        Evaluate the background models along the points and return
+        the dictionaries keyed by model name (iri, msise, igrf); drivers
+        are passed through to IRI and MSISE. models restricts the run to a
+        subset of the pool's models (all of them by default).
+        """
+        models = self.models if models is None else tuple(models)
+        if not set(models) <= set(self.models):
+            raise ValueError(f"Pool holds {self.models}, not {models}")
+        n = len(alts)
+        logger.info(f"Pooled background evaluation of {n} points on {date}")
+        inputs = SharedArrays.from_arrays(
+            dict(
+                lats=np.asarray(lats, dtype=np.float64),
+                lons=np.asarray(lons, dtype=np.float64),
+                alts=np.asarray(alts, dtype=np.float64),
+            )
+        )
+        outputs = SharedArrays.create(
+            {f"{m}.{key}": n for m in models for key in BLOCK_KEYS[m]}
+        )
+        futures = []
+        try:
+            futures = [
+                self.executor.submit(
+                    _evaluate_chunk,
+                    date,
+                    models,
+                    iri_version,
+                    inputs.spec,
+                    outputs.spec,
+                    start,
+                    min(start + self.chunk_size, n),
+                    drivers,
+                )
+                for start in range(0, n, self.chunk_size)
+            ]
+            for f in futures:
+                f.result()
+            o = {m: outputs.to_dict(prefix=f"{m}.") for m in models}
+        finally:
+            # No chunk may still write to the segments when they are unlinked
+            for f in futures:
+                f.cancel()
+            wait(futures)
+            inputs.close()
+            outputs.close()
+        return o
+
+    def blocks(
+        self,
+        date: dt.datetime,
+        lats: np.array,
+        lons: np.array,
+        alts: np.array,
+        iri_version: int = 20,
+        drivers: Drivers = None,
+    ):
+        """
+        Same as evaluate, but wraps the results in IRI2d, MSISE2d and
+        IGRF2d objects so they can stand in for the serial blocks.
+        """
+        o = self.evaluate(date, lats, lons, alts, iri_version, drivers)
+        iri_block = IRI2d(date, lats, lons, alts, iri_version, drivers, _run_=False)
+        iri_block.iri = o.get("iri")
+        msise_block = MSISE2d(date, lats, lons, alts, drivers, _run_=False)
+        msise_block.msise = o.get("msise")
+        igrf_block = IGRF2d(date, lats, lons, alts, _run_=False)
+        igrf_block.igrf = o.get("igrf")
+        return iri_block, msise_block, igrf_block
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return
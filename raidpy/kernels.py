@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""kernels.py: Per-point absorption/phase profiles of backgrounds at per-point frequencies"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import numpy as np
+
+from raidpy.absorption import AppletonHartree, CalculateAbsorption, SenWyller
+from raidpy.collision import Collision, Collision_SN, ComputeCollision
+from raidpy.parallel import quantity_key
+from raidpy.phase import AppletonHartree as PhaseAppletonHartree
+from raidpy.phase import CalculatePhase
+from raidpy.phase import SenWyller as PhaseSenWyller
+
+
+def point_profiles(
+    iri: dict,
+    msise: dict,
+    igrf: dict,
+    fo: np.array,
+    quantities: list,
+    sw_method: str = "table",
+):
+    """
+    Per-point profiles of every (kind, wave_disp_reltn, col_freq, mode)
+    for per-point backgrounds and frequencies; the collision frequencies
+    are computed once and the kernels run once per distinct frequency.
+    """
+    cc = ComputeCollision(msise, iri, _run_=True).collision
+    profiles = {quantity_key(*q): np.zeros(len(fo)) for q in quantities}
+    relations = set((kind, r) for kind, r, _, _ in quantities)
+    for f in np.unique(fo):
+        sel = fo == f
+        sub = lambda d: {k: np.asarray(v)[sel] for k, v in d.items()}
+        ccs = _subset_collision(cc, sel)
+        models = dict()
+        if any(kind == "los" for kind, _ in relations):
+            ca = CalculateAbsorption(sub(iri), sub(igrf), ccs, f, sw_method=sw_method)
+            ca.ah, ca.sw = AppletonHartree.init(), SenWyller.init()
+            models["los"] = ca
+        if any(kind == "phase" for kind, _ in relations):
+            cp = CalculatePhase(sub(iri), sub(igrf), ccs, f, sw_method=sw_method)
+            cp.ah, cp.sw = PhaseAppletonHartree.init(), PhaseSenWyller.init()
+            models["phase"] = cp
+        for kind, r in relations:
+            getattr(models[kind], f"estimate_{r}")()
+        for kind, r, c, m in quantities:
+            p = getattr(getattr(getattr(models[kind], r), c), f"mode_{m}")
+            profiles[quantity_key(kind, r, c, m)][sel] = p
+    return profiles
+
+
+def _subset_collision(cc, sel: np.array):
+    """
+    The Collision dataclass restricted to the selected points.
+    """
+    return Collision(
+        nu_ft=cc.nu_ft[sel],
+        nu_av_cc=cc.nu_av_cc[sel],
+        nu_av_mb=cc.nu_av_mb[sel],
+        nu_sn=Collision_SN(total=cc.nu_sn.total[sel]),
+    )
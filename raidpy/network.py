@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+"""network.py: Batched absorption/phase of many tx-rx links over a shared grid"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import instrument, utils
+from raidpy.ionosphere.grid import BackgroundGrid
+from raidpy.ionosphere.pool import BackgroundPool
+from raidpy.kernels import point_profiles
+from raidpy.parallel import bearing_scalars, quantity_key
+
+
+@dataclass
+class Link:
+    """
+    One transmitter-receiver link.
+
+    name: Link name (e.g. 'wwv-w2naf')
+    rx_lat, rx_lon: Receiver location; rays landing within tolerance km of
+        it are used
+    bearing: PHaRLAP bearing namespace (or bearing_file to load it from)
+    ray_files: Dictionary datetime -> PHaRLAP ray file of the link
+    rays: Dictionary datetime -> {elv: path DataFrame} used instead of
+        ray_files (e.g. synthetic rays)
+    """
+
+    name: str = None
+    rx_lat: float = None
+    rx_lon: float = None
+    bearing: SimpleNamespace = None
+    bearing_file: str = None
+    ray_files: dict = field(default_factory=dict)
+    rays: dict = field(default_factory=dict)
+    tolerance: float = 50.0  # in km
+
+    def __post_init__(self):
+        if self.bearing is None and self.bearing_file is not None:
+            self.bearing = utils.load_bearing_mat_file(self.bearing_file)
+        self.geometry = bearing_scalars(self.bearing)
+        return
+
+    @property
+    def distance(self):
+        """
+        Great circle distance between transmitter and receiver in km.
+        """
+        from geopy.distance import great_circle as GC
+
+        return GC(
+            (self.geometry["origin_lat"], self.geometry["origin_lon"]),
+            (self.rx_lat, self.rx_lon),
+        ).km
+
+    def load_rays(self, date: dt.datetime):
+        if date in self.rays:
+            return self.rays[date]
+        return utils.load_rays_mat_file(self.ray_files[date])[1]
+
+    def select(self, rays: dict):
+        """
+        Elevations of the rays landing within tolerance of the receiver.
+        """
+        dist = self.distance
+        return sorted(
+            e
+            for e, r in rays.items()
+            if np.abs(r.ground_range.iloc[-1] - dist) <= self.tolerance
+        )
+
+
+@dataclass
+class NetworkResults:
+    """
+    rays: One row per (date, link, elv) with the path integrals
+    links: One row per (date, link) with the median over the link's rays
+    """
+
+    rays: pd.DataFrame = None
+    links: pd.DataFrame = None
+
+
+class Network(object):
+    """
+    This class evaluates many links at once. For every date the rays of
+    all links are concatenated, one BackgroundGrid covering all of them is
+    evaluated and interpolated to the ray points, the collision and AH/SW
+    kernels run once per frequency on all points, and the path integrals
+    of all rays are taken in one segmented pass.
+
+    Parameters:
+    -----------
+    links: List of Link
+    quantities: List of (kind, wave_disp_reltn, col_freq, mode) with kind
+        'los' (absorption) or 'phase'
+    resolution: Grid spacing (dlat, dlon, dalt) in deg, deg and km
+    pool: Optional BackgroundPool for the grid backgrounds
+    backgrounds: Optional callable (date, lats, lons, alts) -> grid
+        backgrounds dictionary, e.g. synthetic or cached cubes
+    sw_method: Sen-Wyller kernel, 'table' (vectorized) or 'quad'
+    n_threads: Threads loading the ray files of a date
+    """
+
+    def __init__(
+        self,
+        links: list,
+        quantities: list = [("los", "ah", "sn", "O")],
+        resolution: tuple = (0.5, 0.5, 2.0),
+        pool: BackgroundPool = None,
+        backgrounds=None,
+        sw_method: str = "table",
+        n_threads: int = 4,
+    ):
+        self.links = links
+        self.quantities = quantities
+        self.resolution = resolution
+        self.pool = pool
+        self.backgrounds = backgrounds
+        self.sw_method = sw_method
+        self.n_threads = n_threads
+        return
+
+    def gather(self, date: dt.datetime):
+        """
+        Concatenate the selected rays of all links into flat arrays.
+        """
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            fans = list(executor.map(lambda l: l.load_rays(date), self.links))
+        cols = dict(lats=[], lons=[], alts=[], edens=[], path=[], fo=[])
+        index = []
+        for link, rays in zip(self.links, fans):
+            g = link.geometry
+            for e in link.select(rays):
+                ray = rays[e]
+                lats, lons = utils.destination_points(
+                    np.asarray(ray.ground_range),
+                    g["ray_bearing"],
+                    g["origin_lat"],
+                    g["origin_lon"],
+                )
+                cols["lats"].append(lats)
+                cols["lons"].append(lons)
+                cols["alts"].append(np.asarray(ray.height, dtype=np.float64))
+                cols["edens"].append(np.asarray(ray.electron_density) * 1e6)  # To /m3
+                cols["path"].append(np.asarray(ray.phase_path, dtype=np.float64))
+                cols["fo"].append(np.full(len(ray), g["fo"]))
+                index.append(dict(date=date, link=link.name, elv=e, n=len(ray)))
+        if not index:
+            return None, pd.DataFrame(columns=["date", "link", "elv"])
+        points = {k: np.concatenate(v) for k, v in cols.items()}
+        index = pd.DataFrame.from_records(index)
+        points["offsets"] = np.concatenate([[0], np.cumsum(index.n)])
+        return points, index.drop(columns="n")
+
+    def grid(self, date: dt.datetime, points: dict):
+        """
+        The background grid covering all points, padded by one cell.
+        """
+        axes = []
+        for x, d in zip(
+            [points["lats"], points["lons"], points["alts"]], self.resolution
+        ):
+            lo, hi = np.floor(x.min() / d) * d - d, np.ceil(x.max() / d) * d + d
+            axes.append(np.arange(lo, hi + d / 2, d))
+        axes[0] = np.unique(np.clip(axes[0], -90, 90))
+        axes[2] = axes[2][axes[2] >= 0] if np.any(axes[2] >= 0) else axes[2]
+        backgrounds = self.backgrounds(date, *axes) if self.backgrounds else None
+        return BackgroundGrid(date, *axes, pool=self.pool, backgrounds=backgrounds)
+
+    @instrument.stage("network.kernels", points=lambda self, p, *a, **k: len(p["fo"]))
+    def kernels(self, points: dict, bgs: dict):
+        """
+        Per-point profiles of every quantity, one kernel pass per frequency.
+        """
+        iri = dict(bgs["iri"], edens=points["edens"])
+        return point_profiles(
+            iri,
+            bgs["msise"],
+            bgs["igrf"],
+            points["fo"],
+            self.quantities,
+            self.sw_method,
+        )
+
+    def compute(self, date: dt.datetime):
+        """
+        Per-ray path integrals of all links on one date.
+        """
+        points, index = self.gather(date)
+        logger.info(f"Network of {len(self.links)} links, {len(index)} rays on {date}")
+        if points is None:
+            # No ray reaches a receiver: keep the quantity columns, empty
+            for q in self.quantities:
+                index[quantity_key(*q)] = pd.Series(dtype=np.float64)
+            return index
+        grid = self.grid(date, points)
+        bgs = grid.interpolate(points["lats"], points["lons"], points["alts"])
+        profiles = self.kernels(points, bgs)
+        for key, p in profiles.items():
+            index[key] = utils.segment_trapz(p, points["path"], points["offsets"])
+        return index
+
+    def run(self, dates: list):
+        """
+        Evaluate all dates and return the per-ray and per-link tables.
+        """
+        rays = [self.compute(d) for d in dates]
+        # Dates where no ray reaches a receiver only add empty frames
+        rays = pd.concat([r for r in rays if len(r)] or rays[:1], ignore_index=True)
+        keys = [quantity_key(*q) for q in self.quantities]
+        links = (
+            rays.groupby(["date", "link"])
+            .agg(n_rays=("elv", "size"), **{k: (k, "median") for k in keys})
+            .reset_index()
+        )
+        return NetworkResults(rays=rays, links=links)
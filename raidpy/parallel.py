@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""parallel.py: Evaluate fans of rays in worker processes over shared memory"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import utils
+from raidpy.ionosphere.pool import BLOCK_KEYS, BackgroundPool
+from raidpy.shm import SharedArrays, SharedSpec
+
+RAY_KEYS = [
+    "ground_range",
+    "height",
+    "group_range",
+    "phase_path",
+    "geometric_distance",
+    "electron_density",
+    "refractive_index",
+]
+
+
+def bearing_scalars(bearing: SimpleNamespace):
+    """
+    Reduce a PHaRLAP bearing namespace to the scalars a worker needs
+    (bearing, origin lat/lon and frequency in Hz).
+    """
+    return dict(
+        ray_bearing=float(np.ravel(bearing.rb)[0]),
+        origin_lat=float(np.ravel(bearing.olat)[0]),
+        origin_lon=float(np.ravel(bearing.olon)[0]),
+        fo=float(np.ravel(bearing.freq)[0]) * 1e6,
+    )
+
+
+def pack_rays(rays: dict, elvs: list = None, keys: list = RAY_KEYS):
+    """
+    Concatenate the path DataFrames of a fan (as returned by
+    utils.load_rays_mat_file) into one shared segment. Ray i occupies
+    points offsets[i]:offsets[i+1] of every column.
+    """
+    elvs = elvs if elvs is not None else sorted(rays.keys())
+    sizes = np.array([len(rays[e]) for e in elvs], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    arrays = {
+        f"ray.{key}": np.concatenate(
+            [np.asarray(rays[e][key], dtype=np.float64) for e in elvs]
+        )
+        for key in keys
+        if all(key in rays[e] for e in elvs)
+    }
+    arrays["elvs"], arrays["offsets"] = np.asarray(elvs, dtype=np.float64), offsets
+    return SharedArrays.from_arrays(arrays)
+
+
+def quantity_key(kind: str, wave_disp_reltn: str, col_freq: str, mode: str):
+    return f"{kind}.{wave_disp_reltn}.{col_freq}.{mode}"
+
+
+@dataclass
+class FanResults:
+    """
+    Per-ray totals (one row per elevation), concatenated per-point
+    profiles (sliced with offsets) and per-hop integrals (one row per
+    (elevation, hop)) of a fan evaluated by compute_fan.
+    """
+
+    elvs: np.array = None
+    offsets: np.array = None
+    totals: pd.DataFrame = None
+    points: dict = field(default_factory=dict)
+    hops: pd.DataFrame = None
+
+    def profile(self, elv: float, key: str):
+        i = int(np.argmin(np.abs(self.elvs - elv)))
+        return self.points[key][self.offsets[i] : self.offsets[i + 1]]
+
+
+def _compute_ray(
+    date: dt.datetime,
+    geometry: dict,
+    quantities: list,
+    ray_spec: SharedSpec,
+    bg_spec: SharedSpec,
+    out_spec: SharedSpec,
+    i: int,
+):
+    """
+    Worker task: build the Oblique of ray i from shared inputs and write
+    the per-point profiles and totals in place into the shared output.
+    """
+    from raidpy.functions import Oblique
+
+    rs, out = SharedArrays.attach(ray_spec), SharedArrays.attach(out_spec)
+    bg = SharedArrays.attach(bg_spec) if bg_spec is not None else None
+    o, e = int(rs["offsets"][i]), int(rs["offsets"][i + 1])
+    ray = pd.DataFrame(
+        {k[4:]: rs[k][o:e] for k in rs.keys() if k.startswith("ray.")}, copy=True
+    )
+    backgrounds = (
+        {
+            m: {k: np.array(bg[f"{m}.{k}"][o:e]) for k in BLOCK_KEYS[m]}
+            for m in BLOCK_KEYS
+            if f"{m}.{BLOCK_KEYS[m][0]}" in bg
+        }
+        if bg is not None
+        else dict()
+    )
+    ol = Oblique(
+        date,
+        np.array(ray.ground_range),
+        np.array(ray.height),
+        geometry["ray_bearing"],
+        geometry["origin_lat"],
+        geometry["origin_lon"],
+        geometry["fo"],
+        ion2d=backgrounds.get("iri"),
+        msise=backgrounds.get("msise"),
+        igrf2d=backgrounds.get("igrf"),
+        edens=np.array(ray.electron_density) * 1e6,  # To /m3
+        ray_details=ray,
+    )
+    for kind, r, c, m in quantities:
+        key = quantity_key(kind, r, c, m)
+        if kind == "los":
+            out[key][o:e] = ol.get_absorption_datasets(r, c, m)["los"]
+            out[f"total.{key}"][i] = ol.get_total_absorption_along_path(None, r, c, m)
+        else:
+            out[key][o:e] = ol.get_phase_datasets(r, c, m)["phase"]
+            out[f"total.{key}"][i] = ol.get_total_phase_along_path(None, r, c, m)
+    for s in [rs, out] + ([bg] if bg is not None else []):
+        s.close()
+    return i
+
+
+def fan_hops(rs: SharedArrays, elvs: list, points: dict, ground_tol: float = 1.0):
+    """
+    Per-hop integrals of every profile of a packed fan in one segmented
+    pass over all rays.
+    """
+    offsets = np.array(rs["offsets"])
+    phase_path = np.array(rs["ray.phase_path"])
+    grange = np.array(rs["ray.ground_range"])
+    starts, ends, ray = utils.hop_segments(rs["ray.height"], offsets, ground_tol)
+    hops = pd.DataFrame(
+        dict(
+            elv=np.asarray(elvs)[ray],
+            hop=np.arange(len(starts)) - np.searchsorted(ray, ray) + 1,
+            ground_range_start=grange[starts],
+            ground_range_end=grange[ends],
+            path_length=phase_path[ends] - phase_path[starts],
+        )
+    )
+    if points:
+        keys = list(points.keys())
+        y = np.stack([points[k] for k in keys])
+        for k, t in zip(keys, utils.hop_integrals(y, phase_path, starts, offsets)):
+            hops[k] = t
+    return hops
+
+
+def compute_fan(
+    date: dt.datetime,
+    rays: dict,
+    bearing: SimpleNamespace,
+    elvs: list = None,
+    quantities: list = [("los", "ah", "sn", "O")],
+    n_jobs: int = None,
+    executor: ProcessPoolExecutor = None,
+    pool: BackgroundPool = None,
+    mp_context: str = "spawn",
+):
+    """
+    Evaluate absorption ('los') and/or phase ('phase') of every ray in a
+    fan in parallel. Ray arrays, optional backgrounds and all outputs live
+    in shared memory; workers receive only segment names and offsets.
+
+    Parameters:
+    -----------
+    date: Datetime of the rays
+    rays: Dictionary elevation -> path DataFrame (load_rays_mat_file)
+    bearing: PHaRLAP bearing namespace (load_bearing_mat_file)
+    elvs: Elevations to evaluate (defaults to all)
+    quantities: List of (kind, wave_disp_reltn, col_freq, mode)
+    n_jobs: Number of workers if no executor is given
+    executor: Reusable ProcessPoolExecutor for the ray tasks
+    pool: Optional BackgroundPool; backgrounds of the whole fan are then
+        evaluated in one batch and shared with the ray workers
+    """
+    elvs = elvs if elvs is not None else sorted(rays.keys())
+    geometry = bearing_scalars(bearing)
+    logger.info(f"Computing {len(elvs)} rays on {date} over shared memory")
+    rs = pack_rays(rays, elvs)
+    offsets, n = np.array(rs["offsets"]), int(rs["offsets"][-1])
+    bg = None
+    if pool is not None:
+        lats, lons = utils.create_lat_lon_from_routes(
+            rs["ray.ground_range"],
+            geometry["ray_bearing"],
+            geometry["origin_lat"],
+            geometry["origin_lon"],
+        )
+        o = pool.evaluate(date, lats, lons, np.array(rs["ray.height"]))
+        bg = SharedArrays.from_arrays(
+            {f"{m}.{k}": v for m in o for k, v in o[m].items()}
+        )
+    shapes = dict()
+    for q in quantities:
+        shapes[quantity_key(*q)] = n
+        shapes["total." + quantity_key(*q)] = len(elvs)
+    out = SharedArrays.create(shapes)
+    own = executor is None
+    executor = executor or ProcessPoolExecutor(
+        max_workers=n_jobs or os.cpu_count(), mp_context=mp.get_context(mp_context)
+    )
+    try:
+        futures = [
+            executor.submit(
+                _compute_ray,
+                date,
+                geometry,
+                quantities,
+                rs.spec,
+                bg.spec if bg is not None else None,
+                out.spec,
+                i,
+            )
+            for i in range(len(elvs))
+        ]
+        for f in futures:
+            f.result()
+        totals = pd.DataFrame(
+            {
+                quantity_key(*q): np.array(out["total." + quantity_key(*q)])
+                for q in quantities
+            },
+            index=pd.Index(elvs, name="elv"),
+        )
+        points = {quantity_key(*q): np.array(out[quantity_key(*q)]) for q in quantities}
+        results = FanResults(
+            elvs=np.array(elvs),
+            offsets=offsets,
+            totals=totals,
+            points=points,
+            hops=fan_hops(rs, elvs, points),
+        )
+    finally:
+        if own:
+            executor.shutdown(wait=True)
+        for s in [rs, out] + ([bg] if bg is not None else []):
+            s.close()
+    return results
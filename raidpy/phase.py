@@ -16,8 +16,8 @@ from dataclasses import dataclass
 
 import numpy as np
 from loguru import logger
-from scipy.integrate import quad
 
+from raidpy import instrument
 from raidpy.collision import Collision
 from raidpy.constants import *
 
@@ -30,6 +30,7 @@ from raidpy.constants import *
 #
 # ===================================================================================
 def C(p, y):
+    from scipy.integrate import quad
 
     def gamma_factorial(N):
         n = int(str(N).split(".")[0])
@@ -116,6 +117,26 @@ def calculate_sw_OX(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
     return O, X
 
 
+def calculate_sw_RL_array(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
+    """
+    calculate_sw_RL on arrays of any shape with tabulated C(p, y).
+    """
+    from raidpy.absorption import sw_indices_RL
+
+    nR, nL, ok = sw_indices_RL(Bo, Ne, nu, fo, nu_sw_r)
+    return np.where(ok, nR.real, np.nan), np.where(ok, nL.real, np.nan)
+
+
+def calculate_sw_OX_array(Bo, Ne, nu, fo=30e6, nu_sw_r=1.0):
+    """
+    calculate_sw_OX on arrays of any shape with tabulated C(p, y).
+    """
+    from raidpy.absorption import sw_indices_OX
+
+    nO, nX, ok = sw_indices_OX(Bo, Ne, nu, fo, nu_sw_r)
+    return np.where(ok, nO.real, np.nan), np.where(ok, nX.real, np.nan)
+
+
 @dataclass
 class Phase:
     mode_O: np.array = None
@@ -166,15 +187,24 @@ class CalculatePhase(object):
     coll = collision frequency
     Ne = electron density
     fo = operating frequency
+    sw_method = 'quad' integrates C(p, y) point by point, 'table' evaluates
+        the Sen-Wyller kernel on whole arrays with a tabulated C(p, y)
     """
 
     def __init__(
-        self, iri: dict, igrf: dict, coll: Collision, fo: float = 30e6, _run_=False
+        self,
+        iri: dict,
+        igrf: dict,
+        coll: Collision,
+        fo: float = 30e6,
+        _run_=False,
+        sw_method: str = "quad",
     ):
         self.igrf = igrf
         self.iri = iri
         self.coll = coll
         self.fo = fo
+        self.sw_method = sw_method
         self.w = 2 * np.pi * fo
         self.k = (2 * np.pi * fo) / pconst["c"]
         if _run_:
@@ -185,6 +215,7 @@ class CalculatePhase(object):
             self.estimate_sw()
         return
 
+    @instrument.stage("phase.ah", points=lambda self: np.size(self.iri["edens"]))
     def estimate_ah(self):
         # =========================================================
         # Using FT collision frequency
@@ -318,13 +349,23 @@ class CalculatePhase(object):
         )
         return
 
+    @instrument.stage("phase.sw", points=lambda self: np.size(self.iri["edens"]))
     def estimate_sw(self):
         Bo = self.igrf["total"]
-        n = len(Bo)
         # ===================================================
         # Using FT collistion frequency
         # ===================================================
         nu = self.coll.nu_ft
+        if self.sw_method == "table":
+            self.sw.ft.mode_O, self.sw.ft.mode_X = calculate_sw_OX_array(
+                Bo, self.iri["edens"], nu, self.fo
+            )
+            self.sw.ft.mode_R, self.sw.ft.mode_L = calculate_sw_RL_array(
+                Bo, self.iri["edens"], nu, self.fo
+            )
+            self.sw.ft.mode_no = np.zeros_like(Bo)
+            return
+        n = len(Bo)
         (
             self.sw.ft.mode_O,
             self.sw.ft.mode_X,
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-"""functions.py: Calculate absorption along the path"""
+"""plots.py: Plot rays, absorption and phase along the path"""
 
 __author__ = "Chakraborty, S."
 __copyright__ = "Chakraborty, S."
@@ -12,19 +12,110 @@ __email__ = "chakras4@erau.edu"
 __status__ = "Research"
 
 import datetime as dt
+from dataclasses import dataclass, field
 
 import matplotlib.pyplot as plt
-
-plt.style.use(["science", "ieee"])
-plt.rcParams["font.family"] = "sans-serif"
-plt.rcParams["font.sans-serif"] = ["Tahoma", "DejaVu Sans", "Lucida Grande", "Verdana"]
-plt.rcParams["text.usetex"] = False
 import numpy as np
+from loguru import logger
 from matplotlib.collections import LineCollection
 
+_style_applied = False
+
+
+def setup_style():
+    """
+    Apply the SciencePlots style once, on the first figure created.
+    """
+    global _style_applied
+    if not _style_applied:
+        import scienceplots  # noqa: F401 (registers the 'science' styles)
+
+        plt.style.use(["science", "ieee"])
+        plt.rcParams["font.family"] = "sans-serif"
+        plt.rcParams["font.sans-serif"] = [
+            "Tahoma",
+            "DejaVu Sans",
+            "Lucida Grande",
+            "Verdana",
+        ]
+        plt.rcParams["text.usetex"] = False
+        _style_applied = True
+    return
+
+
+def fan_segments(rays: list, kind: str = "los"):
+    """
+    Line segments of a whole fan in one array.
+
+    Parameters:
+    -----------
+    rays: List of DataFrames with ground_range, height and kind columns
+
+    Returns (segments [n, 2, 2], segment values, overlay x, overlay y);
+    the overlay arrays hold all rays separated by NaNs so that one Line2D
+    draws them.
+    """
+    if len(rays) == 0:
+        return np.zeros((0, 2, 2)), np.array([]), np.array([]), np.array([])
+    x = np.concatenate([np.append(np.asarray(df.ground_range), np.nan) for df in rays])
+    y = np.concatenate([np.append(np.asarray(df.height), np.nan) for df in rays])
+    v = np.concatenate([np.append(np.asarray(df[kind]), np.nan) for df in rays])
+    # A segment joins points i and i+1 of the same ray (no NaN break)
+    i = np.nonzero(~(np.isnan(x[:-1]) | np.isnan(x[1:])))[0]
+    segments = np.stack(
+        [np.stack([x[i], y[i]], axis=1), np.stack([x[i + 1], y[i + 1]], axis=1)],
+        axis=1,
+    )
+    return segments, v[i], x[:-1], y[:-1]
+
+
+def rasterize_fan(
+    rays: list,
+    kind: str = "los",
+    xlim: list = [0, 3000],
+    ylim: list = [0, 400],
+    shape: tuple = (200, 600),
+    reduce: str = "max",
+):
+    """
+    Bin a fan of rays into a height x ground-range image. Every segment
+    is resampled at sub-pixel spacing so that rays stay continuous.
+
+    Parameters:
+    -----------
+    shape: (number of height bins, number of ground range bins)
+    reduce: Per-pixel 'max' or 'mean' of the segment values
+
+    Returns the image (NaN where no ray passes) and its extent.
+    """
+    if reduce not in ("max", "mean"):
+        raise ValueError(f"Unknown reduce '{reduce}', use 'max' or 'mean'")
+    ny, nx = shape
+    segments, values, _, _ = fan_segments(rays, kind)
+    sx, sy = nx / (xlim[1] - xlim[0]), ny / (ylim[1] - ylim[0])
+    dx = (segments[:, 1, 0] - segments[:, 0, 0]) * sx
+    dy = (segments[:, 1, 1] - segments[:, 0, 1]) * sy
+    n = np.maximum(np.ceil(2 * np.hypot(dx, dy)), 1).astype(int)
+    seg = np.repeat(np.arange(len(n)), n)
+    frac = (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / n[seg]
+    col = ((segments[seg, 0, 0] - xlim[0]) * sx + frac * dx[seg]).astype(int)
+    row = ((segments[seg, 0, 1] - ylim[0]) * sy + frac * dy[seg]).astype(int)
+    v = values[seg]
+    ok = (col >= 0) & (col < nx) & (row >= 0) & (row < ny) & np.isfinite(v)
+    idx, v = row[ok] * nx + col[ok], v[ok]
+    count = np.bincount(idx, minlength=nx * ny)
+    if reduce == "max":
+        image = np.full(nx * ny, -np.inf)
+        np.maximum.at(image, idx, v)
+    else:
+        image = np.bincount(idx, weights=v, minlength=nx * ny) / np.maximum(count, 1)
+    image[count == 0] = np.nan
+    return image.reshape(ny, nx), [xlim[0], xlim[1], ylim[0], ylim[1]]
+
 
 class PlotOlRays(object):
     def __init__(self, date: dt.datetime, ylim=[], xlim=[]):
+        setup_style()
         self.date = date
         self.xlim = xlim
         self.ylim = ylim
@@ -130,6 +221,82 @@ class PlotOlRays(object):
             self.__zoomed_in_panel__(df, kind, zoomed_in)
         return
 
+    def lay_ray_fan(
+        self,
+        rays: list,
+        kind: str = "los",
+        method: str = "collection",
+        shape: tuple = (200, 600),
+        tag_distance: float = -1,
+        text: str = None,
+    ):
+        """
+        Draw a whole fan with a single artist and a single colorbar.
+
+        Parameters:
+        -----------
+        rays: List of DataFrames with ground_range, height and kind columns
+        method: 'collection' merges all rays into one LineCollection
+            (rasterized in vector outputs); 'max' or 'mean' bins them into
+            a height x ground-range image of the given shape
+        """
+        cmap, label, norm = self.get_parameter(kind)
+        if method == "collection":
+            segments, values, x, y = fan_segments(rays, kind)
+            mappable = LineCollection(segments, cmap=cmap, norm=norm)
+            mappable.set_array(values)
+            mappable.set_linewidth(2)
+            mappable.set_rasterized(True)
+            self.ax.add_collection(mappable)
+            self.ax.plot(
+                x, y, c="k", zorder=3, alpha=0.7, ls="-", lw=0.1, rasterized=True
+            )
+        else:
+            image, extent = rasterize_fan(
+                rays,
+                kind,
+                self.ax.get_xlim(),
+                self.ax.get_ylim(),
+                shape,
+                method,
+            )
+            mappable = self.ax.imshow(
+                image,
+                origin="lower",
+                extent=extent,
+                aspect="auto",
+                cmap=cmap,
+                norm=norm,
+                interpolation="nearest",
+            )
+        pos = self.ax.get_position()
+        cax = self.fig.add_axes(
+            [pos.x1 + 0.025, pos.y0 + 0.05, 0.015, pos.height * 0.6]
+        )
+        cbax = self.fig.colorbar(
+            mappable, cax, spacing="uniform", orientation="vertical"
+        )
+        _ = cbax.set_label(label)
+        if tag_distance > 100:
+            self.ax.plot(
+                [tag_distance, tag_distance],
+                [0, 100],
+                c="m",
+                zorder=4,
+                alpha=0.7,
+                ls="--",
+                lw=0.8,
+            )
+        stitle = "%s UT" % self.date.strftime("%Y-%m-%d %H:%M")
+        self.ax.text(
+            0.95, 1.05, stitle, ha="right", va="center", transform=self.ax.transAxes
+        )
+        if text:
+            self.ax.text(
+                0.05, 0.9, text, ha="left", va="center", transform=self.ax.transAxes
+            )
+        return
+
     def create_figure_pane(self):
         self.fig = plt.figure(figsize=(6, 3), dpi=300)
         self.ax = self.fig.add_subplot(111)
@@ -164,3 +331,260 @@ class PlotOlRays(object):
         self.zoom_ax.set_ylabel("Height, [km]", fontdict={"size": 8})
         self.ax.indicate_inset_zoom(self.zoom_ax)
         return
+
+
+@dataclass
+class RayFrame:
+    """
+    Everything needed to draw one time step of a ray-fan movie.
+
+    rays: List of DataFrames with ground_range, height and the plotted kind
+    """
+
+    date: dt.datetime = None
+    rays: list = field(default_factory=list)
+    text: str = None
+    tag_distance: float = -1
+
+
+class RayFrameTemplate(PlotOlRays):
+    """
+    A PlotOlRays figure built once and reused for every frame: only the
+    segments/values of a single LineCollection, the overlay line and the
+    text artists are updated between frames.
+    """
+
+    def __init__(self, kind="los", ylim=[], xlim=[], dpi=150):
+        self.kind = kind
+        self.dpi = dpi
+        super().__init__(None, ylim=ylim, xlim=xlim)
+        self.fig.set_dpi(dpi)
+        # Fixed layout (no bbox_inches="tight"): every frame has the same size
+        self.fig.subplots_adjust(left=0.1, right=0.8, bottom=0.15, top=0.88)
+        cmap, label, norm = self.get_parameter(kind)
+        self.lc = LineCollection([], cmap=cmap, norm=norm)
+        self.lc.set_array(np.array([]))
+        self.lc.set_linewidth(2)
+        self.ax.add_collection(self.lc)
+        (self.outline,) = self.ax.plot(
+            [], [], c="k", zorder=3, alpha=0.7, ls="-", lw=0.1
+        )
+        (self.tag,) = self.ax.plot([], [], c="m", zorder=4, alpha=0.7, ls="--", lw=0.8)
+        pos = self.ax.get_position()
+        cax = self.fig.add_axes(
+            [pos.x1 + 0.025, pos.y0 + 0.05, 0.015, pos.height * 0.6]
+        )
+        self.fig.colorbar(self.lc, cax, spacing="uniform", orientation="vertical")
+        cax.set_ylabel(label)
+        self.title = self.ax.text(
+            0.95, 1.05, "", ha="right", va="center", transform=self.ax.transAxes
+        )
+        self.note = self.ax.text(
+            0.05, 0.9, "", ha="left", va="center", transform=self.ax.transAxes
+        )
+        return
+
+    def update(self, frame: RayFrame):
+        segments, values, x, y = fan_segments(frame.rays, self.kind)
+        self.lc.set_segments(segments)
+        self.lc.set_array(values)
+        self.outline.set_data(x, y)
+        if frame.tag_distance > 100:
+            self.tag.set_data([frame.tag_distance] * 2, [0, 100])
+        else:
+            self.tag.set_data([], [])
+        self.title.set_text("%s UT" % frame.date.strftime("%Y-%m-%d %H:%M"))
+        self.note.set_text(frame.text or "")
+        return
+
+    def render(self, frame: RayFrame):
+        """
+        Draw the frame and return it as an RGB array.
+        """
+        self.update(frame)
+        self.fig.canvas.draw()
+        return np.array(self.fig.canvas.buffer_rgba())[..., :3]
+
+    def save(self, filepath):
+        self.fig.savefig(filepath, dpi=self.dpi, facecolor=(1, 1, 1, 1))
+        return
+
+
+class MovieWriter(object):
+    """
+    Streams RGB frames into an MP4 (through an ffmpeg pipe) or GIF file.
+    """
+
+    def __init__(self, filepath: str, fps: int = 5):
+        self.filepath = filepath
+        self.fps = fps
+        self.proc, self.frames = None, []
+        return
+
+    @property
+    def paletted(self):
+        return self.filepath.endswith(".gif")
+
+    def append(self, image: np.array):
+        """
+        image: RGB array, or a paletted PIL image for GIF outputs
+        """
+        if self.paletted:
+            if isinstance(image, np.ndarray):
+                from PIL import Image
+
+                image = Image.fromarray(image).quantize(256)
+            self.frames.append(image)
+            return
+        if self.proc is None:
+            import subprocess
+
+            h, w = image.shape[:2]
+            self.proc = subprocess.Popen(
+                [
+                    "ffmpeg",
+                    "-y",
+                    "-loglevel",
+                    "error",
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "rgb24",
+                    "-s",
+                    f"{w}x{h}",
+                    "-r",
+                    str(self.fps),
+                    "-i",
+                    "-",
+                    "-vf",
+                    "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                    "-pix_fmt",
+                    "yuv420p",
+                    self.filepath,
+                ],
+                stdin=subprocess.PIPE,
+            )
+        self.proc.stdin.write(np.ascontiguousarray(image).tobytes())
+        return
+
+    def close(self):
+        if self.frames:
+            self.frames[0].save(
+                self.filepath,
+                save_all=True,
+                append_images=self.frames[1:],
+                duration=int(1000 / self.fps),
+                loop=0,
+            )
+        if self.proc is not None:
+            self.proc.stdin.close()
+            self.proc.wait()
+        return
+
+
+_template = None
+
+
+def _init_renderer(template_kwargs: dict):
+    global _template
+    plt.switch_backend("Agg")
+    _template = RayFrameTemplate(**template_kwargs)
+    return
+
+
+def _render_frame(
+    frame: RayFrame,
+    filepath: str = None,
+    image: bool = False,
+    paletted: bool = False,
+    existing: bool = False,
+    template: RayFrameTemplate = None,
+):
+    """
+    Draw one frame once; save it to filepath and/or return the image. An
+    existing frame is read back from filepath instead of being drawn.
+    """
+    from PIL import Image
+
+    if existing:
+        if not image:
+            return None
+        rgb = Image.open(filepath).convert("RGB")
+    else:
+        rgb = Image.fromarray((template or _template).render(frame))
+        if filepath:
+            rgb.save(filepath)
+    if not image:
+        return None
+    # Quantize in the worker, GIF encoding is then only LZW
+    return rgb.quantize(256) if paletted else np.asarray(rgb)
+
+
+def render_frames(
+    frames: list,
+    filepaths: list = None,
+    movie: str = None,
+    fps: int = 5,
+    n_jobs: int = None,
+    kind: str = "los",
+    ylim: list = [],
+    xlim: list = [],
+    dpi: int = 150,
+    overwrite: bool = True,
+):
+    """
+    Render ray-fan frames with the Agg backend, decoupled from the
+    computation. Each worker builds one RayFrameTemplate and reuses it
+    for all its frames; n_jobs=1 renders in this process.
+
+    Parameters:
+    -----------
+    frames: List of RayFrame
+    filepaths: Optional raster image file (png/jpg) per frame
+    movie: Optional .mp4/.gif file; frames are streamed to it in order
+    fps: Frames per second of the movie
+    n_jobs: Number of worker processes (defaults to the CPU count)
+    overwrite: Redraw frames whose file already exists; otherwise they are
+        skipped (and read back from disk for the movie)
+    """
+    import multiprocessing as mp
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    n = len(frames)
+    filepaths = filepaths or [None] * n
+    for f in filepaths:
+        if f and os.path.dirname(f):
+            os.makedirs(os.path.dirname(f), exist_ok=True)
+    writer = MovieWriter(movie, fps) if movie else None
+    existing = [bool(f) and not overwrite and os.path.exists(f) for f in filepaths]
+    args = (
+        frames,
+        filepaths,
+        [writer is not None] * n,
+        [writer is not None and writer.paletted] * n,
+        existing,
+    )
+    template_kwargs = dict(kind=kind, ylim=ylim, xlim=xlim, dpi=dpi)
+    n_jobs = n_jobs or os.cpu_count()
+    logger.info(f"Rendering {n - sum(existing)} of {n} frames on {n_jobs} process(es)")
+    if n_jobs == 1:
+        template = RayFrameTemplate(**template_kwargs)
+        images = (_render_frame(*a, template=template) for a in zip(*args))
+        for image in images:
+            if writer:
+                writer.append(image)
+        template.close()
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_renderer,
+            initargs=(template_kwargs,),
+        ) as executor:
+            for image in executor.map(_render_frame, *args):
+                if writer:
+                    writer.append(image)
+    if writer:
+        writer.close()
+    return
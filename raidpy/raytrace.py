@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+"""raytrace.py: Vectorized 2-D numerical ray tracing through a gridded ionosphere"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import instrument, utils
+from raidpy.constants import pconst
+from raidpy.iono import Ionosphere2d
+from raidpy.ionosphere.pool import BackgroundPool
+
+# PHaRLAP ray labels
+GROUND, PENETRATED, MAX_RANGE, MAX_GROUP_RANGE = 1, -2, -3, -5
+
+
+def ionosphere_plane(
+    date: dt.datetime,
+    ranges: np.array,
+    heights: np.array,
+    ray_bearing: float,
+    origin_lat: float,
+    origin_lon: float,
+    fo: float,
+    pool: BackgroundPool = None,
+    backgrounds: dict = None,
+):
+    """
+    Ionosphere2d on the (ground range, height) plane of a bearing; the
+    points are the flattened (nrange, nheight) mesh.
+
+    Returns the Ionosphere2d and its electron density in [m-3] on the mesh.
+    """
+    lats, lons = utils.destination_points(ranges, ray_bearing, origin_lat, origin_lon)
+    lats = np.repeat(lats, len(heights))
+    lons = np.repeat(lons, len(heights))
+    alts = np.tile(np.asarray(heights, dtype=np.float64), len(ranges))
+    iono = Ionosphere2d(date, lats, lons, alts, fo, pool=pool, backgrounds=backgrounds)
+    edens = np.reshape(iono.iri_block.iri["edens"], (len(ranges), len(heights)))
+    return iono, edens
+
+
+class RayTracer2d(object):
+    """
+    This class traces a fan of rays in the great-circle plane of a bearing
+    with the Haselgrove equations of a spherical Earth in polar coordinates
+    (r, theta) and momenta (p_r, p_theta),
+
+        dr/dt = p_r,   dtheta/dt = p_theta / r^2,
+        dp_r/dt = p_theta^2 / r^3 + d(mu^2)/dr / 2,
+        dp_theta/dt = d(mu^2)/dtheta / 2,
+
+    with mu^2 = 1 - X (no field, no collisions). The parameter t is the
+    group path, which stays regular at reflection. All elevations advance
+    together with fixed RK4 steps on NumPy arrays; rays that land, escape
+    or leave the grid are frozen.
+
+    Parameters:
+    -----------
+    ranges: Ground ranges of the grid in km (1-D, increasing)
+    heights: Heights of the grid in km (1-D, increasing)
+    edens: Electron density in [m-3] of shape (nrange, nheight)
+    fo: Operating frequency in Hz
+    step: Group path step in km
+    max_group_range: Rays are stopped after this group path in km
+    nhops: Number of ground reflections before a ray is stopped
+    """
+
+    def __init__(
+        self,
+        ranges: np.array,
+        heights: np.array,
+        edens: np.array,
+        fo: float = 10e6,
+        step: float = 1.0,
+        max_group_range: float = 10000.0,
+        nhops: int = 1,
+        radius: float = pconst["Re"] / 1e3,
+    ):
+        self.ranges = np.asarray(ranges, dtype=np.float64)
+        self.heights = np.asarray(heights, dtype=np.float64)
+        self.edens = np.asarray(edens, dtype=np.float64)
+        self.fo = fo
+        self.step = step
+        self.max_group_range = max_group_range
+        self.nhops = nhops
+        self.radius = radius
+        # X and its gradients in km-1 on the grid
+        self.X = (
+            self.edens
+            * pconst["q_e"] ** 2
+            / (pconst["eps0"] * pconst["m_e"] * (2 * np.pi * fo) ** 2)
+        )
+        self.dX_dg, self.dX_dh = np.gradient(self.X, self.ranges, self.heights)
+        return
+
+    def interpolate(self, g: np.array, h: np.array):
+        """
+        Bilinear X, dX/dg, dX/dh and Ne at the points; X vanishes above
+        the grid and takes the edge values elsewhere outside it.
+        """
+        out = []
+        idx, wts = [], []
+        for axis, x in zip([self.ranges, self.heights], [g, h]):
+            x = np.clip(x, axis[0], axis[-1])
+            i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+            idx.append(i)
+            wts.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+        (i, j), (u, v) = idx, wts
+        above = h > self.heights[-1]
+        for f in [self.X, self.dX_dg, self.dX_dh, self.edens]:
+            val = (
+                f[i, j] * (1 - u) * (1 - v)
+                + f[i + 1, j] * u * (1 - v)
+                + f[i, j + 1] * (1 - u) * v
+                + f[i + 1, j + 1] * u * v
+            )
+            out.append(np.where(above, 0.0, val))
+        return out
+
+    def derivatives(self, y: np.array):
+        """
+        Right-hand side of the ray equations for states y = (r, theta,
+        p_r, p_theta, phase, geometric) of shape (6, nrays).
+        """
+        r, th, pr, pt = y[:4]
+        X, dXg, dXh, _ = self.interpolate(self.radius * th, r - self.radius)
+        mu2 = 1 - X
+        # d(mu^2)/dr = -dX/dh; d(mu^2)/dtheta = -Re dX/dg
+        return np.stack(
+            [
+                pr,
+                pt / r**2,
+                pt**2 / r**3 - 0.5 * dXh,
+                -0.5 * self.radius * dXg,
+                mu2,  # Phase path, mu ds = mu^2 dt
+                np.sqrt(np.clip(mu2, 0, None)),  # Geometric path, ds = mu dt
+            ]
+        )
+
+    @instrument.stage(
+        "raytrace.fan", points=lambda self, elvs: len(np.atleast_1d(elvs))
+    )
+    def trace(self, elvs: np.array):
+        """
+        Trace all elevations (deg) at once and return (ray_data,
+        ray_path_data) as produced by utils.load_rays_mat_file.
+        """
+        elvs = np.atleast_1d(np.asarray(elvs, dtype=np.float64))
+        logger.info(f"Tracing {len(elvs)} rays at {self.fo/1e6} MHz")
+        n, dt_ = len(elvs), self.step
+        e = np.deg2rad(elvs)
+        y = np.stack(
+            [
+                np.full(n, self.radius),
+                np.zeros(n),
+                np.sin(e),
+                self.radius * np.cos(e),
+                np.zeros(n),
+                np.zeros(n),
+            ]
+        )
+        n_steps = int(np.ceil(self.max_group_range / dt_))
+        states, times = [y.copy()], [np.zeros(n)]
+        active = np.ones(n, dtype=bool)
+        hops, label = np.zeros(n, dtype=int), np.zeros(n, dtype=int)
+        t = np.zeros(n)
+        for _ in range(n_steps):
+            if not active.any():
+                break
+            k1 = self.derivatives(y)
+            k2 = self.derivatives(y + 0.5 * dt_ * k1)
+            k3 = self.derivatives(y + 0.5 * dt_ * k2)
+            k4 = self.derivatives(y + dt_ * k3)
+            yn = y + dt_ / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+            tn = t + dt_
+            # Land exactly on the ground where a descending ray crosses it
+            h0, h1 = y[0] - self.radius, yn[0] - self.radius
+            land = active & (h1 <= 0) & (yn[2] < 0)
+            frac = np.where(land, h0 / np.where(land, h0 - h1, 1.0), 1.0)
+            yn = np.where(active, y + frac * (yn - y), y)
+            tn = np.where(active, t + frac * dt_, t)
+            yn[0] = np.where(land, self.radius, yn[0])
+            hops += land
+            yn[2] = np.where(land & (hops < self.nhops), -yn[2], yn[2])
+            label = np.where(land & (hops >= self.nhops), GROUND, label)
+            g, h = self.radius * yn[1], yn[0] - self.radius
+            label = np.where(
+                active & (label == 0) & (h > self.heights[-1]) & (yn[2] > 0),
+                PENETRATED,
+                label,
+            )
+            label = np.where(
+                active & (label == 0) & (g > self.ranges[-1]), MAX_RANGE, label
+            )
+            y, t = yn, tn
+            states.append(y.copy())
+            times.append(t.copy())
+            # Frozen rays repeat their last state and are trimmed below
+            active = active & (label == 0)
+        label = np.where(label == 0, MAX_GROUP_RANGE, label)
+        return self.assemble(elvs, np.stack(states), np.stack(times), hops, label)
+
+    def assemble(self, elvs, states, times, hops, label):
+        """
+        Trim the frozen tail of every ray and build the PHaRLAP schema.
+        """
+        # Steps at which every ray last moved
+        moved = np.concatenate(
+            [np.ones((1, len(elvs)), dtype=bool), np.diff(times, axis=0) > 0]
+        )
+        last = len(times) - 1 - np.argmax(moved[::-1], axis=0)
+        ray_data, ray_path_data = [], dict()
+        for i, e in enumerate(elvs):
+            s, t = states[: last[i] + 1, :, i], times[: last[i] + 1, i]
+            g, h = self.radius * s[:, 1], s[:, 0] - self.radius
+            X, _, _, ne = self.interpolate(g, h)
+            ray = pd.DataFrame(
+                dict(
+                    ground_range=g,
+                    height=h,
+                    group_range=t,
+                    phase_path=s[:, 4],
+                    geometric_distance=s[:, 5],
+                    electron_density=ne * 1e-6,  # To /cm3 as in PHaRLAP
+                    refractive_index=np.sqrt(np.clip(1 - X, 0, None)),
+                )
+            )
+            ray_path_data[float(e)] = ray
+            ray_data.append(self.summary(float(e), ray, s[-1], hops[i], label[i]))
+        return pd.DataFrame.from_records(ray_data), ray_path_data
+
+    def summary(self, elv, ray, final, hops, label):
+        """
+        The ray_data record of one ray.
+        """
+        a = int(np.argmax(ray.height))
+        D, P = ray.ground_range.iloc[-1], ray.group_range.iloc[-1]
+        # Virtual height of an equivalent mirror over a spherical Earth
+        nh = max(int(hops), 1)
+        phi = D / nh / (2 * self.radius)
+        hv = (
+            self.radius * np.cos(phi)
+            + np.sqrt(
+                np.clip(
+                    (self.radius * np.cos(phi)) ** 2
+                    - self.radius**2
+                    + (P / nh / 2) ** 2,
+                    0,
+                    None,
+                )
+            )
+            - self.radius
+        )
+        ds = np.diff(ray.geometric_distance, prepend=0.0) * 1e3
+        return dict(
+            ground_range=D,
+            group_range=P,
+            phase_path=ray.phase_path.iloc[-1],
+            geometric_path_length=ray.geometric_distance.iloc[-1],
+            initial_elev=elv,
+            final_elev=np.rad2deg(np.arctan2(final[2], final[3] / final[0])),
+            apogee=ray.height.iloc[a],
+            gnd_rng_to_apogee=ray.ground_range.iloc[a],
+            plasma_freq_at_apogee=np.sqrt(
+                ray.electron_density.iloc[a]
+                * 1e6
+                * pconst["q_e"] ** 2
+                / (pconst["eps0"] * pconst["m_e"])
+            )
+            / (2 * np.pi * 1e6),
+            virtual_height=hv,
+            effective_range=np.nan,
+            deviative_absorption=np.nan,
+            TEC_path=np.sum(ray.electron_density * 1e6 * ds),
+            Doppler_shift=0.0,
+            Doppler_spread=0.0,
+            frequency=self.fo / 1e6,
+            nhops_attempted=self.nhops,
+            ray_label=label,
+        )
+
+
+def trace_fan(
+    elvs: np.array,
+    ranges: np.array,
+    heights: np.array,
+    edens: np.array,
+    fo: float = 10e6,
+    **kwargs,
+):
+    """
+    Trace a fan and return (ray_data, ray_path_data); keyword arguments go
+    to RayTracer2d.
+    """
+    return RayTracer2d(ranges, heights, edens, fo, **kwargs).trace(elvs)
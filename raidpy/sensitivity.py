@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+"""sensitivity.py: Analytic derivatives of the AH/SW kernels and path integrals"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+from dataclasses import dataclass
+
+import numpy as np
+from loguru import logger
+
+from raidpy import instrument, utils
+from raidpy.absorption import _sw_valid, tabulated_C, tabulated_dC
+from raidpy.constants import pconst
+from raidpy.functions import Oblique
+
+
+# ===================================================================================
+# Every kernel returns the complex refractive index n with dn/dNe and dn/dnu
+# (the collision frequency is an independent input, so dn/dNe is taken at a
+# fixed nu). Absorption beta = 8.68 k 1e3 |Im n| and phase Re(n) follow as
+#   d(beta) = 8.68 k 1e3 sign(Im n) Im(dn),  d(phase) = Re(dn).
+# ===================================================================================
+def ah_index(Ne, nu, Bo, fo: float, mode: str = "O"):
+    """
+    Appleton-Hartree index of the given mode (as in CalculateAbsorption)
+    and its derivatives with respect to Ne [m-3] and nu [1/s].
+    """
+    w = 2 * np.pi * fo
+    dXdNe = pconst["q_e"] ** 2 / (pconst["eps0"] * pconst["m_e"] * w**2)
+    X, Z = np.asarray(Ne) * dXdNe, np.asarray(nu) / w
+    Y = pconst["q_e"] * np.asarray(Bo) / (pconst["m_e"] * w)
+    U = 1 - 1j * Z
+    if mode == "X":
+        V = U - X
+        D = V * U - Y**2
+        n = np.sqrt(1 - X * V / D)
+        dn2_dX = -((V - X) * D + X * V * U) / D**2
+        dn2_dZ = 1j * X * (D - V * (U + V)) / D**2
+    else:
+        W = dict(O=U, R=U - Y, L=U + Y)[mode]
+        n = np.sqrt(1 - X / W)
+        dn2_dX = -1 / W
+        dn2_dZ = -1j * X / W**2
+    return n, dn2_dX * dXdNe / (2 * n), dn2_dZ / (w * 2 * n)
+
+
+def sw_index(Ne, nu, Bo, fo: float, mode: str = "O", nu_sw_r: float = 1.0):
+    """
+    Sen-Wyller index of the given mode (as in calculate_sw_OX/RL with the
+    tabulated C(p, y)) and its derivatives with respect to Ne and nu.
+    """
+    Bo, Ne, nu, ok = _sw_valid(Bo, Ne, nu)
+    w = 2 * np.pi * fo
+    nu_sw = nu * nu_sw_r
+    # Everything is linear in Ne: K = wo2 / (w nu_sw) = Ne * KN
+    KN = pconst["q_e"] ** 2 / (pconst["m_e"] * pconst["eps0"] * w * nu_sw)
+    if mode in ["O", "X"]:
+        y = w / nu_sw
+        C15, C25 = tabulated_C(1.5, y), tabulated_C(2.5, y)
+        dC15, dC25 = tabulated_dC(1.5, y), tabulated_dC(2.5, y)
+        ga, gb = y * C15 + 2.5j * C25, y * C15 + 2.5j * C15
+        dga, dgb = C15 + y * dC15 + 2.5j * dC25, C15 + y * dC15 + 2.5j * dC15
+        # a = ajb, b = c + jd; both scale as Ne and as K(nu) g(y(nu))
+        a, b = Ne * KN * ga, Ne * KN * gb
+        da_dNe, db_dNe = KN * ga, KN * gb
+        da_dnu = -a / nu - Ne * KN * dga * y / nu
+        db_dnu = -b / nu - Ne * KN * dgb * y / nu
+        eI, eIII = 1 - a, a - b
+        if mode == "O":
+            n2 = eI
+            dn2 = lambda da, db: -da
+        else:
+            S = eI + eIII
+            n2 = eI + eI * eIII / (2 * S)
+            dn2 = lambda da, db: (
+                -da
+                + (-da * eIII + eI * (da - db)) / (2 * S)
+                + eI * eIII * db / (2 * S**2)
+            )
+        n = np.sqrt(n2)
+        dn_dNe = dn2(da_dNe, db_dNe) / (2 * n)
+        dn_dnu = dn2(da_dnu, db_dnu) / (2 * n)
+    else:
+        wh = pconst["q_e"] * Bo / pconst["m_e"]
+        y = dict(R=(w - wh), L=(w + wh))[mode] / nu_sw
+        g = y * tabulated_C(1.5, y) + 2.5j * tabulated_C(2.5, y)
+        dg = (
+            tabulated_C(1.5, y) + y * tabulated_dC(1.5, y) + 2.5j * tabulated_dC(2.5, y)
+        )
+        A = Ne * KN / 2
+        n = 1 - A * g
+        dn_dNe = -KN * g / 2
+        dn_dnu = A * (g + y * dg) / nu
+    nan = lambda v: np.where(ok, v, np.nan)
+    return nan(n), nan(dn_dNe), nan(dn_dnu)
+
+
+def collision_profile(coll, col_freq: str):
+    """
+    The collision frequency profile of a Collision used by col_freq.
+    """
+    return coll.nu_sn.total if col_freq == "sn" else getattr(coll, f"nu_{col_freq}")
+
+
+def absorption_derivatives(n, dn_dNe, dn_dnu, fo: float):
+    """
+    beta [dB/km] and its derivatives from the index and its derivatives.
+    """
+    c = 8.68 * (2 * np.pi * fo) / pconst["c"] * 1e3
+    s = np.sign(n.imag)
+    return np.abs(c * n.imag), c * s * dn_dNe.imag, c * s * dn_dnu.imag
+
+
+def phase_derivatives(n, dn_dNe, dn_dnu, fo: float = None):
+    """
+    Phase (as in CalculatePhase) and its derivatives.
+    """
+    return n.real, dn_dNe.real, dn_dnu.real
+
+
+@dataclass
+class Sensitivity:
+    """
+    Per-point values and derivatives along a path and the Jacobian of the
+    path integral with respect to the per-point inputs.
+    """
+
+    value: np.array = None
+    d_edens: np.array = None
+    d_nu: np.array = None
+    total: float = None
+    jacobian_edens: np.array = None
+    jacobian_nu: np.array = None
+
+
+class PathSensitivity(object):
+    """
+    This class computes analytic sensitivities of a path integral of an
+    Oblique at the cost of one forward evaluation.
+
+    Parameters:
+    -----------
+    ol: Oblique
+    wave_disp_reltn: 'ah' or 'sw'
+    col_freq: Collision frequency model (ft, sn, av_cc, av_mb)
+    mode: O, X, R or L
+    kind: 'los' (absorption in dB) or 'phase'
+    nu_sw_r: Sen-Wyller collision frequency ratio
+    """
+
+    def __init__(
+        self,
+        ol: Oblique,
+        wave_disp_reltn: str = "ah",
+        col_freq: str = "sn",
+        mode: str = "O",
+        kind: str = "los",
+        nu_sw_r: float = 1.0,
+        _run_: bool = True,
+    ):
+        self.ol = ol
+        self.wave_disp_reltn = wave_disp_reltn
+        self.col_freq = col_freq
+        self.mode = mode
+        self.kind = kind
+        self.nu_sw_r = nu_sw_r
+        if _run_:
+            self.compute()
+        return
+
+    @instrument.stage("sensitivity", points=lambda self: len(self.ol.ray))
+    def compute(self):
+        logger.info(
+            f"Sensitivity of {self.kind} for {self.wave_disp_reltn}:{self.col_freq}:{self.mode}"
+        )
+        Ne = np.asarray(self.ol.iono.iri_block.iri["edens"], dtype=np.float64)
+        Bo = np.asarray(self.ol.iono.igrf_block.igrf["total"], dtype=np.float64)
+        nu = np.asarray(
+            collision_profile(self.ol.iono.cc.collision, self.col_freq),
+            dtype=np.float64,
+        )
+        if self.wave_disp_reltn == "ah":
+            n, dNe, dnu = ah_index(Ne, nu, Bo, self.ol.fo, self.mode)
+        else:
+            n, dNe, dnu = sw_index(Ne, nu, Bo, self.ol.fo, self.mode, self.nu_sw_r)
+        f = absorption_derivatives if self.kind == "los" else phase_derivatives
+        value, d_edens, d_nu = [np.nan_to_num(x) for x in f(n, dNe, dnu, self.ol.fo)]
+        w = utils.trapz_weights(self.ol.ray_details.phase_path)
+        self.sens = Sensitivity(
+            value=value,
+            d_edens=d_edens,
+            d_nu=d_nu,
+            total=float(np.sum(w * value)),
+            jacobian_edens=w * d_edens,
+            jacobian_nu=w * d_nu,
+        )
+        return self.sens
+
+
+def doppler_jacobian(s0: Sensitivity, s1: Sensitivity, del_t: float):
+    """
+    Jacobians of the Doppler shift df = (P0 - P1) / (4 pi del_t) [Hz] with
+    respect to the inputs at t0 and at t1, from two phase sensitivities.
+    """
+    scale = 1 / (4 * np.pi * del_t)
+    return (
+        (s0.jacobian_edens * scale, s0.jacobian_nu * scale),
+        (-s1.jacobian_edens * scale, -s1.jacobian_nu * scale),
+    )
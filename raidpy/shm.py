@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+"""shm.py: Named numpy arrays backed by one shared-memory segment"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+
+import numpy as np
+
+ALIGN = 64  # Byte alignment of every array inside the segment
+
+
+@dataclass
+class SharedSpec:
+    """
+    Picklable description of a SharedArrays segment; this is all a worker
+    needs to re-open the arrays without copying them.
+    """
+
+    name: str = None
+    layout: dict = field(default_factory=dict)  # key -> (offset, shape, dtype)
+
+
+class SharedArrays(object):
+    """
+    A set of named numpy arrays living in one shared-memory segment.
+
+    Parameters:
+    -----------
+    layout: Dictionary of key -> (offset, shape, dtype)
+    shm: multiprocessing SharedMemory holding the data
+    owner: True if this process created (and must unlink) the segment
+    """
+
+    def __init__(
+        self, layout: dict, shm: shared_memory.SharedMemory, owner: bool = False
+    ):
+        self.layout = layout
+        self.shm = shm
+        self.owner = owner
+        self._views = dict()
+        return
+
+    @staticmethod
+    def create(shapes: dict, dtype=np.float64):
+        """
+        Allocate a zero-filled segment for the given key -> shape (or
+        key -> (shape, dtype)) mapping.
+        """
+        layout, offset = dict(), 0
+        for key, shape in shapes.items():
+            dty = np.dtype(dtype)
+            if (
+                isinstance(shape, tuple)
+                and len(shape) == 2
+                and not isinstance(shape[1], (int, np.integer))
+            ):
+                shape, dty = shape[0], np.dtype(shape[1])
+            shape = tuple(int(s) for s in np.atleast_1d(shape))
+            layout[key] = (offset, shape, dty.str)
+            nbytes = int(np.prod(shape)) * dty.itemsize
+            offset += -(-nbytes // ALIGN) * ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, ALIGN))
+        arrays = SharedArrays(layout, shm, owner=True)
+        for key in layout.keys():
+            arrays[key][...] = 0
+        return arrays
+
+    @staticmethod
+    def from_arrays(arrays: dict):
+        """
+        Copy a dictionary of arrays into a new shared segment.
+        """
+        arrays = {key: np.asarray(val) for key, val in arrays.items()}
+        sa = SharedArrays.create({k: (v.shape, v.dtype) for k, v in arrays.items()})
+        for key, val in arrays.items():
+            sa[key][...] = val
+        return sa
+
+    @staticmethod
+    def attach(spec: SharedSpec):
+        """
+        Re-open a segment created in another process.
+        """
+        shm = shared_memory.SharedMemory(name=spec.name)
+        return SharedArrays(spec.layout, shm, owner=False)
+
+    @property
+    def spec(self):
+        return SharedSpec(name=self.shm.name, layout=self.layout)
+
+    def keys(self):
+        return self.layout.keys()
+
+    def __contains__(self, key):
+        return key in self.layout
+
+    def __getitem__(self, key):
+        if key not in self._views:
+            offset, shape, dtype = self.layout[key]
+            self._views[key] = np.ndarray(
+                shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset
+            )
+        return self._views[key]
+
+    def to_dict(self, keys: list = None, prefix: str = ""):
+        """
+        Copy arrays out of the segment (optionally only keys starting
+        with prefix, which is stripped from the returned keys).
+        """
+        keys = keys if keys is not None else list(self.layout.keys())
+        return {
+            key[len(prefix) :]: np.array(self[key])
+            for key in keys
+            if key.startswith(prefix)
+        }
+
+    def close(self):
+        self._views = dict()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+"""surrogate.py: Adaptive RBF emulators of path-integrated absorption and phase"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import instrument
+from raidpy.parallel import quantity_key
+
+
+def latin_hypercube(n: int, d: int, rng: np.random.Generator):
+    """
+    n points of a Latin hypercube in the unit cube [0, 1]^d.
+    """
+    u = (np.arange(n)[:, None] + rng.random((n, d))) / n
+    for j in range(d):
+        u[:, j] = u[rng.permutation(n), j]
+    return u
+
+
+class CubicRBF(object):
+    """
+    Cubic polyharmonic interpolant phi(r) = r^3 with a linear polynomial
+    tail, fitted to all outputs at once. The leave-one-out residuals come
+    for free from the inverse of the augmented system (Rippa, 1999):
+    e_i = c_i / (M^-1)_ii.
+
+    Parameters:
+    -----------
+    x: Nodes in the unit cube, (n, d)
+    y: Values, (n, q)
+    """
+
+    def __init__(self, x: np.array, y: np.array):
+        self.x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n, d = self.x.shape
+        P = np.hstack([np.ones((n, 1)), self.x])
+        M = np.zeros((n + d + 1, n + d + 1))
+        M[:n, :n] = self.kernel(self.x, self.x)
+        M[:n, n:], M[n:, :n] = P, P.T
+        Minv = np.linalg.pinv(M)
+        rhs = np.vstack([y, np.zeros((d + 1, y.shape[1]))])
+        self.coef = Minv @ rhs
+        self.loo = self.coef[:n] / np.diag(Minv)[:n, None]
+        return
+
+    @staticmethod
+    def kernel(a: np.array, b: np.array):
+        r = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(-1))
+        return r**3
+
+    def __call__(self, x: np.array):
+        x = np.asarray(x, dtype=np.float64)
+        P = np.hstack([np.ones((len(x), 1)), x])
+        return np.hstack([self.kernel(x, self.x), P]) @ self.coef
+
+
+@dataclass
+class SurrogatePrediction:
+    """
+    values: Emulated totals, one column per output
+    errors: Estimated absolute error of every value
+    """
+
+    values: pd.DataFrame = None
+    errors: pd.DataFrame = None
+
+
+class Surrogate(object):
+    """
+    This class emulates path integrals (e.g. total absorption and phase)
+    over a box of inputs such as elevation, time and frequency from a
+    sparse set of full evaluations. A cubic RBF is fitted to the
+    evaluations; its leave-one-out residuals, spread to a query by
+    inverse-distance weighting over the nearest nodes and inflated with
+    the distance to the nearest node, give the error estimate. New
+    evaluations are placed where this estimate is largest until it falls
+    below tolerance everywhere on a dense candidate set.
+
+    Parameters:
+    -----------
+    evaluate: Callable taking a DataFrame of inputs (one row per point,
+        one column per name in bounds) and returning a DataFrame of
+        outputs, one row per point
+    bounds: Dictionary name -> (lower, upper) of every input
+    n_initial: Initial Latin-hypercube evaluations
+    batch: Evaluations added per refinement round
+    tolerance: Target of the estimated error, relative to the output range
+    max_evaluations: Budget of full evaluations
+    n_candidates: Size of the candidate set scanned for refinement
+    """
+
+    def __init__(
+        self,
+        evaluate,
+        bounds: dict,
+        n_initial: int = 20,
+        batch: int = 5,
+        tolerance: float = 1e-2,
+        max_evaluations: int = 100,
+        n_candidates: int = 2000,
+        seed: int = 0,
+        _run_: bool = True,
+    ):
+        self.evaluate = evaluate
+        self.bounds = bounds
+        self.names = list(bounds.keys())
+        self.lower = np.array([bounds[k][0] for k in self.names], dtype=np.float64)
+        self.upper = np.array([bounds[k][1] for k in self.names], dtype=np.float64)
+        self.n_initial = n_initial
+        self.batch = batch
+        self.tolerance = tolerance
+        self.max_evaluations = max_evaluations
+        self.rng = np.random.default_rng(seed)
+        self.candidates = latin_hypercube(n_candidates, len(self.names), self.rng)
+        self.u, self.y = np.zeros((0, len(self.names))), None
+        if _run_:
+            self.run()
+        return
+
+    def to_inputs(self, u: np.array):
+        return pd.DataFrame(
+            self.lower + u * (self.upper - self.lower), columns=self.names
+        )
+
+    def to_unit(self, inputs: pd.DataFrame):
+        x = np.asarray(inputs[self.names], dtype=np.float64)
+        return (x - self.lower) / (self.upper - self.lower)
+
+    @instrument.stage("surrogate.evaluate", points=lambda self, u: len(u))
+    def add(self, u: np.array):
+        """
+        Run the full evaluations of the unit points u and refit.
+        """
+        out = self.evaluate(self.to_inputs(u))
+        self.outputs = list(out.columns)
+        y = np.asarray(out, dtype=np.float64)
+        self.u = np.vstack([self.u, u])
+        self.y = y if self.y is None else np.vstack([self.y, y])
+        self.rbf = CubicRBF(self.u, self.y)
+        # Typical node spacing and output ranges set the error scales
+        d = np.sqrt(((self.u[:, None] - self.u[None]) ** 2).sum(-1))
+        np.fill_diagonal(d, np.inf)
+        self.spacing = np.median(d.min(axis=1))
+        self.scale = np.ptp(self.y, axis=0) + 1e-30
+        return
+
+    def error(self, u: np.array, k: int = 8):
+        """
+        Estimated absolute error at the unit points u, (m, q).
+        """
+        d = np.sqrt(((u[:, None] - self.u[None]) ** 2).sum(-1))
+        k = min(k, len(self.u))
+        nn = np.argpartition(d, k - 1, axis=1)[:, :k]
+        dn = np.take_along_axis(d, nn, axis=1)
+        w = 1 / (dn**2 + 1e-12)
+        w /= w.sum(axis=1, keepdims=True)
+        e = np.einsum("mk,mkq->mq", w, np.abs(self.rbf.loo[nn]))
+        return e * (1 + dn.min(axis=1, keepdims=True) / self.spacing)
+
+    def refine(self):
+        """
+        Add a batch of evaluations at the candidates of largest relative
+        error, keeping them at least half a node spacing apart from each
+        other and from the nodes already evaluated. Picked candidates are
+        removed from the candidate set.
+
+        Returns the largest relative error before the batch, or np.inf if
+        no candidate is left to place (the error is then unknown).
+        """
+        rel = (self.error(self.candidates) / self.scale).max(axis=1)
+        d = np.sqrt(((self.candidates[:, None] - self.u[None]) ** 2).sum(-1))
+        free = d.min(axis=1) > self.spacing / 2
+        picks = []
+        for i in np.argsort(rel)[::-1]:
+            if len(picks) == self.batch:
+                break
+            c = self.candidates[i]
+            if free[i] and all(
+                np.linalg.norm(c - self.candidates[j]) > self.spacing / 2 for j in picks
+            ):
+                picks.append(i)
+        if not picks:
+            logger.warning("No candidate left away from the nodes")
+            return np.inf
+        self.add(self.candidates[picks])
+        self.candidates = np.delete(self.candidates, picks, axis=0)
+        return rel[free].max()
+
+    def run(self):
+        """
+        Refine until the error is below tolerance (converged is then set),
+        the budget is spent or the candidates are exhausted; estimate holds
+        the last estimated relative error.
+        """
+        self.add(latin_hypercube(self.n_initial, len(self.names), self.rng))
+        self.converged, self.estimate = False, np.inf
+        while len(self.u) + self.batch <= self.max_evaluations:
+            err = self.refine()
+            if not np.isfinite(err):
+                break
+            self.estimate = err
+            logger.info(f"Surrogate with {len(self.u)} evaluations, error {err:.2e}")
+            if err < self.tolerance:
+                self.converged = True
+                break
+        if not self.converged:
+            logger.warning(
+                f"Surrogate not converged with {len(self.u)} evaluations, "
+                f"last error {self.estimate:.2e} > tolerance {self.tolerance:.1e}"
+            )
+        return self
+
+    @instrument.stage("surrogate.predict", points=lambda self, x: len(x))
+    def predict(self, inputs: pd.DataFrame):
+        """
+        Emulated outputs and their estimated errors at the inputs.
+        """
+        u = self.to_unit(inputs)
+        return SurrogatePrediction(
+            values=pd.DataFrame(self.rbf(u), columns=self.outputs),
+            errors=pd.DataFrame(self.error(u), columns=self.outputs),
+        )
+
+
+def oblique_evaluator(make_oblique, quantities: list = [("los", "ah", "sn", "O")]):
+    """
+    An evaluate callable for Surrogate: make_oblique maps one input row
+    (a pandas Series) to an Oblique, whose path integrals of the
+    quantities (kind, wave_disp_reltn, col_freq, mode) are returned.
+    """
+
+    def evaluate(inputs: pd.DataFrame):
+        rows = []
+        for _, row in inputs.iterrows():
+            ol = make_oblique(row)
+            o = dict()
+            for kind, r, c, m in quantities:
+                f = (
+                    ol.get_total_absorption_along_path
+                    if kind == "los"
+                    else ol.get_total_phase_along_path
+                )
+                o[quantity_key(kind, r, c, m)] = f(None, r, c, m)
+            rows.append(o)
+        return pd.DataFrame.from_records(rows)
+
+    return evaluate
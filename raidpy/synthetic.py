@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+"""synthetic.py: Synthetic ionospheres, backgrounds and PHaRLAP-like rays"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from raidpy.constants import pconst
+
+
+def chapman_edens(
+    alts: np.array,
+    nmax: float = 5e11,
+    hmax: float = 250.0,
+    scale_height: float = 50.0,
+    d_region: float = 1e9,
+    d_scale: float = 8.0,
+):
+    """
+    Chapman-layer electron density in [m-3] with an exponential
+    D/E-region ledge (d_region at 90 km, e-folding d_scale km).
+
+    alts: Altitudes in km
+    nmax: Peak density in m-3
+    hmax: Peak height in km
+    scale_height: Chapman scale height in km
+    """
+    z = (np.asarray(alts) - hmax) / scale_height
+    ne = nmax * np.exp(0.5 * (1 - z - np.exp(-z)))
+    ne += d_region * np.exp(np.clip((np.asarray(alts) - 90.0) / d_scale, -50, 0))
+    return ne
+
+
+def synthetic_backgrounds(
+    alts: np.array,
+    nmax: float = 5e11,
+    hmax: float = 250.0,
+    Bo: float = 5e-5,
+):
+    """
+    Analytic stand-ins for the IRI, MSISE and IGRF blocks along the points
+    (same keys and units) so that the kernels run without model data.
+
+    alts: Altitudes in km
+    Bo: Total geomagnetic field in Tesla
+    """
+    alts = np.asarray(alts, dtype=np.float64)
+    ones = np.ones(len(alts))
+    Tn = 200.0 + 800.0 * (1 - np.exp(-np.clip(alts - 90.0, 0, None) / 40.0))
+    Te = Tn * (1 + 1.5 * (1 - np.exp(-np.clip(alts - 100.0, 0, None) / 60.0)))
+    nn = 1.5e21 * np.exp(-(alts - 60.0) / 7.0)  # in m-3
+    msise = dict(
+        nn=nn * 28.9 * pconst["amu"],
+        N2=0.78 * nn,
+        O2=0.21 * nn,
+        O=0.01 * nn * np.exp(np.clip(alts - 90.0, 0, None) / 30.0),
+        He=5e-6 * nn,
+        H=1e-7 * nn,
+        Ar=0.0093 * nn,
+        N=1e-8 * nn,
+        O_Anomalous=0 * ones,
+        NO=1e-8 * nn,
+        Tn=Tn,
+    )
+    msise["t_nn"] = sum(msise[k] for k in ["N2", "O2", "O", "He", "H", "Ar", "N"])
+    iri = dict(
+        edens=chapman_edens(alts, nmax, hmax),
+        ntemp=Tn,
+        itemp=Tn,
+        etemp=Te,
+        o=np.clip((alts - 100.0) * 0.5, 0, 90) + 5.0,
+        h=1.0 * ones,
+        he=0 * ones,
+        o2=50.0 * ones,
+        no=40.0 * ones,
+        cluster=0 * ones,
+        n=0 * ones,
+    )
+    igrf = dict(
+        north=0.3 * Bo * ones,
+        east=0 * ones,
+        down=0.95 * Bo * ones,
+        total=Bo * ones,
+        incl=70.0 * ones,
+        decl=0 * ones,
+    )
+    return dict(iri=iri, msise=msise, igrf=igrf)
+
+
+def _plasma_X(ne: np.array, fo: float):
+    return (
+        ne
+        * pconst["q_e"] ** 2
+        / (pconst["eps0"] * pconst["m_e"] * (2 * np.pi * fo) ** 2)
+    )
+
+
+def parabolic_ray(
+    elv: float,
+    fo: float = 10e6,
+    n_points: int = 500,
+    apex: float = 250.0,
+    nhops: int = 1,
+    nmax: float = 5e11,
+    hmax: float = 250.0,
+):
+    """
+    A ray path following a parabola in (ground range, height) with the
+    columns load_rays_mat_file produces. Electron density is in [cm-3]
+    as in PHaRLAP outputs.
+
+    elv: Initial elevation in deg
+    fo: Frequency in Hz
+    n_points: Number of points along the whole path
+    apex: Reflection height in km
+    nhops: Number of hops
+
+    The apex is lowered below the height where X reaches 0.9 so that the
+    path never enters the evanescent region.
+    """
+    h = np.arange(0.0, apex + 1.0)
+    X = _plasma_X(chapman_edens(h, nmax, hmax), fo)
+    if np.any(X >= 0.9):
+        apex = max(h[np.argmax(X >= 0.9)] - 1.0, 60.0)
+    hop = 4 * apex / np.tan(np.deg2rad(elv))
+    grange = np.linspace(0, hop * nhops, n_points)
+    g = np.mod(grange, hop) / hop
+    height = 4 * apex * g * (1 - g)
+    height[-1] = 0.0
+    ne = chapman_edens(height, nmax, hmax)
+    mu = np.sqrt(np.clip(1 - _plasma_X(ne, fo), 1e-4, 1))
+    ds = np.concatenate([[0], np.hypot(np.diff(grange), np.diff(height))])
+    geometric_distance = np.cumsum(ds)
+    ray = pd.DataFrame(
+        dict(
+            ground_range=grange,
+            height=height,
+            group_range=np.cumsum(ds / mu),
+            phase_path=np.cumsum(ds * mu),
+            geometric_distance=geometric_distance,
+            electron_density=ne * 1e-6,
+            refractive_index=mu,
+        )
+    )
+    return ray
+
+
+def synthetic_rays(
+    elvs: list = None,
+    n_rays: int = 10,
+    fo: float = 10e6,
+    n_points: int = 500,
+    apex: float = 250.0,
+    nhops: int = 1,
+):
+    """
+    A fan of parabolic rays in the (ray_data, ray_path_data) form returned
+    by utils.load_rays_mat_file.
+    """
+    elvs = elvs if elvs is not None else np.linspace(5, 30, n_rays)
+    ray_data, ray_path_data = [], dict()
+    for e in elvs:
+        e = float(e)
+        ray = parabolic_ray(e, fo, n_points, apex, nhops)
+        ray_path_data[e] = ray
+        ray_data.append(
+            dict(
+                ground_range=ray.ground_range.iloc[-1],
+                group_range=ray.group_range.iloc[-1],
+                phase_path=ray.phase_path.iloc[-1],
+                geometric_path_length=ray.geometric_distance.iloc[-1],
+                initial_elev=e,
+                apogee=ray.height.max(),
+                frequency=fo / 1e6,
+                nhops_attempted=nhops,
+            )
+        )
+    return pd.DataFrame.from_records(ray_data), ray_path_data
+
+
+def synthetic_bearing(
+    olat: float = 40.0150,
+    olon: float = -105.2705,
+    rb: float = 75.0,
+    freq: float = 10.0,
+):
+    """
+    A bearing namespace with the fields of load_bearing_mat_file used by
+    raidpy (freq in MHz).
+    """
+    return SimpleNamespace(
+        olat=np.array([[olat]]),
+        olon=np.array([[olon]]),
+        rb=np.array([[rb]]),
+        freq=np.array([[freq]]),
+    )
+
+
+def synthetic_oblique(
+    elv: float = 15.0,
+    date: dt.datetime = dt.datetime(2024, 4, 8, 18),
+    fo: float = 10e6,
+    n_points: int = 500,
+    nmax: float = 5e11,
+    bearing: SimpleNamespace = None,
+):
+    """
+    An Oblique on a parabolic ray with analytic backgrounds; it runs
+    fully offline as no background model is evaluated.
+    """
+    from raidpy.functions import Oblique
+
+    bearing = bearing if bearing is not None else synthetic_bearing(freq=fo / 1e6)
+    ray = parabolic_ray(elv, fo, n_points, nmax=nmax)
+    bgs = synthetic_backgrounds(np.array(ray.height), nmax=nmax)
+    return Oblique(
+        date,
+        np.array(ray.ground_range),
+        np.array(ray.height),
+        float(np.ravel(bearing.rb)[0]),
+        float(np.ravel(bearing.olat)[0]),
+        float(np.ravel(bearing.olon)[0]),
+        fo,
+        ion2d=bgs["iri"],
+        msise=bgs["msise"],
+        igrf2d=bgs["igrf"],
+        edens=np.array(ray.electron_density) * 1e6,  # To /m3
+        ray_details=ray,
+    )
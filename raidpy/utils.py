@@ -11,22 +11,28 @@ __maintainer__ = "Chakraborty, S."
 __email__ = "chakras4@erau.edu"
 __status__ = "Research"
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from types import SimpleNamespace
 
 import numpy as np
 import pandas as pd
-from geopy.distance import great_circle as GC
 from loguru import logger
-from scipy.io import loadmat
+
+from raidpy import instrument
 
 
 def load_bearing_mat_file(file_loc: str):
+    from scipy.io import loadmat
+
     logger.info(f" Loading bearing file: {file_loc}")
     bearing = SimpleNamespace(**loadmat(file_loc))
     return bearing
 
 
 def load_rays_mat_file(file_loc: str):
+    from scipy.io import loadmat
+
     logger.info(f" Loading rays file: {file_loc}")
     sim_data = loadmat(file_loc)
     path_data_keys = [
@@ -73,12 +79,39 @@ def load_rays_mat_file(file_loc: str):
     return ray_data, ray_path_data
 
 
+def prefetch_rays_mat_files(file_locs: list, n_ahead: int = 2, n_threads: int = 1):
+    """
+    Iterate over (file_loc, (ray_data, ray_path_data)) for a campaign's ray
+    files while the next n_ahead files are loaded and decoded on background
+    threads. At most n_ahead files are in flight besides the one yielded.
+    """
+    file_locs = list(file_locs)
+    queue, nxt = deque(), 0
+    with ThreadPoolExecutor(max_workers=max(1, n_threads)) as executor:
+        try:
+            for i in range(len(file_locs)):
+                # Keep file i and the next n_ahead files in flight
+                while nxt < min(len(file_locs), i + n_ahead + 1):
+                    future = executor.submit(load_rays_mat_file, file_locs[nxt])
+                    queue.append((file_locs[nxt], future))
+                    nxt += 1
+                floc, future = queue.popleft()
+                yield floc, future.result()
+        finally:
+            for _, future in queue:
+                future.cancel()
+    return
+
+
+@instrument.stage("geodesics", points=lambda grange, *a, **k: len(grange))
 def create_lat_lon_from_routes(
     grange: np.array,
     r_bearing: float,
     olat: float,
     olon: float,
 ):
+    from geopy.distance import great_circle as GC
+
     lats, lons = [], []
     p = (olat, olon)
     gc = GC(p, p)
@@ -88,3 +121,130 @@ def create_lat_lon_from_routes(
         lons.append(x[1])
     lats, lons = np.array(lats), np.array(lons)
     return lats, lons
+
+
+@instrument.stage("geodesics", points=lambda grange, *a, **k: len(grange))
+def destination_points(
+    grange: np.array,
+    r_bearing: float,
+    olat: float,
+    olon: float,
+    radius: float = 6371.009,
+):
+    """
+    Vectorized create_lat_lon_from_routes: the same great-circle
+    destination formula (and mean Earth radius in km) as geopy.
+    """
+    lat1, lon1 = np.deg2rad(olat), np.deg2rad(olon)
+    b = np.deg2rad(r_bearing)
+    d = np.asarray(grange, dtype=np.float64) / radius
+    lat2 = np.arcsin(np.sin(lat1) * np.cos(d) + np.cos(lat1) * np.sin(d) * np.cos(b))
+    lon2 = lon1 + np.arctan2(
+        np.sin(b) * np.sin(d) * np.cos(lat1), np.cos(d) - np.sin(lat1) * np.sin(lat2)
+    )
+    lons = np.mod(np.rad2deg(lon2) + 180.0, 360.0) - 180.0
+    return np.rad2deg(lat2), lons
+
+
+def segment_trapz(y: np.array, x: np.array, offsets: np.array):
+    """
+    np.trapz of every segment y[offsets[i]:offsets[i+1]] over the matching
+    x in one pass (np.add.reduceat); NaNs in y count as 0.
+    """
+    y, x = np.nan_to_num(np.asarray(y, dtype=np.float64)), np.asarray(x)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if len(y) < 2:
+        return np.zeros(len(offsets) - 1)
+    contrib = np.zeros(len(y))
+    contrib[:-1] = 0.5 * (y[1:] + y[:-1]) * np.diff(x)
+    # Pairs straddling two segments do not contribute
+    ends = offsets[1:] - 1
+    contrib[ends[(ends >= 0) & (ends < len(y))]] = 0.0
+    starts = np.minimum(offsets[:-1], len(y) - 1)
+    totals = np.add.reduceat(contrib, starts)
+    totals[np.diff(offsets) < 2] = 0.0
+    return totals
+
+
+def trapz_weights(x: np.array):
+    """
+    Weights w with np.trapz(y, x) == np.sum(w * y), i.e. the Jacobian of
+    the trapezoid rule with respect to the integrand.
+    """
+    dx = np.diff(np.asarray(x, dtype=np.float64))
+    w = np.zeros(len(dx) + 1)
+    w[:-1] += 0.5 * dx
+    w[1:] += 0.5 * dx
+    return w
+
+
+def hop_segments(height: np.array, offsets: np.array = None, ground_tol: float = 1.0):
+    """
+    Hops of one or more concatenated rays (ray i is height[offsets[i]:
+    offsets[i+1]]). A hop ends where the ray touches the ground, i.e. at
+    an interior local minimum of height below ground_tol km.
+
+    Returns the first and last point index of every hop and its ray; the
+    ground point is shared by the two hops it separates.
+    """
+    h = np.asarray(height, dtype=np.float64)
+    offsets = np.asarray(offsets if offsets is not None else [0, len(h)])
+    edge = np.zeros(len(h), dtype=bool)
+    edge[offsets[:-1]] = True
+    edge[offsets[1:] - 1] = True
+    ground = np.zeros(len(h), dtype=bool)
+    ground[1:-1] = (h[1:-1] <= h[:-2]) & (h[1:-1] < h[2:]) & (h[1:-1] <= ground_tol)
+    starts = np.sort(np.concatenate([offsets[:-1], np.flatnonzero(ground & ~edge)]))
+    nxt = np.append(starts[1:], offsets[-1])
+    # The last hop of a ray ends at its last point, the others on the ground
+    ends = np.where(np.isin(nxt, offsets), nxt - 1, nxt)
+    rays = np.searchsorted(offsets, starts, side="right") - 1
+    return starts, ends, rays
+
+
+def hop_integrals(y: np.array, x: np.array, starts: np.array, offsets: np.array = None):
+    """
+    np.trapz of y over x on every hop (hop_segments starts) in one
+    np.add.reduceat pass; y may carry leading axes (e.g. one row per
+    quantity) and NaNs count as 0. The hops of a ray sum to its total.
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    x = np.asarray(x, dtype=np.float64)
+    offsets = np.asarray(offsets if offsets is not None else [0, x.shape[-1]])
+    contrib = np.zeros(y.shape)
+    contrib[..., :-1] = 0.5 * (y[..., 1:] + y[..., :-1]) * np.diff(x)
+    # Pairs straddling two rays do not contribute
+    contrib[..., offsets[1:] - 1] = 0.0
+    return np.add.reduceat(contrib, starts, axis=-1)
+
+
+def solar_zenith_angle(dates, lats: np.array, lons: np.array):
+    """
+    Solar zenith angle in deg (NOAA low-precision solar position, ~0.1 deg)
+    at UT datetime(s) dates and geographic lats, lons; inputs broadcast.
+    """
+    t = pd.to_datetime(np.atleast_1d(dates))
+    doy = np.asarray(t.dayofyear, dtype=np.float64)
+    hour = np.asarray(t.hour + t.minute / 60.0 + t.second / 3600.0, dtype=np.float64)
+    g = 2 * np.pi / 365.0 * (doy - 1 + (hour - 12) / 24.0)
+    decl = (
+        0.006918
+        - 0.399912 * np.cos(g)
+        + 0.070257 * np.sin(g)
+        - 0.006758 * np.cos(2 * g)
+        + 0.000907 * np.sin(2 * g)
+        - 0.002697 * np.cos(3 * g)
+        + 0.00148 * np.sin(3 * g)
+    )
+    eqtime = 229.18 * (
+        0.000075
+        + 0.001868 * np.cos(g)
+        - 0.032077 * np.sin(g)
+        - 0.014615 * np.cos(2 * g)
+        - 0.040849 * np.sin(2 * g)
+    )
+    ha = np.deg2rad((hour * 60 + eqtime + 4 * np.asarray(lons)) / 4.0 - 180.0)
+    lat = np.deg2rad(lats)
+    cosz = np.sin(lat) * np.sin(decl) + np.cos(lat) * np.cos(decl) * np.cos(ha)
+    sza = np.rad2deg(np.arccos(np.clip(cosz, -1, 1)))
+    return sza if np.ndim(dates) or np.ndim(lats) or np.ndim(lons) else float(sza[0])
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+"""validation.py: Accuracy-versus-speed harness for fast configurations"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from raidpy import synthetic, utils
+
+# Every (wave_disp_reltn, col_freq, mode) raidpy computes
+COMBINATIONS = [
+    (r, c, m)
+    for r, cols in [("ah", ["ft", "sn", "av_cc", "av_mb"]), ("sw", ["ft"])]
+    for c in cols
+    for m in ["O", "X", "R", "L"]
+]
+
+
+@dataclass
+class Scenario:
+    """
+    Inputs of one Oblique evaluation. backgrounds (per-point iri, msise
+    and igrf dictionaries) are optional; the models are evaluated when
+    they are not given.
+    """
+
+    name: str = None
+    date: dt.datetime = None
+    ray: pd.DataFrame = None
+    ray_bearing: float = None
+    origin_lat: float = None
+    origin_lon: float = None
+    fo: float = None
+    backgrounds: dict = None
+
+    @staticmethod
+    def synthetic(elv: float = 15.0, fo: float = 10e6, n_points: int = 500, **kwargs):
+        ray = synthetic.parabolic_ray(elv, fo, n_points, **kwargs)
+        b = synthetic.synthetic_bearing(freq=fo / 1e6)
+        return Scenario(
+            name=f"synthetic_{elv}deg_{fo/1e6}MHz",
+            date=dt.datetime(2024, 4, 8, 18),
+            ray=ray,
+            ray_bearing=float(np.ravel(b.rb)[0]),
+            origin_lat=float(np.ravel(b.olat)[0]),
+            origin_lon=float(np.ravel(b.olon)[0]),
+            fo=fo,
+            backgrounds=synthetic.synthetic_backgrounds(np.array(ray.height)),
+        )
+
+    @staticmethod
+    def recorded(
+        date: dt.datetime, rays_file_loc: str, bearing_file_loc: str, elvs: list
+    ):
+        """
+        Scenarios for the given elevations of a PHaRLAP ray file.
+        """
+        bearing = utils.load_bearing_mat_file(bearing_file_loc)
+        _, rays = utils.load_rays_mat_file(rays_file_loc)
+        return [
+            Scenario(
+                name=f"{date.strftime('%Y%m%d%H%M')}_{e}deg",
+                date=date,
+                ray=rays[e],
+                ray_bearing=float(np.ravel(bearing.rb)[0]),
+                origin_lat=float(np.ravel(bearing.olat)[0]),
+                origin_lon=float(np.ravel(bearing.olon)[0]),
+                fo=float(np.ravel(bearing.freq)[0]) * 1e6,
+            )
+            for e in elvs
+        ]
+
+
+@dataclass
+class Configuration:
+    """
+    How a scenario is evaluated. The defaults are the reference.
+
+    thin: Keep every thin-th point of the path (end point always kept)
+    dtype: Floating point precision of the path and background inputs
+    oblique_kwargs: Extra keyword arguments passed to Oblique
+    """
+
+    name: str = "reference"
+    thin: int = 1
+    dtype: type = np.float64
+    oblique_kwargs: dict = field(default_factory=dict)
+
+    def select(self, n: int):
+        idx = np.arange(0, n, self.thin)
+        return idx if idx[-1] == n - 1 else np.append(idx, n - 1)
+
+    def build(self, scenario: Scenario):
+        from raidpy.functions import Oblique
+
+        idx = self.select(len(scenario.ray))
+        ray = scenario.ray.iloc[idx].reset_index(drop=True)
+        ray = ray.astype(self.dtype)
+        bgs = {
+            m: {k: np.asarray(v)[idx].astype(self.dtype) for k, v in b.items()}
+            for m, b in (scenario.backgrounds or {}).items()
+        }
+        return Oblique(
+            scenario.date,
+            np.array(ray.ground_range),
+            np.array(ray.height),
+            scenario.ray_bearing,
+            scenario.origin_lat,
+            scenario.origin_lon,
+            scenario.fo,
+            ion2d=bgs.get("iri"),
+            msise=bgs.get("msise"),
+            igrf2d=bgs.get("igrf"),
+            edens=np.array(ray.electron_density) * self.dtype(1e6),  # To /m3
+            ray_details=ray,
+            **self.oblique_kwargs,
+        )
+
+    def evaluate(self, scenario: Scenario, combinations: list = COMBINATIONS):
+        """
+        Total absorption and phase of every combination, plus wall time.
+        """
+        with np.errstate(all="ignore"):
+            t0 = time.perf_counter()
+            ol = self.build(scenario)
+            totals = dict()
+            for r, c, m in combinations:
+                totals[(r, c, m)] = (
+                    ol.get_total_absorption_along_path(None, r, c, m),
+                    ol.get_total_phase_along_path(None, r, c, m),
+                )
+        return totals, time.perf_counter() - t0
+
+
+def validate(
+    scenarios: list,
+    fast: Configuration,
+    reference: Configuration = Configuration(),
+    combinations: list = COMBINATIONS,
+):
+    """
+    Run the reference and the fast configuration over all scenarios and
+    return one row per (scenario, relation, collision, mode) with the
+    absolute/relative errors of total absorption and phase and the
+    speed-up of the fast configuration.
+    """
+    records = []
+    for sc in scenarios:
+        logger.info(f"Validating {fast.name} against {reference.name} on {sc.name}")
+        ref, t_ref = reference.evaluate(sc, combinations)
+        fst, t_fst = fast.evaluate(sc, combinations)
+        for r, c, m in combinations:
+            (a_ref, p_ref), (a_fst, p_fst) = ref[(r, c, m)], fst[(r, c, m)]
+            records.append(
+                dict(
+                    scenario=sc.name,
+                    relation=r,
+                    collision=c,
+                    mode=m,
+                    absorption_ref=a_ref,
+                    absorption_fast=a_fst,
+                    absorption_abs_err=np.abs(a_fst - a_ref),
+                    absorption_rel_err=np.abs(a_fst - a_ref) / np.abs(a_ref),
+                    phase_ref=p_ref,
+                    phase_fast=p_fst,
+                    phase_abs_err=np.abs(p_fst - p_ref),
+                    phase_rel_err=np.abs(p_fst - p_ref) / np.abs(p_ref),
+                    speedup=t_ref / t_fst,
+                )
+            )
+    return pd.DataFrame.from_records(records)
+
+
+def summarize(results: pd.DataFrame):
+    """
+    Error budget per (relation, collision, mode): maximum absolute and
+    relative errors over all scenarios and the median speed-up.
+    """
+    return results.groupby(["relation", "collision", "mode"]).agg(
+        absorption_max_abs_err=("absorption_abs_err", "max"),
+        absorption_max_rel_err=("absorption_rel_err", "max"),
+        phase_max_abs_err=("phase_abs_err", "max"),
+        phase_max_rel_err=("phase_rel_err", "max"),
+        speedup=("speedup", "median"),
+    )
+
+
+def synthetic_matrix(
+    elvs: list = [5.0, 15.0, 30.0],
+    fos: list = [5e6, 10e6, 15e6],
+    n_points: int = 500,
+):
+    """
+    Synthetic scenarios over a grid of elevations and frequencies.
+    """
+    return [Scenario.synthetic(e, f, n_points) for e in elvs for f in fos]
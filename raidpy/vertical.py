@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+"""vertical.py: Vertical-incidence absorption maps over a lat/lon grid"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import datetime as dt
+from dataclasses import dataclass, field
+
+import numpy as np
+from loguru import logger
+
+from raidpy import instrument
+from raidpy.absorption import AppletonHartree, CalculateAbsorption, SenWyller
+from raidpy.collision import ComputeCollision
+from raidpy.constants import pconst
+from raidpy.ionosphere.grid import BackgroundGrid
+
+
+def map_key(wave_disp_reltn: str, col_freq: str, mode: str):
+    return f"{wave_disp_reltn}.{col_freq}.{mode}"
+
+
+@dataclass
+class AbsorptionMap:
+    """
+    Column-integrated absorption in dB; every map has the shape
+    (nfo, nlat, nlon) and is keyed by map_key(wave_disp_reltn, col_freq, mode).
+    """
+
+    date: dt.datetime = None
+    lats: np.array = None
+    lons: np.array = None
+    fos: np.array = None
+    maps: dict = field(default_factory=dict)
+    reflection_height: dict = field(default_factory=dict)  # mode -> km / NaN
+
+    def get(self, wave_disp_reltn: str, col_freq: str, mode: str, fo: float = None):
+        m = self.maps[map_key(wave_disp_reltn, col_freq, mode)]
+        return m if fo is None else m[int(np.argmin(np.abs(self.fos - fo)))]
+
+
+class VerticalAbsorption(object):
+    """
+    This class estimates vertical-incidence absorption maps. Collision
+    frequencies and the AH/SW kernels are evaluated on the whole
+    (lat, lon, alt) cube at once and integrated along altitude.
+
+    Parameters:
+    -----------
+    grid: BackgroundGrid with the backgrounds on the cube
+    fos: Operating frequencies in Hz
+    combinations: List of (wave_disp_reltn, col_freq, mode)
+    reflect: Integrate every column only up to the reflection height of
+        the mode; otherwise the whole column is integrated
+    sw_method: Sen-Wyller kernel, 'table' (vectorized) or 'quad'
+    """
+
+    def __init__(
+        self,
+        grid: BackgroundGrid,
+        fos: list = [5e6, 10e6],
+        combinations: list = [("ah", "sn", "O")],
+        reflect: bool = True,
+        sw_method: str = "table",
+        _run_: bool = True,
+    ):
+        self.grid = grid
+        self.fos = np.atleast_1d(np.asarray(fos, dtype=np.float64))
+        self.combinations = combinations
+        self.reflect = reflect
+        self.sw_method = sw_method
+        if _run_:
+            self.compute()
+        return
+
+    @instrument.stage("vertical.map", points=lambda self: self.grid.size)
+    def compute(self):
+        logger.info(
+            f"Vertical absorption of {len(self.fos)} frequencies on {self.grid.shape}"
+        )
+        self.cc = ComputeCollision(self.grid.msise, self.grid.iri, _run_=True)
+        nlat, nlon, _ = self.grid.shape
+        self.map = AbsorptionMap(
+            date=self.grid.date,
+            lats=self.grid.lats,
+            lons=self.grid.lons,
+            fos=self.fos,
+            maps={
+                map_key(*c): np.zeros((len(self.fos), nlat, nlon))
+                for c in self.combinations
+            },
+            reflection_height={
+                m: np.full((len(self.fos), nlat, nlon), np.nan)
+                for m in set(m for _, _, m in self.combinations)
+            },
+        )
+        for i, fo in enumerate(self.fos):
+            ca = CalculateAbsorption(
+                self.grid.iri,
+                self.grid.igrf,
+                self.cc.collision,
+                fo,
+                sw_method=self.sw_method,
+            )
+            ca.ah, ca.sw = AppletonHartree.init(), SenWyller.init()
+            if any(r == "ah" for r, _, _ in self.combinations):
+                ca.estimate_ah()
+            if any(r == "sw" for r, _, _ in self.combinations):
+                ca.estimate_sw()
+            below = {
+                m: self.below_reflection(fo, i, m) for m in self.map.reflection_height
+            }
+            for r, c, m in self.combinations:
+                beta = getattr(getattr(getattr(ca, r), c), f"mode_{m}")
+                beta = np.where(below[m], np.nan_to_num(beta), 0.0)
+                self.map.maps[map_key(r, c, m)][i] = np.trapz(
+                    beta, self.grid.alts, axis=-1
+                )
+        return self.map
+
+    def below_reflection(self, fo: float, i: int, mode: str):
+        """
+        Mask of the cube points below the reflection height of every
+        column (all True if reflect is False). The wave reflects where
+        X = 1 (O), X = 1 - Y (X, R) or X = 1 + Y (L).
+        """
+        w = 2 * np.pi * fo
+        X = (self.grid.iri["edens"] * pconst["q_e"] ** 2) / (
+            pconst["eps0"] * pconst["m_e"] * w**2
+        )
+        Y = pconst["q_e"] * self.grid.igrf["total"] / (pconst["m_e"] * w)
+        cutoff = dict(O=1.0, X=1.0 - Y, R=1.0 - Y, L=1.0 + Y)[mode]
+        reflected = np.cumsum(X >= cutoff, axis=-1) > 0
+        hit = reflected[..., -1]
+        self.map.reflection_height[mode][i][hit] = self.grid.alts[
+            np.argmax(reflected[hit], axis=-1)
+        ]
+        return ~reflected if self.reflect else np.ones_like(reflected)
+
+
+def vertical_absorption_map(
+    date: dt.datetime,
+    lats: np.array,
+    lons: np.array,
+    alts: np.array = np.arange(60, 402, 2),
+    fos: list = [5e6, 10e6],
+    combinations: list = [("ah", "sn", "O")],
+    **kwargs,
+):
+    """
+    Evaluate the backgrounds on the grid and return the AbsorptionMap;
+    keyword arguments go to BackgroundGrid (pool, backgrounds, ...).
+    """
+    grid = BackgroundGrid(date, lats, lons, alts, **kwargs)
+    return VerticalAbsorption(grid, fos, combinations).map
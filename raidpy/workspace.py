@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""workspace.py: Preallocated buffers for repeated collision and AH kernel runs"""
+
+__author__ = "Chakraborty, S."
+__copyright__ = "Chakraborty, S."
+__credits__ = []
+__license__ = "MIT"
+__version__ = "1.0."
+__maintainer__ = "Chakraborty, S."
+__email__ = "chakras4@erau.edu"
+__status__ = "Research"
+
+import numpy as np
+from loguru import logger
+
+from raidpy import instrument
+from raidpy.absorption import calculate_sw_OX_array, calculate_sw_RL_array
+from raidpy.collision import SN_EN, ion_electron_collision_frequency
+from raidpy.constants import pconst
+from raidpy.parallel import quantity_key
+from raidpy.phase import calculate_sw_OX_array as phase_sw_OX_array
+from raidpy.phase import calculate_sw_RL_array as phase_sw_RL_array
+
+
+class Workspace(object):
+    """
+    This class is an execution plan bound to (fo, quantities, max_points):
+    every intermediate of the collision frequencies and of the Appleton-
+    Hartree kernels lives in buffers allocated once and is written with
+    in-place ufuncs (out=), so rays of up to max_points points are
+    processed without temporary arrays. The results are views into the
+    workspace and are overwritten by the next run. Sen-Wyller quantities
+    use the (allocating) tabulated array kernels.
+
+    Parameters:
+    -----------
+    fo: Operating frequency in Hz
+    quantities: List of (kind, wave_disp_reltn, col_freq, mode) with kind
+        'los' (absorption in dB/km) or 'phase'
+    max_points: Largest number of points of a run
+    """
+
+    def __init__(
+        self,
+        fo: float,
+        quantities: list = [("los", "ah", "sn", "O")],
+        max_points: int = 1000,
+    ):
+        self.fo = fo
+        self.quantities = quantities
+        self.max_points = max_points
+        self.w = 2 * np.pi * fo
+        self.k = self.w / pconst["c"]
+        self.cX = pconst["q_e"] ** 2 / (pconst["eps0"] * pconst["m_e"] * self.w**2)
+        self.cY = pconst["q_e"] / (pconst["m_e"] * self.w)
+        self.col_freqs = sorted(set(c for _, _, c, _ in quantities))
+        real = ["X", "Y", "Y2", "Te", "sTe", "a", "b"] + [
+            f"nu_{c}" for c in self.col_freqs
+        ]
+        self.real = {k: np.empty(max_points) for k in real}
+        self.cplx = {k: np.empty(max_points, dtype=np.complex128) for k in "UVWD"}
+        self.out = {quantity_key(*q): np.empty(max_points) for q in quantities}
+        logger.info(f"Workspace for {len(quantities)} quantities, {max_points} points")
+        return
+
+    def views(self, n: int):
+        if n > self.max_points:
+            raise ValueError(f"{n} points exceed the workspace ({self.max_points})")
+        r = {k: v[:n] for k, v in self.real.items()}
+        c = {k: v[:n] for k, v in self.cplx.items()}
+        return r, c
+
+    def collisions(self, iri: dict, msise: dict, n: int):
+        """
+        Collision frequencies of the needed models into nu_<col_freq>.
+        """
+        r, _ = self.views(n)
+        Te, sTe, a = r["Te"], r["sTe"], r["a"]
+        np.copyto(Te, iri["etemp"])
+        np.sqrt(Te, out=sTe)
+        if set(self.col_freqs) & {"ft", "av_cc", "av_mb"}:
+            # Friedrich-Tonker: (2.637e6 / sqrt(Te) + 4.945e5) * t_nn Tn k
+            np.divide(2.637e6, sTe, out=a)
+            np.add(a, 4.945e5, out=a)
+            np.multiply(a, msise["t_nn"], out=a)
+            np.multiply(a, msise["Tn"], out=a)
+            np.multiply(a, pconst["boltz"], out=a)
+            for c, frac in [("ft", 1.0), ("av_cc", 2.5), ("av_mb", 1.5)]:
+                if c in self.col_freqs:
+                    np.multiply(a, frac, out=r[f"nu_{c}"])
+        if "sn" in self.col_freqs:
+            nu, b = r["nu_sn"], r["b"]
+            nu.fill(0.0)
+            for s, (coef, f) in SN_EN.items():
+                np.multiply(f(Te, sTe), msise[s], out=b)
+                np.multiply(b, 1e-6 * coef, out=b)
+                np.add(nu, b, out=nu)
+            for key in ["o2", "o"]:
+                np.add(
+                    nu,
+                    ion_electron_collision_frequency(
+                        iri["edens"], Te, iri["itemp"], iri[key]
+                    ),
+                    out=nu,
+                )
+        return
+
+    def index(self, mode: str, n: int):
+        """
+        Appleton-Hartree refractive index of one mode into the complex
+        buffer D; X, Y and U = 1 - jZ must be set.
+        """
+        r, c = self.views(n)
+        U, V, W, D = c["U"], c["V"], c["W"], c["D"]
+        if mode == "X":
+            np.subtract(U, r["X"], out=V)
+            np.multiply(V, U, out=D)
+            np.subtract(D, r["Y2"], out=D)
+            np.multiply(V, r["X"], out=W)
+            np.divide(W, D, out=D)
+        elif mode == "O":
+            np.divide(r["X"], U, out=D)
+        else:
+            (np.subtract if mode == "R" else np.add)(U, r["Y"], out=W)
+            np.divide(r["X"], W, out=D)
+        np.subtract(1.0, D, out=D)
+        np.sqrt(D, out=D)
+        return D
+
+    @instrument.stage(
+        "workspace.run", points=lambda self, iri, *a, **k: len(iri["edens"])
+    )
+    def run(self, iri: dict, msise: dict, igrf: dict):
+        """
+        Profiles of every quantity for the points of one ray (views into
+        the workspace). Every AH index is computed once for absorption
+        and phase.
+        """
+        n = len(iri["edens"])
+        r, c = self.views(n)
+        self.collisions(iri, msise, n)
+        np.multiply(iri["edens"], self.cX, out=r["X"])
+        np.multiply(igrf["total"], self.cY, out=r["Y"])
+        np.multiply(r["Y"], r["Y"], out=r["Y2"])
+        o = {quantity_key(*q): self.out[quantity_key(*q)][:n] for q in self.quantities}
+        ah = dict()
+        for kind, wr, col, m in self.quantities:
+            if wr == "ah":
+                ah.setdefault(col, dict()).setdefault(m, []).append(kind)
+            else:
+                f = dict(los=[calculate_sw_OX_array, calculate_sw_RL_array])
+                f["phase"] = [phase_sw_OX_array, phase_sw_RL_array]
+                f = f[kind][0 if m in ["O", "X"] else 1]
+                p = f(igrf["total"], iri["edens"], r[f"nu_{col}"], self.fo)
+                np.copyto(
+                    o[quantity_key(kind, wr, col, m)], p[dict(O=0, X=1, R=0, L=1)[m]]
+                )
+        for col, modes in ah.items():
+            # U = 1 - jZ
+            c["U"].real = 1.0
+            np.multiply(r[f"nu_{col}"], -1.0 / self.w, out=c["U"].imag)
+            for m, kinds in modes.items():
+                D = self.index(m, n)
+                for kind in kinds:
+                    out = o[quantity_key(kind, "ah", col, m)]
+                    if kind == "los":
+                        np.multiply(D.imag, 8.68 * self.k * 1e3, out=out)
+                        np.abs(out, out=out)
+                    else:
+                        np.copyto(out, D.real)
+        return o